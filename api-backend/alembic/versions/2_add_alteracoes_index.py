@@ -0,0 +1,34 @@
+"""add index for changes feed
+
+Revision ID: 2
+Revises: 1
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# Identificadores de revisão usados pelo Alembic.
+revision: str = '2'
+down_revision: Union[str, None] = '1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Índice (timestamp_processamento, id) para o feed de alterações"""
+    # Linhas antigas sem timestamp entram no feed como as mais antigas
+    op.execute("UPDATE cotacoes SET timestamp_processamento = '1970-01-01' WHERE timestamp_processamento IS NULL")
+    op.alter_column('cotacoes', 'timestamp_processamento', nullable=False,
+                    existing_type=sa.DateTime, existing_server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    # Paginação por chave (timestamp_processamento, id) sem ordenar a tabela
+    op.create_index('idx_timestamp_processamento_id', 'cotacoes', ['timestamp_processamento', 'id'])
+
+
+def downgrade() -> None:
+    """Remove o índice do feed de alterações"""
+    op.drop_index('idx_timestamp_processamento_id', 'cotacoes')
+    op.alter_column('cotacoes', 'timestamp_processamento', nullable=True,
+                    existing_type=sa.DateTime, existing_server_default=sa.text('CURRENT_TIMESTAMP'))
@@ -1 +1 @@
-# Alembic migrations script
+# Alembic migrations script
@@ -1,2 +1,2 @@
-"""API Backend para Análise B3"""
-__version__ = "1.0.0"
+"""API Backend para Análise B3"""
+__version__ = "1.0.0"
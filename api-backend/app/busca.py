@@ -0,0 +1,160 @@
+"""
+Índice em memória (por processo) para busca de ativos por prefixo e com erro
+de digitação.
+
+- Prefixo: lista ordenada de códigos + bisect (O(log n) para achar o intervalo).
+- Erro de digitação: "symmetric delete" — cada código (e sua raiz de letras,
+  ex.: PETR de PETR4) é indexado por todas as variantes com um caractere a
+  menos; a consulta gera as próprias variantes e cruza com o índice. Cobre
+  troca, falta, sobra e inversão de um caractere sem varrer a lista (os
+  poucos candidatos são conferidos pela distância de edição).
+- Ranking: volume negociado recente (maior primeiro).
+
+O Postgres só é consultado na carga do índice: na primeira busca, depois de
+cada aviso de carga do ETL e quando o TTL expira (em segundo plano, servindo
+o índice anterior enquanto isso). Se a primeira carga falhar, as buscas
+falham na hora com IndiceIndisponivel (e disparam nova tentativa) em vez de
+esperar o timeout.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+MIN_APROXIMADO = 3
+
+
+class IndiceIndisponivel(RuntimeError):
+    """O índice ainda não tem uma carga bem-sucedida."""
+
+
+def _delecoes(texto):
+    return {texto[:i] + texto[i + 1:] for i in range(len(texto))}
+
+
+def _distancia(a, b):
+    """Distância de edição com inversão de vizinhos (Damerau restrita)."""
+    anterior2, anterior = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            custo = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                custo = min(custo, anterior2[j - 2] + 1)
+            atual.append(custo)
+        anterior2, anterior = anterior, atual
+    return anterior[-1]
+
+
+def _raiz(ativo):
+    # Raiz de 4 letras do código B3: PETR4 -> PETR, BOVA11 -> BOVA
+    return ativo[:4]
+
+
+class IndiceAtivos:
+    def __init__(self, fonte, ttl=3600):
+        """fonte() retorna [(ativo, volume_recente)]."""
+        self.fonte = fonte
+        self.ttl = ttl
+        self._dados = ([], {}, {})
+        self._carregado_em = None
+        self._lock = threading.Lock()
+        self._atualizando = False
+        self._erro = None
+        # Primeira tentativa de carga concluída (com sucesso ou não): acorda quem espera
+        self._tentou = threading.Event()
+
+    # --- construção ---
+
+    def carregar(self, linhas):
+        ativos = sorted({a for a, _ in linhas})
+        volume = {a: int(v or 0) for a, v in linhas}
+        variantes = {}
+        for ativo in ativos:
+            for chave in {ativo, _raiz(ativo)}:
+                for variante in _delecoes(chave) | {chave}:
+                    variantes.setdefault(variante, set()).add(ativo)
+
+        # Troca atômica (uma atribuição): buscas em andamento seguem no índice anterior
+        self._dados = (ativos, volume, variantes)
+        self._carregado_em = time.monotonic()
+        self._erro = None
+        self._tentou.set()
+
+    def atualizar(self):
+        linhas = self.fonte()
+        self.carregar(linhas)
+        print(f"[INFO] Índice de ativos carregado: {len(self._dados[0])} ativos")
+
+    def atualizar_em_segundo_plano(self):
+        with self._lock:
+            if self._atualizando:
+                return
+            self._atualizando = True
+
+        def _executar():
+            try:
+                self.atualizar()
+            except Exception as e:
+                print(f"[WARNING] Falha ao atualizar índice de ativos: {e}")
+                self._erro = e
+                self._tentou.set()
+            finally:
+                self._atualizando = False
+
+        threading.Thread(target=_executar, name="indice-ativos", daemon=True).start()
+
+    def invalidar(self):
+        """Recarrega em segundo plano (ex.: novo dia carregado pelo ETL)."""
+        if self._carregado_em is not None:
+            self.atualizar_em_segundo_plano()
+
+    def garantir(self, timeout=30):
+        if self._carregado_em is None:
+            # Primeira carga (normalmente já disparada no startup): espera por ela,
+            # a menos que já tenha falhado; nesse caso só dispara outra tentativa
+            self.atualizar_em_segundo_plano()
+            if self._erro is None and not self._tentou.wait(timeout):
+                raise IndiceIndisponivel("Índice de ativos ainda não carregado")
+            if self._carregado_em is None:
+                raise IndiceIndisponivel(f"Falha ao carregar o índice de ativos: {self._erro}")
+        elif self.ttl is not None and time.monotonic() - self._carregado_em > self.ttl:
+            self.atualizar_em_segundo_plano()
+
+    # --- consulta ---
+
+    @staticmethod
+    def _por_volume(ativos, volume, limite):
+        return heapq.nsmallest(limite, ativos, key=lambda a: (-volume.get(a, 0), a))
+
+    def buscar(self, termo, limite=10):
+        """Lista de (ativo, volume_recente, tipo) com tipo 'exato', 'prefixo' ou 'aproximado'."""
+        self.garantir()
+        termo = termo.strip().upper()
+        if not termo:
+            return []
+        ativos, volume, variantes = self._dados
+
+        resultado = []
+        if termo in volume:
+            resultado.append((termo, volume[termo], "exato"))
+
+        inicio = bisect_left(ativos, termo)
+        fim = bisect_left(ativos, termo + "\uffff", inicio)
+        prefixo = [a for a in ativos[inicio:fim] if a != termo]
+        resultado += [(a, volume[a], "prefixo") for a in self._por_volume(prefixo, volume, limite - len(resultado))]
+
+        # Erro de digitação só a partir de 3 caracteres: antes disso tudo é "parecido"
+        if len(resultado) < limite and len(termo) >= MIN_APROXIMADO:
+            candidatos = set()
+            for variante in _delecoes(termo) | {termo}:
+                candidatos |= variantes.get(variante, set())
+            # As variantes trazem candidatos a até 2 edições; fica só quem está a 1
+            vistos = {a for a, _, _ in resultado}
+            aproximados = [
+                a for a in candidatos
+                if a not in vistos and min(_distancia(termo, a), _distancia(termo, _raiz(a))) <= 1
+            ]
+            resultado += [(a, volume[a], "aproximado") for a in self._por_volume(aproximados, volume, limite - len(resultado))]
+
+        return resultado[:limite]
@@ -0,0 +1,56 @@
+"""
+Cache LRU em memória (por processo) para respostas caras da API.
+
+Datas passadas não mudam, exceto quando o ETL recarrega um dia; nesse caso o
+aviso de /api/eventos (LISTEN cotacoes_novo_dia) invalida as entradas
+afetadas. O TTL opcional é uma rede de segurança se o LISTEN estiver fora.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave):
+        """Valor em cache ou None."""
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None or (self.ttl is not None and item[0] < time.monotonic()):
+                self._dados.pop(chave, None)
+                self.misses += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return item[1]
+
+    def set(self, chave, valor):
+        expira = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._dados[chave] = (expira, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+
+    def invalidar(self, condicao):
+        """Remove as entradas em que condicao(chave, valor) é verdadeira."""
+        with self._lock:
+            remover = [chave for chave, (_, valor) in self._dados.items() if condicao(chave, valor)]
+            for chave in remover:
+                del self._dados[chave]
+        return len(remover)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {"itens": len(self._dados), "hits": self.hits, "misses": self.misses}
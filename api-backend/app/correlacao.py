@@ -0,0 +1,69 @@
+"""
+Correlação e covariância de retornos diários entre vários ativos (NumPy).
+
+A matriz de preços é alinhada pelas datas de pregão (NaN onde o ativo não
+negociou) e as estatísticas são "pairwise complete": cada par usa só os dias
+em que ambos têm retorno, calculado com produtos de matrizes em vez de laços
+por par.
+"""
+import numpy as np
+
+
+def matriz_precos(series):
+    """
+    series: [(ativo, dias desde 1970-01-01, fechamentos)], uma entrada por ativo.
+    Retorna (ativos, datas em dias, matriz datas x ativos com NaN nas lacunas).
+    """
+    ativos = [ativo for ativo, _, _ in series]
+    dias_por_ativo = [np.asarray(dias, dtype=np.int64) for _, dias, _ in series]
+    datas = np.unique(np.concatenate(dias_por_ativo)) if dias_por_ativo else np.empty(0, dtype=np.int64)
+
+    precos = np.full((len(datas), len(ativos)), np.nan)
+    for j, (dias, (_, _, fechamentos)) in enumerate(zip(dias_por_ativo, series)):
+        precos[np.searchsorted(datas, dias), j] = np.asarray(fechamentos, dtype=np.float64)
+    return ativos, datas, precos
+
+
+def retornos(precos, tipo="log"):
+    """Retornos entre linhas consecutivas; lacunas viram NaN nos dois lados."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if tipo == "log":
+            r = np.diff(np.log(precos), axis=0)
+        else:
+            r = precos[1:] / precos[:-1] - 1
+    r[~np.isfinite(r)] = np.nan
+    return r
+
+
+def cov_corr_pareadas(r, min_periodos=20):
+    """
+    Covariância e correlação amostrais par a par (ddof=1) ignorando NaN.
+
+    Retorna (covariância, correlação, observações por par); pares com menos
+    de min_periodos dias em comum ficam NaN.
+    """
+    m = (~np.isnan(r)).astype(np.float64)
+    x = np.where(m > 0, r, 0.0)
+
+    n = m.T @ m                  # dias em comum de cada par
+    sx = x.T @ m                 # soma de x_i nos dias em que j também existe
+    sxx = (x * x).T @ m
+    sxy = x.T @ x
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (sxy - sx * sx.T / n) / (n - 1)
+        var_x = (sxx - sx * sx / n) / (n - 1)
+        corr = cov / np.sqrt(var_x * var_x.T)
+
+    invalidos = n < max(2, min_periodos)
+    cov[invalidos] = np.nan
+    corr[invalidos] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return cov, corr, n.astype(np.int64)
+
+
+def para_json(matriz, casas=6):
+    """Lista de listas com NaN -> None (JSON válido)."""
+    valores = np.round(matriz, casas).astype(object)
+    valores[~np.isfinite(matriz)] = None
+    return valores.tolist()
@@ -1,27 +1,69 @@
-import os
-import psycopg2
-from contextlib import contextmanager
-
-
-def get_connection_params():
-    """Parâmetros de conexão do PostgreSQL."""
-    return {
-        "host": os.getenv("POSTGRES_HOST", "localhost"),
-        "port": os.getenv("POSTGRES_PORT", "5432"),
-        "dbname": os.getenv("POSTGRES_DB", "b3_data"),
-        "user": os.getenv("POSTGRES_USER", "user"),
-        "password": os.getenv("POSTGRES_PASSWORD", "password"),
-        "sslmode": os.getenv("POSTGRES_SSL_MODE", "require"),
-    }
-
-
-@contextmanager
-def get_db():
-    """Context manager de conexão PostgreSQL."""
-    conn = None
-    try:
-        conn = psycopg2.connect(**get_connection_params())
-        yield conn
-    finally:
-        if conn:
-            conn.close()
+import os
+import time
+import psycopg2
+import psycopg2.extensions
+from contextlib import contextmanager
+
+from app import metrics
+
+
+def get_connection_params():
+    """Parâmetros de conexão do PostgreSQL."""
+    return {
+        "host": os.getenv("POSTGRES_HOST", "localhost"),
+        "port": os.getenv("POSTGRES_PORT", "5432"),
+        "dbname": os.getenv("POSTGRES_DB", "b3_data"),
+        "user": os.getenv("POSTGRES_USER", "user"),
+        "password": os.getenv("POSTGRES_PASSWORD", "password"),
+        "sslmode": os.getenv("POSTGRES_SSL_MODE", "require"),
+    }
+
+
+class CursorMedido(psycopg2.extensions.cursor):
+    """Cursor que registra o tempo de execute/fetch e as linhas lidas (app.metrics)."""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.registrar_consulta(query, vars, time.perf_counter() - inicio)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        row = super().fetchone()
+        metrics.registrar_leitura(0 if row is None else 1, time.perf_counter() - inicio)
+        return row
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        metrics.registrar_leitura(len(rows), time.perf_counter() - inicio)
+        return rows
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        rows = super().fetchall()
+        metrics.registrar_leitura(len(rows), time.perf_counter() - inicio)
+        return rows
+
+
+@contextmanager
+def get_db():
+    """Context manager de conexão PostgreSQL."""
+    conn = None
+    inicio = time.perf_counter()
+    try:
+        try:
+            conn = psycopg2.connect(**get_connection_params(), cursor_factory=CursorMedido)
+        except Exception:
+            metrics.conexoes_erros.inc()
+            raise
+        metrics.registrar_fase("conexao", time.perf_counter() - inicio)
+        metrics.conexoes_total.inc()
+        metrics.conexoes_abertas.inc()
+        yield conn
+    finally:
+        if conn:
+            conn.close()
+            metrics.conexoes_abertas.dec()
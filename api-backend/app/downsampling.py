@@ -0,0 +1,71 @@
+"""
+Redução de séries temporais para gráficos (índices dos pontos mantidos).
+
+- LTTB (Largest-Triangle-Three-Buckets): preserva o formato visual da linha
+  escolhendo, em cada bucket, o ponto que forma o maior triângulo com o ponto
+  anterior escolhido e a média do bucket seguinte.
+- min/max: mantém o mínimo e o máximo de cada bucket; nenhum pico ou vale
+  some (bom para volatilidade), ao custo de uma linha mais "serrilhada".
+
+Primeiro e último pontos são sempre mantidos.
+"""
+
+
+def lttb(x, y, pontos):
+    """Índices de no máximo `pontos` pontos de (x, y) pelo LTTB."""
+    tamanho = len(x)
+    if pontos >= tamanho or pontos < 3:
+        return list(range(tamanho))
+
+    passo = (tamanho - 2) / (pontos - 2)
+    indices = [0]
+    a = 0
+    for i in range(pontos - 2):
+        inicio = int(i * passo) + 1
+        fim = int((i + 1) * passo) + 1
+
+        # Média do bucket seguinte (no último bucket, o último ponto)
+        prox_inicio = fim
+        prox_fim = min(int((i + 2) * passo) + 1, tamanho)
+        n = prox_fim - prox_inicio
+        media_x = sum(x[prox_inicio:prox_fim]) / n
+        media_y = sum(y[prox_inicio:prox_fim]) / n
+
+        ax, ay = x[a], y[a]
+        melhor, maior_area = inicio, -1.0
+        for j in range(inicio, fim):
+            area = abs((ax - media_x) * (y[j] - ay) - (ax - x[j]) * (media_y - ay))
+            if area > maior_area:
+                melhor, maior_area = j, area
+
+        indices.append(melhor)
+        a = melhor
+
+    indices.append(tamanho - 1)
+    return indices
+
+
+def minmax(y, pontos):
+    """Índices das pontas e do mínimo e máximo de (pontos - 2)/2 buckets (em ordem)."""
+    tamanho = len(y)
+    if pontos >= tamanho or pontos < 4:
+        return list(range(tamanho))
+
+    # Buckets só no miolo: com as pontas, no máximo `pontos` índices
+    buckets = (pontos - 2) // 2
+    miolo = tamanho - 2
+    indices = {0, tamanho - 1}
+    for b in range(buckets):
+        # Limites inteiros: o arredondamento não deixa pontos entre buckets
+        fatia = range(1 + b * miolo // buckets, 1 + (b + 1) * miolo // buckets)
+        if fatia:
+            indices.add(min(fatia, key=y.__getitem__))
+            indices.add(max(fatia, key=y.__getitem__))
+    return sorted(indices)
+
+
+def reduzir(x, y, pontos, metodo="lttb"):
+    """Índices mantidos pelo método ('lttb' ou 'minmax')."""
+    if metodo == "minmax":
+        return minmax(y, pontos)
+    return lttb(x, y, pontos)
@@ -0,0 +1,71 @@
+"""
+ETag em respostas JSON de GET, com 304 Not Modified para If-None-Match.
+
+Middleware ASGI puro: respostas que não são JSON (ex.: o stream SSE de
+/api/eventos) passam direto, sem buffer. Registrado antes do GZipMiddleware,
+o hash é do corpo sem compressão e o 304 sai sem corpo algum.
+"""
+import hashlib
+
+
+def _etag(corpo: bytes) -> str:
+    # Fraca (W/): o mesmo conteúdo pode sair com ou sem gzip
+    return 'W/"' + hashlib.blake2b(corpo, digest_size=16).hexdigest() + '"'
+
+
+def _corresponde(if_none_match: str, etag: str) -> bool:
+    # Comparação fraca (RFC 9110): ignora o prefixo W/ dos dois lados
+    candidatos = {c.strip().removeprefix("W/") for c in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidatos or "*" in candidatos
+
+
+class ETagMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = next(
+            (v.decode("latin-1") for k, v in scope["headers"] if k == b"if-none-match"), None
+        )
+        inicio = None
+        partes = []
+
+        async def enviar(message):
+            nonlocal inicio
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                tipo = headers.get(b"content-type", b"")
+                if message["status"] != 200 or not tipo.startswith(b"application/json") or b"etag" in headers:
+                    inicio = False
+                    await send(message)
+                else:
+                    inicio = message
+                return
+
+            if inicio is False or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            partes.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            corpo = b"".join(partes)
+            etag = _etag(corpo)
+            headers = [(k, v) for k, v in inicio.get("headers", []) if k != b"content-length"]
+            headers.append((b"etag", etag.encode("latin-1")))
+
+            if if_none_match and _corresponde(if_none_match, etag):
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            headers.append((b"content-length", str(len(corpo)).encode("latin-1")))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": corpo})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,147 @@
+"""
+Avisos de novos dias de pregão via Server-Sent Events.
+
+O PostgresLoader do ETL executa pg_notify('cotacoes_novo_dia', ...) na mesma
+transação da carga. Uma thread por processo faz LISTEN nesse canal e repassa
+cada aviso ({"data", "total", "versao"}) aos clientes de /api/eventos e aos
+callbacks registrados (invalidação de caches).
+
+A thread é iniciada no startup da aplicação ou na primeira assinatura, nunca
+no import: com gunicorn --preload cada worker abre sua própria conexão.
+"""
+import asyncio
+import json
+import select
+import threading
+import time
+
+import psycopg2
+
+from app.database import get_connection_params
+
+CANAL = "cotacoes_novo_dia"
+INTERVALO_PING = 15
+# Sem avisos por esse tempo, o LISTEN confere se a conexão ainda responde
+INTERVALO_VERIFICACAO = 60
+
+# Keepalive TCP: uma conexão meio-aberta (ex.: failover, NAT) não prende o SELECT 1
+_KEEPALIVE = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3}
+
+
+def _enfileirar(fila, evento):
+    try:
+        fila.put_nowait(evento)
+    except asyncio.QueueFull:
+        # Cliente lento: perde o aviso, mas continua conectado
+        pass
+
+
+class Notificador:
+    def __init__(self):
+        self._assinantes = set()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self.ultimo = None
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._escutar, name="pg-listen", daemon=True)
+                self._thread.start()
+
+    def ao_evento(self, callback):
+        """Registra callback(evento), chamado na thread do LISTEN."""
+        self._callbacks.append(callback)
+        return callback
+
+    def assinar(self):
+        fila = asyncio.Queue(maxsize=100)
+        assinatura = (asyncio.get_running_loop(), fila)
+        with self._lock:
+            self._assinantes.add(assinatura)
+        self.iniciar()
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinantes.discard(assinatura)
+
+    def _publicar(self, evento):
+        self.ultimo = evento
+        for callback in self._callbacks:
+            try:
+                callback(evento)
+            except Exception as e:
+                print(f"[WARNING] Callback de evento falhou: {e}")
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for loop, fila in assinantes:
+            loop.call_soon_threadsafe(_enfileirar, fila, evento)
+
+    def _escutar(self):
+        # Reconecta com espera crescente se o banco cair
+        espera = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**get_connection_params(), **_KEEPALIVE)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CANAL}")
+                espera = 1
+                while True:
+                    if select.select([conn], [], [], INTERVALO_VERIFICACAO) == ([], [], []):
+                        # Silêncio não prova que a conexão está viva: falha aqui cai na reconexão.
+                        # Avisos que chegarem junto com o SELECT 1 ficam em conn.notifies
+                        self._verificar(conn)
+                    conn.poll()
+                    while conn.notifies:
+                        aviso = conn.notifies.pop(0)
+                        try:
+                            self._publicar(json.loads(aviso.payload))
+                        except ValueError:
+                            print(f"[WARNING] Aviso inválido em {CANAL}: {aviso.payload}")
+            except Exception as e:
+                print(f"[WARNING] LISTEN {CANAL} interrompido, reconectando em {espera}s: {e}")
+                time.sleep(espera)
+                espera = min(espera * 2, 60)
+            finally:
+                if conn:
+                    conn.close()
+
+    @staticmethod
+    def _verificar(conn):
+        if conn.closed:
+            raise psycopg2.InterfaceError("conexão do LISTEN fechada")
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+
+
+notificador = Notificador()
+
+
+def formatar_evento(evento) -> str:
+    return f"id: {evento.get('versao', '')}\nevent: novo_dia\ndata: {json.dumps(evento)}\n\n"
+
+
+async def stream_eventos(request):
+    """Gerador SSE: um evento por aviso, com ping periódico (mantém proxies abertos)."""
+    assinatura = notificador.assinar()
+    _, fila = assinatura
+    try:
+        yield "retry: 5000\n\n"
+        # Último aviso conhecido: o cliente sincroniza sem esperar a próxima carga
+        if notificador.ultimo:
+            yield formatar_evento(notificador.ultimo)
+        while True:
+            try:
+                evento = await asyncio.wait_for(fila.get(), timeout=INTERVALO_PING)
+                yield formatar_evento(evento)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+    finally:
+        notificador.cancelar(assinatura)
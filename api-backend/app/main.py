@@ -1,309 +1,761 @@
-import os
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
-from datetime import date
-from dotenv import load_dotenv
-from starlette.middleware.gzip import GZipMiddleware
-
-from app.database import get_db
-from app.models import Cotacao
-
-# Carrega variáveis de ambiente
-load_dotenv()
-
-# Inicializa FastAPI
-app = FastAPI(
-    title="B3 Cotações API",
-    version="1.0.0",
-    description="API para consulta de cotações da B3"
-)
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Compressão GZIP para reduzir payloads em respostas maiores
-app.add_middleware(GZipMiddleware, minimum_size=500)
-
-@app.get("/api/cotacoes/datas")
-def listar_datas_disponiveis():
-    """Lista datas com cotações (ordem crescente)."""
-    try:
-        query = """
-            SELECT data_pregao::date AS data, COUNT(*) AS total
-            FROM cotacoes
-            GROUP BY data_pregao
-            ORDER BY data_pregao ASC
-        """
-
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query)
-                rows = cur.fetchall()
-
-                if not rows:
-                    raise HTTPException(status_code=404, detail="Nenhuma data encontrada")
-
-                datas = [
-                    {"data": r[0], "total": r[1]}
-                    for r in rows
-                ]
-
-                return {
-                    "total_dias": len(datas),
-                    "datas": datas
-                }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
-
-
-@app.get("/api/cotacoes/{codigo_ativo}")
-def buscar_historico_ativo(
-    codigo_ativo: str,
-    limite: int = Query(10, ge=1, le=100, description="Quantidade de registros (máx: 100)")
-):
-    """Histórico do ativo (limite padrão 10)."""
-    try:
-        query = """
-            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
-            FROM cotacoes
-            WHERE ativo = %s
-            ORDER BY data_pregao DESC
-            LIMIT %s
-        """
-        
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (codigo_ativo.upper(), limite))
-                rows = cur.fetchall()
-                
-                if not rows:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Nenhuma cotação encontrada para {codigo_ativo.upper()}"
-                    )
-                
-                cotacoes = [
-                    {
-                        "ativo": r[0],
-                        "data_pregao": r[1],
-                        "abertura": float(r[2]),
-                        "fechamento": float(r[3]),
-                        "maximo": float(r[4]),
-                        "minimo": float(r[5]),
-                        "volume": r[6]
-                    }
-                    for r in rows
-                ]
-                
-                return {
-                    "ativo": codigo_ativo.upper(),
-                    "total": len(cotacoes),
-                    "dados": cotacoes
-                }
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
-
-
-@app.get("/api/cotacoes/{codigo_ativo}/latest")
-def cotacao_mais_recente(codigo_ativo: str):
-    """Cotação mais recente do ativo."""
-    try:
-        query = """
-            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
-            FROM cotacoes
-            WHERE ativo = %s
-            ORDER BY data_pregao DESC
-            LIMIT 1
-        """
-        
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (codigo_ativo.upper(),))
-                row = cur.fetchone()
-                
-                if not row:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Ativo {codigo_ativo.upper()} não encontrado"
-                    )
-                
-                return {
-                    "ativo": row[0],
-                    "data_pregao": row[1],
-                    "abertura": float(row[2]),
-                    "fechamento": float(row[3]),
-                    "maximo": float(row[4]),
-                    "minimo": float(row[5]),
-                    "volume": row[6]
-                }
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
-
-
-@app.get("/api/ativos")
-def listar_ativos():
-    """Lista todos os ativos distintos."""
-    try:
-        query = "SELECT DISTINCT ativo FROM cotacoes ORDER BY ativo"
-        
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query)
-                ativos = [row[0] for row in cur.fetchall()]
-                
-                return {
-                    "total": len(ativos),
-                    "ativos": ativos
-                }
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
-
-
-@app.get("/api/cotacoes")
-def listar_cotacoes_sem_parametros():
-    """Lista todas as cotações (sem filtros)."""
-    try:
-        query = """
-            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
-            FROM cotacoes
-            ORDER BY data_pregao DESC, ativo
-        """
-
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query)
-                rows = cur.fetchall()
-
-                if not rows:
-                    raise HTTPException(status_code=404, detail="Nenhuma cotação encontrada")
-
-                cotacoes = [
-                    {
-                        "ativo": r[0],
-                        "data_pregao": r[1],
-                        "abertura": float(r[2]),
-                        "fechamento": float(r[3]),
-                        "maximo": float(r[4]),
-                        "minimo": float(r[5]),
-                        "volume": r[6]
-                    }
-                    for r in rows
-                ]
-
-                return {
-                    "total": len(cotacoes),
-                    "dados": cotacoes
-                }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
-
-
-@app.get("/api/cotacoes/data/{data}")
-def listar_cotacoes_por_data(data: date):
-    """Cotações de uma data específica."""
-    try:
-        query = """
-            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
-            FROM cotacoes
-            WHERE data_pregao = %s
-            ORDER BY ativo
-        """
-
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (data,))
-                rows = cur.fetchall()
-
-                if not rows:
-                    raise HTTPException(status_code=404, detail=f"Nenhuma cotação encontrada para a data {data}")
-
-                cotacoes = [
-                    {
-                        "ativo": r[0],
-                        "data_pregao": r[1],
-                        "abertura": float(r[2]),
-                        "fechamento": float(r[3]),
-                        "maximo": float(r[4]),
-                        "minimo": float(r[5]),
-                        "volume": r[6]
-                    }
-                    for r in rows
-                ]
-
-                return {
-                    "total": len(cotacoes),
-                    "data": str(data),
-                    "dados": cotacoes
-                }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
-
-
-@app.get("/api/ativos/intervalo")
-def listar_ativos_por_intervalo(
-    inicio: date = Query(..., description="Data inicial (YYYY-MM-DD)"),
-    fim: date = Query(..., description="Data final (YYYY-MM-DD)"),
-    ativo: str = Query(..., description="Código do ativo (ex: PETR4)")
-):
-    """Fechamento diário do ativo entre duas datas (inclusive)."""
-    try:
-        if fim < inicio:
-            raise HTTPException(status_code=400, detail="A data final deve ser maior ou igual à inicial")
-
-        ativo_up = ativo.upper()
-
-        query = """
-            SELECT data_pregao::date AS data, fechamento
-            FROM cotacoes
-            WHERE data_pregao BETWEEN %s AND %s
-              AND ativo = %s
-            ORDER BY data_pregao ASC
-        """
-
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (inicio, fim, ativo_up))
-                rows = cur.fetchall()
-
-                if not rows:
-                    raise HTTPException(status_code=404, detail=f"Nenhum registro encontrado para {ativo_up} no intervalo informado")
-
-                serie = [
-                    {"data": str(r[0]), "fechamento": float(r[1])}
-                    for r in rows
-                ]
-
-                return {
-                    "inicio": str(inicio),
-                    "fim": str(fim),
-                    "ativo": ativo_up,
-                    "serie": serie
-                }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Optional
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
+from starlette.middleware.gzip import GZipMiddleware
+
+from app import correlacao, downsampling, metrics
+from app.busca import IndiceAtivos, IndiceIndisponivel
+from app.cache import CacheLRU
+from app.database import get_db
+from app.etag import ETagMiddleware
+from app.eventos import notificador, stream_eventos
+from app.models import Cotacao
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+
+class JSONResponseMedida(JSONResponse):
+    """JSONResponse que mede o json.dumps como fase 'serializacao'."""
+
+    def render(self, content) -> bytes:
+        inicio = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            metrics.registrar_fase("serializacao", time.perf_counter() - inicio)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Roda em cada worker, depois do fork: LISTEN dos avisos de carga do ETL
+    notificador.iniciar()
+    indice_ativos.atualizar_em_segundo_plano()
+    yield
+
+
+# Inicializa FastAPI
+app = FastAPI(
+    title="B3 Cotações API",
+    version="1.0.0",
+    description="API para consulta de cotações da B3",
+    lifespan=lifespan,
+    default_response_class=JSONResponseMedida
+)
+
+# CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# ETag/304 nas respostas JSON: clientes revalidam sem baixar de novo o corpo
+# (adicionado antes do GZip, que fica por fora e comprime o corpo original)
+app.add_middleware(ETagMiddleware)
+
+# Rotas de streaming contínuo: fora do GZip
+ROTAS_SEM_GZIP = {"/api/eventos"}
+
+
+class GZipExcetoStreams(GZipMiddleware):
+    """GZip que deixa o SSE passar direto: o Starlette 0.38 não exclui
+    text/event-stream e os eventos ficariam presos no buffer do zlib."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in ROTAS_SEM_GZIP:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compressão GZIP para reduzir payloads em respostas maiores
+app.add_middleware(GZipExcetoStreams, minimum_size=500)
+
+# Tempo por rota e fase (/metrics); adicionado por último, é o mais externo
+app.add_middleware(metrics.MetricasMiddleware)
+
+# Margem do feed de alterações: a carga grava o CURRENT_TIMESTAMP do início da
+# transação, que só fica visível no commit; linhas mais novas que a margem
+# ficam para a próxima sincronização
+ALTERACOES_MARGEM_SEGUNDOS = int(os.getenv("ALTERACOES_MARGEM_SEGUNDOS", "120"))
+
+# Snapshots de mercado por data: imutáveis até o ETL recarregar o dia
+cache_mercado = CacheLRU(maxsize=256, ttl=3600)
+
+
+@notificador.ao_evento
+def _invalidar_mercado(evento):
+    # Dia carregado e o pregão seguinte (cujo retorno depende dele); datas ISO
+    # comparam como texto. Cobre também um dia antigo inserido por backfill.
+    data = evento.get("data")
+    if not data:
+        return
+    cache_mercado.invalidar(
+        lambda chave, snapshot: chave == data or (snapshot["data_anterior"] or "") <= data < chave
+    )
+
+
+# Matrizes de correlação por (ativos, janela, parâmetros), guardadas já em JSON:
+# 500 x 500 floats custam mais para serializar do que para calcular
+cache_correlacao = CacheLRU(maxsize=32, ttl=3600)
+MAX_ATIVOS_CORRELACAO = 500
+
+
+@notificador.ao_evento
+def _invalidar_correlacao(evento):
+    data = evento.get("data")
+    if data:
+        cache_correlacao.invalidar(lambda chave, _: chave[1] <= data <= chave[2])
+
+
+def _carregar_indice_ativos():
+    # Volume dos últimos 30 dias de pregão disponíveis ordena as sugestões da busca
+    query = """
+        SELECT ativo,
+               SUM(volume) FILTER (
+                   WHERE data_pregao >= (SELECT MAX(data_pregao) FROM cotacoes) - 30
+               ) AS volume_recente
+        FROM cotacoes
+        GROUP BY ativo
+    """
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+
+# Busca de ativos em memória: o Postgres só é lido ao recarregar o índice
+indice_ativos = IndiceAtivos(_carregar_indice_ativos, ttl=int(os.getenv("INDICE_ATIVOS_TTL", "3600")))
+
+
+@notificador.ao_evento
+def _atualizar_indice_ativos(evento):
+    # Novo dia pode trazer ativos novos e muda o volume recente
+    indice_ativos.invalidar()
+
+cache_itens = metrics.registro.registrar(metrics.Gauge("api_cache_itens", "Itens nos caches em memória"))
+cache_consultas = metrics.registro.registrar(metrics.Gauge("api_cache_consultas", "Hits/misses acumulados dos caches"))
+
+
+@metrics.registro.coletor
+def _coletar_caches():
+    for nome, cache in (("mercado", cache_mercado), ("correlacao", cache_correlacao)):
+        estatisticas = cache.estatisticas()
+        cache_itens.set(estatisticas["itens"], cache=nome)
+        cache_consultas.set(estatisticas["hits"], cache=nome, resultado="hit")
+        cache_consultas.set(estatisticas["misses"], cache=nome, resultado="miss")
+
+
+@app.get("/metrics", include_in_schema=False)
+def exportar_metricas():
+    """Métricas do processo no formato texto do Prometheus."""
+    return Response(content=metrics.registro.renderizar(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/cotacoes/datas")
+def listar_datas_disponiveis():
+    """Lista datas com cotações (ordem crescente)."""
+    try:
+        query = """
+            SELECT data_pregao::date AS data, COUNT(*) AS total
+            FROM cotacoes
+            GROUP BY data_pregao
+            ORDER BY data_pregao ASC
+        """
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query)
+                rows = cur.fetchall()
+
+                if not rows:
+                    raise HTTPException(status_code=404, detail="Nenhuma data encontrada")
+
+                datas = [
+                    {"data": r[0], "total": r[1]}
+                    for r in rows
+                ]
+
+                return {
+                    "total_dias": len(datas),
+                    "datas": datas
+                }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/eventos")
+async def eventos(request: Request):
+    """Stream SSE: um evento `novo_dia` (data, total, versao) a cada carga do ETL."""
+    return StreamingResponse(
+        stream_eventos(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Declarada antes de /api/cotacoes/{codigo_ativo} para não ser capturada como ticker
+@app.get("/api/cotacoes/alteracoes")
+def listar_alteracoes(
+    desde: Optional[datetime] = Query(None, description="Watermark: timestamp_processamento da última linha recebida"),
+    apos_id: int = Query(0, ge=0, description="Watermark: id da última linha recebida"),
+    limite: int = Query(5000, ge=1, le=50000, description="Linhas por página (máx: 50000)")
+):
+    """Cotações inseridas ou alteradas após o watermark (paginação por chave)."""
+    try:
+        desde = desde or datetime(1970, 1, 1)
+
+        # (timestamp_processamento, id) usa o índice idx_timestamp_processamento_id
+        query = """
+            SELECT id, timestamp_processamento, ativo, data_pregao,
+                   abertura, fechamento, maximo, minimo, volume
+            FROM cotacoes
+            WHERE (timestamp_processamento, id) > (%s, %s)
+              AND timestamp_processamento < LOCALTIMESTAMP - make_interval(secs => %s)
+            ORDER BY timestamp_processamento, id
+            LIMIT %s
+        """
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (desde, apos_id, ALTERACOES_MARGEM_SEGUNDOS, limite + 1))
+                rows = cur.fetchall()
+
+                tem_mais = len(rows) > limite
+                rows = rows[:limite]
+
+                cotacoes = [
+                    {
+                        "id": r[0],
+                        "timestamp_processamento": r[1],
+                        "ativo": r[2],
+                        "data_pregao": r[3],
+                        "abertura": float(r[4]),
+                        "fechamento": float(r[5]),
+                        "maximo": float(r[6]),
+                        "minimo": float(r[7]),
+                        "volume": r[8]
+                    }
+                    for r in rows
+                ]
+
+                # Sem linhas novas o watermark não muda
+                if rows:
+                    desde, apos_id = rows[-1][1], rows[-1][0]
+
+                return {
+                    "total": len(cotacoes),
+                    "tem_mais": tem_mais,
+                    "watermark": {"desde": desde.isoformat(), "apos_id": apos_id},
+                    "dados": cotacoes
+                }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/cotacoes/{codigo_ativo}")
+def buscar_historico_ativo(
+    codigo_ativo: str,
+    limite: int = Query(10, ge=1, le=100, description="Quantidade de registros (máx: 100)")
+):
+    """Histórico do ativo (limite padrão 10)."""
+    try:
+        query = """
+            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
+            FROM cotacoes
+            WHERE ativo = %s
+            ORDER BY data_pregao DESC
+            LIMIT %s
+        """
+        
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (codigo_ativo.upper(), limite))
+                rows = cur.fetchall()
+                
+                if not rows:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Nenhuma cotação encontrada para {codigo_ativo.upper()}"
+                    )
+                
+                cotacoes = [
+                    {
+                        "ativo": r[0],
+                        "data_pregao": r[1],
+                        "abertura": float(r[2]),
+                        "fechamento": float(r[3]),
+                        "maximo": float(r[4]),
+                        "minimo": float(r[5]),
+                        "volume": r[6]
+                    }
+                    for r in rows
+                ]
+                
+                return {
+                    "ativo": codigo_ativo.upper(),
+                    "total": len(cotacoes),
+                    "dados": cotacoes
+                }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/cotacoes/{codigo_ativo}/latest")
+def cotacao_mais_recente(codigo_ativo: str):
+    """Cotação mais recente do ativo."""
+    try:
+        query = """
+            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
+            FROM cotacoes
+            WHERE ativo = %s
+            ORDER BY data_pregao DESC
+            LIMIT 1
+        """
+        
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (codigo_ativo.upper(),))
+                row = cur.fetchone()
+                
+                if not row:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Ativo {codigo_ativo.upper()} não encontrado"
+                    )
+                
+                return {
+                    "ativo": row[0],
+                    "data_pregao": row[1],
+                    "abertura": float(row[2]),
+                    "fechamento": float(row[3]),
+                    "maximo": float(row[4]),
+                    "minimo": float(row[5]),
+                    "volume": row[6]
+                }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/ativos")
+def listar_ativos():
+    """Lista todos os ativos distintos."""
+    try:
+        query = "SELECT DISTINCT ativo FROM cotacoes ORDER BY ativo"
+        
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query)
+                ativos = [row[0] for row in cur.fetchall()]
+                
+                return {
+                    "total": len(ativos),
+                    "ativos": ativos
+                }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/cotacoes")
+def listar_cotacoes_sem_parametros():
+    """Lista todas as cotações (sem filtros)."""
+    try:
+        query = """
+            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
+            FROM cotacoes
+            ORDER BY data_pregao DESC, ativo
+        """
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query)
+                rows = cur.fetchall()
+
+                if not rows:
+                    raise HTTPException(status_code=404, detail="Nenhuma cotação encontrada")
+
+                cotacoes = [
+                    {
+                        "ativo": r[0],
+                        "data_pregao": r[1],
+                        "abertura": float(r[2]),
+                        "fechamento": float(r[3]),
+                        "maximo": float(r[4]),
+                        "minimo": float(r[5]),
+                        "volume": r[6]
+                    }
+                    for r in rows
+                ]
+
+                return {
+                    "total": len(cotacoes),
+                    "dados": cotacoes
+                }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/cotacoes/data/{data}")
+def listar_cotacoes_por_data(data: date):
+    """Cotações de uma data específica."""
+    try:
+        query = """
+            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume
+            FROM cotacoes
+            WHERE data_pregao = %s
+            ORDER BY ativo
+        """
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (data,))
+                rows = cur.fetchall()
+
+                if not rows:
+                    raise HTTPException(status_code=404, detail=f"Nenhuma cotação encontrada para a data {data}")
+
+                cotacoes = [
+                    {
+                        "ativo": r[0],
+                        "data_pregao": r[1],
+                        "abertura": float(r[2]),
+                        "fechamento": float(r[3]),
+                        "maximo": float(r[4]),
+                        "minimo": float(r[5]),
+                        "volume": r[6]
+                    }
+                    for r in rows
+                ]
+
+                return {
+                    "total": len(cotacoes),
+                    "data": str(data),
+                    "dados": cotacoes
+                }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/ativos/search")
+def buscar_ativos(
+    q: str = Query(..., min_length=1, max_length=12, description="Código ou parte dele (ex: PETR, VAEL3)"),
+    limite: int = Query(10, ge=1, le=50, description="Quantidade de sugestões (máx: 50)")
+):
+    """Ativos por prefixo ou com erro de digitação, ordenados por volume recente."""
+    try:
+        resultados = indice_ativos.buscar(q, limite)
+
+        return {
+            "q": q.strip().upper(),
+            "total": len(resultados),
+            "resultados": [
+                {"ativo": ativo, "volume_recente": volume, "tipo": tipo}
+                for ativo, volume, tipo in resultados
+            ]
+        }
+
+    except IndiceIndisponivel as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/ativos/intervalo")
+def listar_ativos_por_intervalo(
+    inicio: date = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    fim: date = Query(..., description="Data final (YYYY-MM-DD)"),
+    ativo: str = Query(..., description="Código do ativo (ex: PETR4)"),
+    pontos: Optional[int] = Query(None, ge=10, le=10000, description="Máximo de pontos (reduz séries longas para gráficos)"),
+    metodo: str = Query("lttb", pattern="^(lttb|minmax)$", description="Redução: lttb (formato da linha) ou minmax (picos)")
+):
+    """Fechamento diário do ativo entre duas datas (inclusive), opcionalmente reduzido."""
+    try:
+        if fim < inicio:
+            raise HTTPException(status_code=400, detail="A data final deve ser maior ou igual à inicial")
+
+        ativo_up = ativo.upper()
+
+        query = """
+            SELECT data_pregao::date AS data, fechamento
+            FROM cotacoes
+            WHERE data_pregao BETWEEN %s AND %s
+              AND ativo = %s
+            ORDER BY data_pregao ASC
+        """
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (inicio, fim, ativo_up))
+                rows = cur.fetchall()
+
+                if not rows:
+                    raise HTTPException(status_code=404, detail=f"Nenhum registro encontrado para {ativo_up} no intervalo informado")
+
+                total = len(rows)
+                if pontos and total > pontos:
+                    indices = downsampling.reduzir(
+                        [r[0].toordinal() for r in rows],
+                        [float(r[1]) for r in rows],
+                        pontos,
+                        metodo
+                    )
+                    rows = [rows[i] for i in indices]
+
+                serie = [
+                    {"data": str(r[0]), "fechamento": float(r[1])}
+                    for r in rows
+                ]
+
+                return {
+                    "inicio": str(inicio),
+                    "fim": str(fim),
+                    "ativo": ativo_up,
+                    "pontos_originais": total,
+                    "reducao": metodo if len(serie) < total else None,
+                    "serie": serie
+                }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.get("/api/ativos/ohlcv")
+def serie_ohlcv(
+    ativo: str = Query(..., description="Código do ativo (ex: PETR4)"),
+    inicio: Optional[date] = Query(None, description="Data inicial (padrão: 1 ano antes do fim)"),
+    fim: Optional[date] = Query(None, description="Data final (padrão: hoje)")
+):
+    """OHLCV diário do ativo no intervalo, em colunas (um array por campo)."""
+    try:
+        fim = fim or date.today()
+        inicio = inicio or fim - timedelta(days=365)
+        if fim < inicio:
+            raise HTTPException(status_code=400, detail="A data final deve ser maior ou igual à inicial")
+
+        ativo_up = ativo.upper()
+
+        # Tipos já prontos para JSON (texto/float8): sem Decimal nem date por linha
+        query = """
+            SELECT data_pregao::text, abertura::float8, maximo::float8,
+                   minimo::float8, fechamento::float8, volume
+            FROM cotacoes
+            WHERE ativo = %s
+              AND data_pregao BETWEEN %s AND %s
+            ORDER BY data_pregao ASC
+        """
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (ativo_up, inicio, fim))
+                rows = cur.fetchall()
+
+        if not rows:
+            raise HTTPException(status_code=404, detail=f"Nenhum registro encontrado para {ativo_up} no intervalo informado")
+
+        datas, abertura, maximo, minimo, fechamento, volume = (list(c) for c in zip(*rows))
+        corpo = json.dumps({
+            "ativo": ativo_up,
+            "inicio": str(inicio),
+            "fim": str(fim),
+            "total": len(rows),
+            "datas": datas,
+            "abertura": abertura,
+            "maximo": maximo,
+            "minimo": minimo,
+            "fechamento": fechamento,
+            "volume": volume
+        }, separators=(",", ":"))
+
+        return Response(content=corpo, media_type="application/json")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+def _calcular_snapshot(data: date):
+    # Uma passada: LAG() pega o fechamento do pregão anterior de cada ativo
+    query = """
+        WITH anterior AS (
+            SELECT MAX(data_pregao) AS data FROM cotacoes WHERE data_pregao < %(data)s
+        ),
+        base AS (
+            SELECT ativo, data_pregao, abertura, fechamento, maximo, minimo, volume,
+                   LAG(fechamento) OVER (PARTITION BY ativo ORDER BY data_pregao) AS fechamento_anterior
+            FROM cotacoes
+            WHERE data_pregao = %(data)s
+               OR data_pregao = (SELECT data FROM anterior)
+        )
+        SELECT ativo, abertura, fechamento, maximo, minimo, volume, fechamento_anterior,
+               fechamento / NULLIF(fechamento_anterior, 0) - 1 AS retorno,
+               RANK() OVER (ORDER BY volume DESC) AS rank_volume,
+               (SELECT data FROM anterior) AS data_anterior
+        FROM base
+        WHERE data_pregao = %(data)s
+        ORDER BY ativo
+    """
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, {"data": data})
+            rows = cur.fetchall()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Nenhuma cotação encontrada para a data {data}")
+
+    dados = [
+        {
+            "ativo": r[0],
+            "abertura": float(r[1]),
+            "fechamento": float(r[2]),
+            "maximo": float(r[3]),
+            "minimo": float(r[4]),
+            "volume": r[5],
+            "fechamento_anterior": float(r[6]) if r[6] is not None else None,
+            "retorno": round(float(r[7]), 6) if r[7] is not None else None,
+            "rank_volume": r[8]
+        }
+        for r in rows
+    ]
+    com_retorno = sorted((d for d in dados if d["retorno"] is not None), key=lambda d: d["retorno"])
+
+    return {
+        "data": str(data),
+        "data_anterior": str(rows[0][9]) if rows[0][9] else None,
+        "dados": dados,
+        "por_retorno": com_retorno,
+        "por_volume": sorted(dados, key=lambda d: d["rank_volume"])
+    }
+
+
+@app.get("/api/mercado/{data}")
+def snapshot_mercado(
+    data: date,
+    top: int = Query(10, ge=1, le=100, description="Quantidade de ativos nos rankings (máx: 100)")
+):
+    """Retorno de cada ativo vs. pregão anterior, ranking de volume e maiores altas/baixas."""
+    try:
+        snapshot = cache_mercado.get(str(data))
+        if snapshot is None:
+            snapshot = _calcular_snapshot(data)
+            cache_mercado.set(str(data), snapshot)
+
+        return {
+            "data": snapshot["data"],
+            "data_anterior": snapshot["data_anterior"],
+            "total": len(snapshot["dados"]),
+            "maiores_altas": snapshot["por_retorno"][::-1][:top],
+            "maiores_baixas": snapshot["por_retorno"][:top],
+            "mais_negociados": snapshot["por_volume"][:top],
+            "dados": snapshot["dados"]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+def _calcular_correlacao(codigos, inicio, fim, retorno, min_periodos):
+    # Uma consulta: uma linha por ativo com as séries já ordenadas (índice ativo, data_pregao)
+    query = """
+        SELECT ativo,
+               array_agg(data_pregao - DATE '1970-01-01' ORDER BY data_pregao),
+               array_agg(fechamento::float8 ORDER BY data_pregao)
+        FROM cotacoes
+        WHERE ativo = ANY(%s)
+          AND data_pregao BETWEEN %s AND %s
+        GROUP BY ativo
+        ORDER BY ativo
+    """
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, (codigos, inicio, fim))
+            series = cur.fetchall()
+
+    if len(series) < 2:
+        raise HTTPException(status_code=404, detail="Menos de 2 ativos com cotações no intervalo informado")
+
+    ativos, datas, precos = correlacao.matriz_precos(series)
+    cov, corr, _ = correlacao.cov_corr_pareadas(correlacao.retornos(precos, retorno), min_periodos)
+
+    encontrados = set(ativos)
+    return json.dumps({
+        "inicio": str(inicio),
+        "fim": str(fim),
+        "retorno": retorno,
+        "dias": len(datas),
+        "ativos": ativos,
+        "sem_dados": [c for c in codigos if c not in encontrados],
+        "correlacao": correlacao.para_json(corr),
+        "covariancia": correlacao.para_json(cov, casas=10)
+    }, separators=(",", ":")).encode("utf-8")
+
+
+@app.get("/api/correlacao")
+def matriz_correlacao(
+    ativos: str = Query(..., description="Códigos separados por vírgula (ex: PETR4,VALE3,ITUB4)"),
+    inicio: Optional[date] = Query(None, description="Data inicial (padrão: 1 ano antes do fim)"),
+    fim: Optional[date] = Query(None, description="Data final (padrão: hoje)"),
+    retorno: str = Query("log", pattern="^(log|simples)$", description="Tipo de retorno diário"),
+    min_periodos: int = Query(20, ge=2, description="Mínimo de dias em comum por par")
+):
+    """Correlação e covariância dos retornos diários entre os ativos na janela."""
+    try:
+        codigos = sorted({a.strip().upper() for a in ativos.split(",") if a.strip()})
+        if len(codigos) < 2:
+            raise HTTPException(status_code=400, detail="Informe pelo menos 2 ativos")
+        if len(codigos) > MAX_ATIVOS_CORRELACAO:
+            raise HTTPException(status_code=400, detail=f"Máximo de {MAX_ATIVOS_CORRELACAO} ativos por consulta")
+
+        fim = fim or date.today()
+        inicio = inicio or fim - timedelta(days=365)
+        if fim < inicio:
+            raise HTTPException(status_code=400, detail="A data final deve ser maior ou igual à inicial")
+
+        chave = (tuple(codigos), inicio.isoformat(), fim.isoformat(), retorno, min_periodos)
+        corpo = cache_correlacao.get(chave)
+        if corpo is None:
+            corpo = _calcular_correlacao(codigos, inicio, fim, retorno, min_periodos)
+            cache_correlacao.set(chave, corpo)
+
+        return Response(content=corpo, media_type="application/json")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
@@ -0,0 +1,249 @@
+"""
+Métricas da API em memória (por processo), expostas em /metrics no formato
+texto do Prometheus. Nenhum serviço ou biblioteca externa.
+
+Com o gunicorn (API_MODE=prod) cada worker tem os próprios contadores e
+/metrics responde pelo worker que atendeu a coleta: latências, contagens e
+processo_memoria_rss_bytes são de um processo, não do servidor inteiro.
+
+Cada requisição acumula o tempo gasto por fase (ContextVar, visível também
+na threadpool onde rodam os endpoints síncronos):
+
+- conexao: psycopg2.connect em get_db
+- consulta: cursor.execute (servidor + transferência do resultado)
+- leitura: cursor.fetch* (linhas do libpq -> tuplas Python)
+- processamento: o resto do endpoint até o início da resposta (dicts,
+  validação, jsonable_encoder)
+- serializacao: json.dumps da resposta (JSONResponseMedida, em main.py)
+
+Consultas acima de SLOW_QUERY_MS são logadas com SQL e parâmetros.
+
+O módulo não importa o FastAPI: app.database depende dele e o start.py usa
+app.database para verificar a revisão do banco antes de subir o servidor.
+"""
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Windows: sem RSS em /metrics
+    resource = None
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FASES = ("conexao", "consulta", "leitura", "processamento", "serializacao")
+
+_requisicao = ContextVar("metricas_requisicao", default=None)
+
+
+def _rotulos(chave):
+    if not chave:
+        return ""
+    pares = ",".join(f'{k}="{str(v)}"' for k, v in chave)
+    return "{" + pares + "}"
+
+
+def _valor(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def _cabecalho(self):
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor=1, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def renderizar(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        return self._cabecalho() + [f"{self.nome}{_rotulos(k)} {_valor(v)}" for k, v in itens]
+
+
+class Gauge(Contador):
+    tipo = "gauge"
+
+    def set(self, valor, **rotulos):
+        with self._lock:
+            self._valores[tuple(sorted(rotulos.items()))] = valor
+
+    def dec(self, valor=1, **rotulos):
+        self.inc(-valor, **rotulos)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, buckets=BUCKETS):
+        super().__init__(nome, ajuda)
+        self.buckets = buckets
+
+    def observe(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            estado = self._valores.get(chave)
+            if estado is None:
+                estado = self._valores[chave] = [[0] * len(self.buckets), 0, 0.0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    estado[0][i] += 1
+            estado[1] += 1
+            estado[2] += valor
+
+    def renderizar(self):
+        with self._lock:
+            itens = [(k, (list(e[0]), e[1], e[2])) for k, e in self._valores.items()]
+        linhas = self._cabecalho()
+        for chave, (contagens, total, soma) in itens:
+            for limite, contagem in zip(self.buckets, contagens):
+                linhas.append(f"{self.nome}_bucket{_rotulos(chave + (('le', repr(limite)),))} {contagem}")
+            linhas.append(f"{self.nome}_bucket{_rotulos(chave + (('le', '+Inf'),))} {total}")
+            linhas.append(f"{self.nome}_sum{_rotulos(chave)} {_valor(soma)}")
+            linhas.append(f"{self.nome}_count{_rotulos(chave)} {total}")
+        return linhas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def coletor(self, funcao):
+        """funcao() é chamada a cada scrape (ex.: atualizar gauges de caches)."""
+        self._coletores.append(funcao)
+        return funcao
+
+    def renderizar(self) -> str:
+        for funcao in self._coletores:
+            try:
+                funcao()
+            except Exception as e:
+                print(f"[WARNING] Coletor de métricas falhou: {e}")
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.renderizar())
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+requisicoes = registro.registrar(Contador("api_requisicoes_total", "Requisições HTTP por rota, método e status"))
+latencia = registro.registrar(Histograma("api_latencia_segundos", "Latência por rota e fase (total = requisição inteira)"))
+linhas_retornadas = registro.registrar(Contador("api_linhas_retornadas_total", "Linhas lidas do Postgres por rota"))
+consultas_lentas = registro.registrar(Contador("api_consultas_lentas_total", f"Consultas acima de {SLOW_QUERY_MS:.0f} ms por rota"))
+conexoes_total = registro.registrar(Contador("db_conexoes_total", "Conexões abertas com o Postgres (get_db)"))
+conexoes_erros = registro.registrar(Contador("db_conexoes_erros_total", "Falhas ao conectar no Postgres"))
+conexoes_abertas = registro.registrar(Gauge("db_conexoes_abertas", "Conexões com o Postgres abertas agora"))
+memoria = registro.registrar(Gauge("processo_memoria_rss_bytes", "Memória residente do processo (atual e pico)"))
+
+
+@registro.coletor
+def _coletar_memoria():
+    if resource is None:
+        return
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB no Linux
+    memoria.set(pico, tipo="pico")
+    try:
+        with open("/proc/self/statm") as f:
+            memoria.set(int(f.read().split()[1]) * resource.getpagesize(), tipo="atual")
+    except OSError:
+        pass
+
+
+# --- acumulação por requisição ---
+
+def _rota(scope):
+    # Template da rota (/api/cotacoes/{codigo_ativo}), não o path: cardinalidade fixa
+    return getattr(scope.get("route"), "path", None) or "nao_encontrada"
+
+
+def registrar_fase(fase, duracao):
+    contexto = _requisicao.get()
+    if contexto is not None:
+        contexto["fases"][fase] = contexto["fases"].get(fase, 0.0) + duracao
+    else:
+        # Fora de requisição (ex.: carga do índice de ativos)
+        latencia.observe(duracao, rota="segundo_plano", fase=fase)
+
+
+def registrar_consulta(sql, parametros, duracao):
+    registrar_fase("consulta", duracao)
+    if duracao * 1000 >= SLOW_QUERY_MS:
+        contexto = _requisicao.get()
+        consultas_lentas.inc(rota=_rota(contexto["scope"]) if contexto else "segundo_plano")
+        origem = contexto["scope"]["path"] if contexto else "segundo plano"
+        texto = re.sub(r"\s+", " ", sql if isinstance(sql, str) else str(sql)).strip()
+        print(f"[WARNING] Consulta lenta ({duracao * 1000:.0f} ms) em {origem}: {texto} | params={repr(parametros)[:500]}")
+
+
+def registrar_leitura(linhas, duracao):
+    registrar_fase("leitura", duracao)
+    contexto = _requisicao.get()
+    if contexto is not None:
+        contexto["linhas"] += linhas
+
+
+class MetricasMiddleware:
+    """Tempo total e por fase de cada requisição, por rota (template do path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        contexto = {"scope": scope, "fases": {}, "linhas": 0}
+        token = _requisicao.set(contexto)
+        inicio = time.perf_counter()
+        estado = {"status": 500, "inicio_resposta": None, "stream": False}
+
+        async def enviar(message):
+            if message["type"] == "http.response.start":
+                estado["status"] = message["status"]
+                estado["inicio_resposta"] = time.perf_counter()
+                tipo = dict(message.get("headers", [])).get(b"content-type", b"")
+                estado["stream"] = tipo.startswith(b"text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _requisicao.reset(token)
+            fim = time.perf_counter()
+            rota = _rota(scope)
+            requisicoes.inc(rota=rota, metodo=scope["method"], status=estado["status"])
+            if contexto["linhas"]:
+                linhas_retornadas.inc(contexto["linhas"], rota=rota)
+
+            # Streams (SSE) ficam abertos por minutos: só entram na contagem
+            if not estado["stream"]:
+                fases = contexto["fases"]
+                ate_resposta = (estado["inicio_resposta"] or fim) - inicio
+                fases["processamento"] = max(0.0, ate_resposta - sum(fases.values()))
+                for fase in FASES:
+                    if fase in fases:
+                        latencia.observe(fases[fase], rota=rota, fase=fase)
+                latencia.observe(fim - inicio, rota=rota, fase="total")
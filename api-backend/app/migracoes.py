@@ -0,0 +1,57 @@
+"""
+Revisão do schema sem carregar Alembic/SQLAlchemy.
+
+A head vem dos arquivos de alembic/versions (revision e down_revision lidos
+como texto) e a revisão aplicada de uma consulta a alembic_version. O
+start.py só roda `alembic upgrade head` quando as duas diferem.
+"""
+import re
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import errors as pg_errors
+
+VERSOES_DIR = Path(__file__).resolve().parent.parent / "alembic" / "versions"
+
+_REVISION = re.compile(r"^revision\b[^=]*=\s*['\"]([^'\"]+)['\"]", re.M)
+_DOWN_REVISION = re.compile(r"^down_revision\b[^=]*=\s*(.+)$", re.M)
+_LITERAL = re.compile(r"['\"]([^'\"]+)['\"]")
+
+
+def revisoes_head(diretorio=VERSOES_DIR) -> set:
+    """Revisões que nenhuma outra migração tem como down_revision."""
+    revisoes, anteriores = set(), set()
+    for arquivo in Path(diretorio).glob("*.py"):
+        texto = arquivo.read_text(encoding="utf-8")
+        revisao = _REVISION.search(texto)
+        if not revisao:
+            continue
+        revisoes.add(revisao.group(1))
+        anterior = _DOWN_REVISION.search(texto)
+        if anterior:
+            # None, 'x' ou ('x', 'y') em merges
+            anteriores.update(_LITERAL.findall(anterior.group(1)))
+    return revisoes - anteriores
+
+
+def revisoes_banco(conn) -> set:
+    """Revisões gravadas em alembic_version (vazio se o banco nunca foi migrado)."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT version_num FROM alembic_version")
+            return {r[0] for r in cur.fetchall()}
+    except pg_errors.UndefinedTable:
+        conn.rollback()
+        return set()
+
+
+def verificar(connect_timeout=5):
+    """(head, aplicadas); levanta psycopg2.Error se o banco não responder."""
+    from app.database import get_connection_params
+
+    head = revisoes_head()
+    conn = psycopg2.connect(**get_connection_params(), connect_timeout=connect_timeout)
+    try:
+        return head, revisoes_banco(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,115 @@
+"""
+Benchmark do tamanho de payload de gráficos longos com e sem redução de pontos
+
+Execução (a partir de api-backend/):
+    python benchmarks/bench_payload.py                 # 10 anos, 1 e 20 ativos
+    python benchmarks/bench_payload.py --anos 20 --ativos 50
+
+Para cada modo mede, sobre séries sintéticas (passeio aleatório, ~252
+pregões/ano), o JSON de /api/ativos/intervalo (bruto e com gzip, como sai do
+GZipMiddleware), o tempo de redução e, se o plotly estiver instalado, o JSON
+da figura que o Streamlit envia ao navegador.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.downsampling import reduzir
+
+PREGOES_ANO = 252
+
+try:
+    import plotly.graph_objects as go
+except ImportError:
+    go = None
+
+
+def gerar_serie(anos, semente):
+    """[(data, fechamento)] em dias úteis (seg-sex) a partir de hoje - anos."""
+    rnd = random.Random(semente)
+    dia = date.today() - timedelta(days=365 * anos)
+    preco = rnd.uniform(5, 100)
+    serie = []
+    while len(serie) < anos * PREGOES_ANO:
+        if dia.weekday() < 5:
+            preco = max(0.01, preco * (1 + rnd.gauss(0, 0.02)))
+            serie.append((dia, round(preco, 2)))
+        dia += timedelta(days=1)
+    return serie
+
+
+def payload(ativo, serie):
+    # Mesmo formato de /api/ativos/intervalo
+    return json.dumps({
+        "ativo": ativo,
+        "serie": [{"data": str(d), "fechamento": f} for d, f in serie]
+    }).encode("utf-8")
+
+
+def tamanho_figura(series):
+    if go is None:
+        return None
+    tracos = [
+        (go.Scattergl if len(s) > 1000 else go.Scatter)(x=[d for d, _ in s], y=[f for _, f in s], mode="lines")
+        for s in series
+    ]
+    return len(go.Figure(data=tracos).to_json().encode("utf-8"))
+
+
+def medir(nome, series, pontos, metodo):
+    t0 = time.perf_counter()
+    reduzidas = []
+    for serie in series:
+        if pontos:
+            indices = reduzir([d.toordinal() for d, _ in serie], [f for _, f in serie], pontos, metodo)
+            serie = [serie[i] for i in indices]
+        reduzidas.append(serie)
+    ms_reducao = 1000 * (time.perf_counter() - t0)
+
+    corpos = [payload(f"ZB{i:02d}3", s) for i, s in enumerate(reduzidas)]
+    return {
+        "modo": nome,
+        "pontos": sum(len(s) for s in reduzidas),
+        "json_kb": sum(len(c) for c in corpos) / 1024,
+        "gzip_kb": sum(len(gzip.compress(c, compresslevel=9)) for c in corpos) / 1024,
+        "ms_reducao": ms_reducao,
+        "figura_kb": (tamanho_figura(reduzidas) or 0) / 1024 if go else None,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark de payload de séries longas")
+    arg_parser.add_argument("--anos", type=int, default=10, help="Anos de pregão por série (padrão: 10)")
+    arg_parser.add_argument("--ativos", type=int, nargs="+", default=[1, 20], help="Quantidades de ativos (padrão: 1 20)")
+    args = arg_parser.parse_args()
+
+    modos = [
+        ("completa", None, None),
+        ("lttb-1200", 1200, "lttb"),
+        ("lttb-500", 500, "lttb"),
+        ("minmax-1200", 1200, "minmax"),
+    ]
+
+    for quantidade in args.ativos:
+        series = [gerar_serie(args.anos, semente) for semente in range(quantidade)]
+        print(f"\n🧪 {quantidade} ativo(s) x {args.anos} anos = {sum(len(s) for s in series):,} pontos")
+        print(f"{'modo':<12} {'pontos':>9} {'JSON KB':>9} {'gzip KB':>9} {'figura KB':>10} {'redução ms':>11}")
+        for nome, pontos, metodo in modos:
+            r = medir(nome, series, pontos, metodo)
+            figura = f"{r['figura_kb']:>10.1f}" if r["figura_kb"] is not None else f"{'-':>10}"
+            print(f"{r['modo']:<12} {r['pontos']:>9,} {r['json_kb']:>9.1f} {r['gzip_kb']:>9.1f} {figura} {r['ms_reducao']:>11.1f}")
+
+    if go is None:
+        print("\n(plotly não instalado: tamanho da figura não medido)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Teste de carga da API com massa sintética no Postgres local
+
+Execução (a partir de api-backend/):
+    python benchmarks/carga_api.py --semear --anos 5 --ativos 200 --iniciar
+    python benchmarks/carga_api.py --mix graficos --concorrencia 32 --duracao 60
+    python benchmarks/carga_api.py --mix todos --iniciar --historico resultados_carga.jsonl
+
+Dev x produção (a segunda execução é comparada com a primeira):
+    python benchmarks/carga_api.py --iniciar --servidor dev --historico servidores.jsonl
+    python benchmarks/carga_api.py --iniciar --servidor prod --historico servidores.jsonl
+    python benchmarks/carga_api.py --limpar
+
+--semear grava N anos x M ativos sintéticos (ZB??3, dias úteis até hoje) com
+COPY no Postgres do .env, substituindo os da semeadura anterior, e avisa a API
+pelo canal do ETL (os caches dos dias gravados são invalidados). --limpar
+remove essas cotações.
+
+--iniciar sobe a API em --porta só para a medição: --servidor dev é o
+uvicorn em um processo (como o start.py padrão, sem --reload) e prod é o
+gunicorn com gunicorn.conf.py (API_MODE=prod). Sem --iniciar, o tráfego vai
+para a API em --url.
+
+Cada thread do cliente mantém uma conexão HTTP keep-alive e sorteia, pelos
+pesos do mix, o próximo endpoint (tickers e datas vêm de /api/ativos e
+/api/cotacoes/datas). Pede gzip como o frontend, mas sem If-None-Match: toda
+resposta é completa. Os primeiros --aquecimento segundos ficam fora das
+estatísticas. O cliente também é Python: com respostas pequenas e muitos
+milhares de RPS, o gargalo pode ser ele.
+
+Relatório: RPS, p50/p95/p99, KB médios e erros por endpoint e no total, e a
+memória do servidor antes e depois. Com --iniciar, é a soma do RSS do
+processo e dos filhos (master e workers do gunicorn), lida em /proc. Sem
+--iniciar, vem de processo_memoria_rss_bytes em /metrics, que mede só o
+worker que atendeu a coleta.
+"""
+
+import argparse
+import csv
+import http.client
+import io
+import itertools
+import json
+import os
+import random
+import re
+import string
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+API_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(API_DIR))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PREFIXO_TICKER = "ZB"
+TAMANHO_LOTE = 50  # ativos por COPY
+
+_COPY_SQL = """
+    COPY cotacoes (ativo, data_pregao, abertura, fechamento, maximo, minimo, volume)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# Mesmo aviso do PostgresLoader do ETL: a API invalida os caches de cada data
+_NOTIFY_SQL = """
+    SELECT pg_notify(%s, json_build_object(
+        'data', data_pregao,
+        'total', COUNT(*),
+        'versao', MAX(timestamp_processamento)
+    )::text)
+    FROM cotacoes
+    WHERE data_pregao = ANY(%s::date[])
+    GROUP BY data_pregao
+"""
+
+
+# --- massa sintética ---
+
+def _tickers(quantidade):
+    letras = itertools.islice(itertools.product(string.ascii_uppercase, repeat=2), quantidade)
+    return [f"{PREFIXO_TICKER}{a}{b}3" for a, b in letras]
+
+
+def _dias_uteis(anos):
+    fim = date.today()
+    dia = fim - timedelta(days=round(365.25 * anos))
+    datas = []
+    while dia <= fim:
+        if dia.weekday() < 5:
+            datas.append(dia)
+        dia += timedelta(days=1)
+    return datas
+
+
+def _conectar():
+    import psycopg2
+    from app.database import get_connection_params
+    return psycopg2.connect(**get_connection_params())
+
+
+def limpar():
+    conn = _conectar()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM cotacoes WHERE ativo LIKE %s", (f"{PREFIXO_TICKER}%",))
+            print(f"🧹 {cur.rowcount:,} cotações sintéticas removidas")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def semear(anos, ativos, semente=42):
+    """Grava anos x ativos de cotações em passeio aleatório (COPY em lotes)."""
+    from app.eventos import CANAL
+
+    if ativos > 26 * 26:
+        raise ValueError(f"No máximo {26 * 26} ativos sintéticos (pedidos: {ativos})")
+    rnd = random.Random(semente)
+    datas = _dias_uteis(anos)
+    tickers = _tickers(ativos)
+    inicio = time.perf_counter()
+
+    conn = _conectar()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM cotacoes WHERE ativo LIKE %s", (f"{PREFIXO_TICKER}%",))
+            for i in range(0, len(tickers), TAMANHO_LOTE):
+                buffer = io.StringIO()
+                escritor = csv.writer(buffer)
+                for ticker in tickers[i:i + TAMANHO_LOTE]:
+                    preco = rnd.uniform(5, 100)
+                    for data_pregao in datas:
+                        abertura = preco
+                        preco = max(0.01, preco * (1 + rnd.gauss(0, 0.02)))
+                        escritor.writerow((
+                            ticker, data_pregao.isoformat(), f"{abertura:.2f}", f"{preco:.2f}",
+                            f"{max(abertura, preco) * 1.01:.2f}", f"{min(abertura, preco) * 0.99:.2f}",
+                            rnd.randint(100, 10_000_000),
+                        ))
+                buffer.seek(0)
+                cur.copy_expert(_COPY_SQL, buffer)
+            cur.execute(_NOTIFY_SQL, (CANAL, datas))
+        conn.commit()
+
+        # Estatísticas atualizadas: sem isso o planner usa as da tabela antes da carga
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE cotacoes")
+    finally:
+        conn.close()
+
+    print(f"🌱 {len(datas) * len(tickers):,} cotações sintéticas ({len(tickers)} ativos x "
+          f"{len(datas)} pregões) em {time.perf_counter() - inicio:.1f}s")
+
+
+# --- tráfego ---
+
+def _periodo(ctx, rnd, dias):
+    fim = rnd.choice(ctx["datas"][-60:])
+    return (date.fromisoformat(fim) - timedelta(days=dias)).isoformat(), fim
+
+
+# nome -> gerador do caminho (ctx, rnd)
+ENDPOINTS = {
+    "ativos": lambda ctx, rnd: "/api/ativos",
+    "busca": lambda ctx, rnd: f"/api/ativos/search?q={rnd.choice(ctx['tickers'])[:rnd.randint(2, 5)]}",
+    "historico": lambda ctx, rnd: f"/api/cotacoes/{rnd.choice(ctx['tickers'])}?limite=100",
+    "ultima": lambda ctx, rnd: f"/api/cotacoes/{rnd.choice(ctx['tickers'])}/latest",
+    "datas": lambda ctx, rnd: "/api/cotacoes/datas",
+    "dia": lambda ctx, rnd: f"/api/cotacoes/data/{rnd.choice(ctx['datas'])}",
+    "mercado": lambda ctx, rnd: f"/api/mercado/{rnd.choice(ctx['datas'])}",
+    "intervalo": lambda ctx, rnd: (
+        f"/api/ativos/intervalo?ativo={rnd.choice(ctx['tickers'])}&inicio={ctx['datas'][0]}&fim={ctx['datas'][-1]}"
+    ),
+    "intervalo_1200": lambda ctx, rnd: (
+        f"/api/ativos/intervalo?ativo={rnd.choice(ctx['tickers'])}"
+        f"&inicio={ctx['datas'][0]}&fim={ctx['datas'][-1]}&pontos=1200"
+    ),
+    "ohlcv": lambda ctx, rnd: f"/api/ativos/ohlcv?ativo={rnd.choice(ctx['tickers'])}",
+    "correlacao": lambda ctx, rnd: (
+        "/api/correlacao?ativos={}&inicio={}&fim={}".format(
+            ",".join(rnd.sample(ctx["tickers"], min(5, len(ctx["tickers"])))), *_periodo(ctx, rnd, 365))
+    ),
+    "alteracoes": lambda ctx, rnd: "/api/cotacoes/alteracoes?limite=5000",
+    "tabela": lambda ctx, rnd: "/api/cotacoes",
+}
+
+# mix -> {endpoint: peso}
+MIXES = {
+    "navegacao": {"ativos": 2, "busca": 4, "historico": 4, "ultima": 4, "datas": 1, "dia": 2, "mercado": 2},
+    "graficos": {"intervalo": 3, "intervalo_1200": 3, "ohlcv": 3, "correlacao": 1, "mercado": 1},
+    "tabela": {"tabela": 1},
+    "todos": {
+        "ativos": 2, "busca": 4, "historico": 4, "ultima": 4, "datas": 1, "dia": 2, "mercado": 2,
+        "intervalo": 2, "intervalo_1200": 2, "ohlcv": 2, "correlacao": 1, "alteracoes": 1, "tabela": 1,
+    },
+}
+
+
+def _conexao(url, timeout):
+    partes = urlsplit(url)
+    classe = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+    return classe(partes.hostname, partes.port, timeout=timeout)
+
+
+def _get_json(url, caminho, timeout=60):
+    conn = _conexao(url, timeout)
+    try:
+        conn.request("GET", caminho)
+        resposta = conn.getresponse()
+        corpo = resposta.read()
+        if resposta.status != 200:
+            raise RuntimeError(f"GET {caminho}: HTTP {resposta.status}")
+        return json.loads(corpo)
+    finally:
+        conn.close()
+
+
+def memoria_servidor(url):
+    """{"atual", "pico"} em MB a partir de /metrics (None se indisponível)."""
+    conn = _conexao(url, 10)
+    try:
+        conn.request("GET", "/metrics")
+        texto = conn.getresponse().read().decode("utf-8")
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+    valores = dict(re.findall(r'processo_memoria_rss_bytes\{tipo="(\w+)"\} (\S+)', texto))
+    return {tipo: round(float(v) / 1e6, 1) for tipo, v in valores.items()} or None
+
+
+def _filhos(pid):
+    # Descendentes pelo campo ppid de /proc/<pid>/stat
+    por_pai = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        por_pai.setdefault(int(campos[1]), []).append(int(entrada))
+    pendentes, todos = [pid], []
+    while pendentes:
+        atual = pendentes.pop()
+        todos.append(atual)
+        pendentes.extend(por_pai.get(atual, []))
+    return todos
+
+
+def memoria_processos(pid):
+    """{"atual", "pico", "processos"} em MB somando o processo e os filhos (None sem /proc)."""
+    if not os.path.isdir("/proc"):
+        return None
+    atual = pico = 0
+    processos = 0
+    for filho in _filhos(pid):
+        try:
+            with open(f"/proc/{filho}/status") as f:
+                status = dict(linha.split(":", 1) for linha in f if ":" in linha)
+        except OSError:
+            continue
+        atual += int(status.get("VmRSS", "0 kB").split()[0])
+        # Soma dos picos individuais: limite superior do pico conjunto
+        pico += int(status.get("VmHWM", "0 kB").split()[0])
+        processos += 1
+    return {"atual": round(atual / 1024, 1), "pico": round(pico / 1024, 1), "processos": processos}
+
+
+def _contexto(url):
+    ativos = _get_json(url, "/api/ativos")["ativos"]
+    datas = [d["data"] for d in _get_json(url, "/api/cotacoes/datas")["datas"]]
+    sinteticos = [a for a in ativos if a.startswith(PREFIXO_TICKER)]
+    # Com massa semeada, o tráfego vai para ela (séries completas e conhecidas)
+    return {"tickers": sinteticos or ativos, "datas": datas}
+
+
+def _trabalhador(url, mix, ctx, semente, inicio_medicao, fim, timeout, resultados):
+    rnd = random.Random(semente)
+    nomes, pesos = list(mix), list(mix.values())
+    conn = None
+    while time.perf_counter() < fim:
+        nome = rnd.choices(nomes, pesos)[0]
+        caminho = ENDPOINTS[nome](ctx, rnd)
+        inicio = time.perf_counter()
+        status, tamanho = None, 0
+        try:
+            if conn is None:
+                conn = _conexao(url, timeout)
+            conn.request("GET", caminho, headers={"Accept-Encoding": "gzip"})
+            resposta = conn.getresponse()
+            tamanho = len(resposta.read())
+            status = resposta.status
+        except (OSError, http.client.HTTPException):
+            if conn is not None:
+                conn.close()
+            conn = None
+        if inicio >= inicio_medicao:
+            resultados.append((nome, time.perf_counter() - inicio, status, tamanho))
+    if conn is not None:
+        conn.close()
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def _estatisticas(amostras, janela):
+    tempos = sorted(d for _, d, _, _ in amostras)
+    if not tempos:
+        return None
+    return {
+        "requisicoes": len(tempos),
+        "rps": round(len(tempos) / janela, 1),
+        "p50_ms": round(1000 * _percentil(tempos, 50), 1),
+        "p95_ms": round(1000 * _percentil(tempos, 95), 1),
+        "p99_ms": round(1000 * _percentil(tempos, 99), 1),
+        "kb_medio": round(sum(t for _, _, _, t in amostras) / len(amostras) / 1024, 1),
+        "erros": sum(1 for _, _, s, _ in amostras if s is None or s >= 400),
+    }
+
+
+def executar(url, mix, concorrencia, duracao, aquecimento, timeout):
+    ctx = _contexto(url)
+    if not ctx["tickers"] or not ctx["datas"]:
+        raise RuntimeError("API sem cotações: rode com --semear ou carregue dados pelo ETL")
+
+    inicio = time.perf_counter()
+    inicio_medicao = inicio + aquecimento
+    fim = inicio_medicao + duracao
+    por_thread = [[] for _ in range(concorrencia)]
+    threads = [
+        threading.Thread(target=_trabalhador,
+                         args=(url, MIXES[mix], ctx, i, inicio_medicao, fim, timeout, por_thread[i]),
+                         daemon=True)
+        for i in range(concorrencia)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    janela = max(time.perf_counter(), fim) - inicio_medicao
+
+    amostras = [a for lista in por_thread for a in lista]
+    por_endpoint = {}
+    for nome in MIXES[mix]:
+        estatisticas = _estatisticas([a for a in amostras if a[0] == nome], janela)
+        if estatisticas:
+            por_endpoint[nome] = estatisticas
+    return _estatisticas(amostras, janela), por_endpoint
+
+
+# --- servidor local ---
+
+def iniciar_servidor(porta, servidor="dev", espera=60):
+    if servidor == "prod":
+        comando = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                   "--bind", f"127.0.0.1:{porta}", "--log-level", "warning", "app.main:app"]
+    else:
+        comando = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                   "--port", str(porta), "--log-level", "warning"]
+    processo = subprocess.Popen(comando, cwd=API_DIR)
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"{comando[2]} encerrou com código {processo.returncode}")
+        if memoria_servidor(url) is not None:
+            return processo, url
+        time.sleep(0.5)
+    processo.terminate()
+    raise RuntimeError(f"API não respondeu em {espera}s")
+
+
+def _anterior(historico, parametros):
+    if not historico or not historico.exists():
+        return None
+    ultimo = None
+    for linha in historico.read_text(encoding="utf-8").splitlines():
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            continue
+        if registro.get("parametros") == parametros:
+            ultimo = registro
+    return ultimo
+
+
+def _imprimir(total, por_endpoint, memoria_antes, memoria_depois, anterior):
+    print(f"\n{'endpoint':<15} {'req':>7} {'RPS':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KB':>8} {'erros':>6}")
+    for nome, e in list(por_endpoint.items()) + [("TOTAL", total)]:
+        print(f"{nome:<15} {e['requisicoes']:>7,} {e['rps']:>8.1f} {e['p50_ms']:>8.1f} {e['p95_ms']:>8.1f} "
+              f"{e['p99_ms']:>8.1f} {e['kb_medio']:>8.1f} {e['erros']:>6}")
+
+    if memoria_depois:
+        antes = (memoria_antes or {}).get("atual")
+        if memoria_depois.get("processos"):
+            origem = f"servidor, {memoria_depois['processos']} processo(s)"
+        else:
+            origem = "um worker, via /metrics"
+        print(f"\n🧠 RSS ({origem}): {antes} -> {memoria_depois.get('atual')} MB "
+              f"(pico {memoria_depois.get('pico')} MB)")
+
+    if anterior:
+        t = anterior["total"]
+        print(f"\n📈 vs {anterior['quando']} ({anterior.get('servidor') or anterior['url']}): RPS {t['rps']} -> {total['rps']} "
+              f"({total['rps'] / t['rps'] - 1:+.1%}), p95 {t['p95_ms']} -> {total['p95_ms']} ms, "
+              f"p99 {t['p99_ms']} -> {total['p99_ms']} ms")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Teste de carga da API com massa sintética")
+    arg_parser.add_argument("--url", default=os.getenv("API_URL", "http://127.0.0.1:8000"),
+                            help="API alvo quando não usar --iniciar (padrão: API_URL ou http://127.0.0.1:8000)")
+    arg_parser.add_argument("--iniciar", action="store_true", help="Sobe a API localmente só para a medição")
+    arg_parser.add_argument("--servidor", choices=["dev", "prod"], default="dev",
+                            help="Com --iniciar: uvicorn em um processo (dev) ou gunicorn.conf.py (prod)")
+    arg_parser.add_argument("--porta", type=int, default=8765, help="Porta do servidor de --iniciar (padrão: 8765)")
+    arg_parser.add_argument("--semear", action="store_true", help="Grava a massa sintética antes da medição")
+    arg_parser.add_argument("--anos", type=int, default=5, help="Anos de pregão semeados (padrão: 5)")
+    arg_parser.add_argument("--ativos", type=int, default=200, help="Ativos semeados (padrão: 200)")
+    arg_parser.add_argument("--limpar", action="store_true", help="Remove a massa sintética e sai")
+    arg_parser.add_argument("--mix", choices=list(MIXES), default="navegacao", help="Mix de tráfego (padrão: navegacao)")
+    arg_parser.add_argument("--concorrencia", type=int, default=16, help="Clientes simultâneos (padrão: 16)")
+    arg_parser.add_argument("--duracao", type=float, default=30, help="Segundos medidos (padrão: 30)")
+    arg_parser.add_argument("--aquecimento", type=float, default=5, help="Segundos descartados no início (padrão: 5)")
+    arg_parser.add_argument("--timeout", type=float, default=120, help="Timeout por requisição em s (padrão: 120)")
+    arg_parser.add_argument("--historico", type=Path, help="JSONL onde acrescentar o resultado e comparar com o anterior")
+    args = arg_parser.parse_args()
+
+    if args.limpar:
+        limpar()
+        return
+    if args.semear:
+        semear(args.anos, args.ativos)
+
+    processo = None
+    url = args.url
+    try:
+        if args.iniciar:
+            processo, url = iniciar_servidor(args.porta, args.servidor)
+
+        print(f"🚦 {args.mix}: {args.concorrencia} clientes x {args.duracao:.0f}s "
+              f"(+{args.aquecimento:.0f}s de aquecimento) em {url}")
+        # Servidor próprio: soma master e workers; senão, /metrics (um worker só)
+        def medir_memoria():
+            return (processo and memoria_processos(processo.pid)) or memoria_servidor(url)
+
+        memoria_antes = medir_memoria()
+        total, por_endpoint = executar(url, args.mix, args.concorrencia, args.duracao, args.aquecimento, args.timeout)
+        memoria_depois = medir_memoria()
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(timeout=30)
+
+    if total is None:
+        print("❌ Nenhuma requisição concluída na janela medida")
+        sys.exit(1)
+
+    parametros = {"mix": args.mix, "concorrencia": args.concorrencia, "duracao": args.duracao}
+    anterior = _anterior(args.historico, parametros)
+    _imprimir(total, por_endpoint, memoria_antes, memoria_depois, anterior)
+
+    if args.historico:
+        registro = {
+            "quando": datetime.now().isoformat(timespec="seconds"),
+            "url": url,
+            "servidor": args.servidor if args.iniciar else None,
+            "parametros": parametros,
+            "total": total,
+            "endpoints": por_endpoint,
+            "memoria_mb": memoria_depois,
+        }
+        args.historico.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.historico, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        print(f"\n📝 Histórico: {args.historico}")
+
+
+if __name__ == "__main__":
+    main()
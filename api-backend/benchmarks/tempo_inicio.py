@@ -0,0 +1,111 @@
+"""
+Tempo até a primeira requisição: do `python start.py` à primeira resposta 200
+
+Execução (a partir de api-backend/, com o Postgres do .env no ar):
+    python benchmarks/tempo_inicio.py                        # always x auto, API_MODE=prod
+    python benchmarks/tempo_inicio.py --modo dev --repeticoes 5
+    python benchmarks/tempo_inicio.py --migracoes auto skip
+
+Para cada valor de API_MIGRATIONS, inicia o start.py --repeticoes vezes em
+uma porta livre e mede o tempo até --caminho responder 200 (consulta real ao
+banco, não só o processo no ar). "always" reproduz o comportamento antigo:
+`alembic upgrade head` em subprocesso a cada inicialização.
+"""
+
+import argparse
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _responde(porta, caminho):
+    conn = http.client.HTTPConnection("127.0.0.1", porta, timeout=5)
+    try:
+        conn.request("GET", caminho)
+        resposta = conn.getresponse()
+        resposta.read()
+        return resposta.status == 200
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+
+def _encerrar(processo):
+    # Em dev o start.py roda o uvicorn como filho: encerra o grupo inteiro
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(processo.pid, signal.SIGTERM)
+        else:
+            processo.terminate()
+        processo.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        processo.kill()
+
+
+def medir(modo, migracoes, caminho, espera):
+    porta = _porta_livre()
+    env = dict(os.environ, API_MODE=modo, API_MIGRATIONS=migracoes,
+               API_HOST="127.0.0.1", API_PORT=str(porta), PORT=str(porta))
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "start.py"], cwd=API_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=hasattr(os, "killpg"),
+    )
+    try:
+        while time.perf_counter() - inicio < espera:
+            if processo.poll() is not None:
+                raise RuntimeError(f"start.py encerrou com código {processo.returncode}")
+            if _responde(porta, caminho):
+                return time.perf_counter() - inicio
+            time.sleep(0.05)
+        raise RuntimeError(f"sem resposta 200 em {caminho} após {espera}s")
+    finally:
+        _encerrar(processo)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Tempo até a primeira requisição da API")
+    arg_parser.add_argument("--modo", choices=["dev", "prod"], default="prod", help="API_MODE (padrão: prod)")
+    arg_parser.add_argument("--migracoes", nargs="+", default=["always", "auto"],
+                            choices=["always", "auto", "skip"], help="Valores de API_MIGRATIONS (padrão: always auto)")
+    arg_parser.add_argument("--repeticoes", type=int, default=3, help="Inicializações por valor (padrão: 3)")
+    arg_parser.add_argument("--caminho", default="/api/cotacoes/datas", help="Requisição aguardada (padrão: /api/cotacoes/datas)")
+    arg_parser.add_argument("--espera", type=float, default=120, help="Limite por inicialização em s (padrão: 120)")
+    args = arg_parser.parse_args()
+
+    print(f"⏱️  API_MODE={args.modo}, {args.repeticoes} inicialização(ões) por modo, até GET {args.caminho} = 200\n")
+    resultados = {}
+    for migracoes in args.migracoes:
+        tempos = []
+        for _ in range(max(1, args.repeticoes)):
+            tempos.append(medir(args.modo, migracoes, args.caminho, args.espera))
+        resultados[migracoes] = tempos
+        print(f"   {migracoes:<7} mediana {statistics.median(tempos):6.2f}s  "
+              f"(mín {min(tempos):.2f}s, máx {max(tempos):.2f}s)")
+
+    if "always" in resultados and len(resultados) > 1:
+        base = statistics.median(resultados["always"])
+        for migracoes, tempos in resultados.items():
+            if migracoes != "always":
+                mediana = statistics.median(tempos)
+                print(f"\n📉 {migracoes}: {base - mediana:.2f}s a menos que always ({mediana / base - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Configuração do gunicorn para produção (lida automaticamente quando o
+gunicorn roda a partir de api-backend/, como no App Service, ou via
+`python start.py` com API_MODE=prod).
+
+Workers UvicornWorker: o uvicorn escolhe uvloop e httptools quando instalados
+(uvicorn[standard]). Com preload_app o app é importado uma vez no master e
+herdado pelos workers; o que abre conexões ou threads (LISTEN do notificador,
+índice de ativos) roda no lifespan, já dentro de cada worker.
+
+Reinício gracioso: `kill -HUP <master>` troca os workers um a um. Com
+preload_app o código novo só entra com o master reiniciado.
+"""
+import multiprocessing
+import os
+
+# App Service informa a porta em PORT
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('PORT') or os.getenv('API_PORT', '8000')}"
+
+# Endpoints síncronos rodam na threadpool de cada worker; 2 x núcleos + 1
+# cobre a espera por Postgres sem multiplicar demais as conexões
+workers = int(os.getenv("WEB_CONCURRENCY") or 2 * multiprocessing.cpu_count() + 1)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Keep-alive maior que o idle timeout de balanceadores comuns (60 s): quem
+# fecha a conexão ociosa é o balanceador, não o servidor no meio de um request
+keepalive = int(os.getenv("KEEPALIVE_SEGUNDOS", "75"))
+
+# Sem heartbeat por esse tempo o worker é reiniciado; requests longos
+# (/api/cotacoes inteira, SSE) não bloqueiam o loop e não disparam isso
+timeout = 120
+graceful_timeout = 30
+
+# Recicla workers aos poucos: limita o crescimento de memória por fragmentação
+max_requests = int(os.getenv("MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
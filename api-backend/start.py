@@ -1,55 +1,133 @@
-"""
-Script de inicialização da API
-Roda migrações automaticamente antes de iniciar o servidor
-"""
-import subprocess
-import sys
-import os
-from dotenv import load_dotenv
-
-# Carrega variáveis de ambiente
-load_dotenv()
-
-def run_migrations():
-    """Executa migrações do Alembic"""
-    print("🔄 Executando migrações do banco de dados...")
-    try:
-        result = subprocess.run(
-            ["alembic", "upgrade", "head"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print("✅ Migrações aplicadas com sucesso!")
-        if result.stdout:
-            print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print("❌ Erro ao executar migrações:")
-        print(e.stderr)
-        return False
-    except FileNotFoundError:
-        print("⚠️ Alembic não encontrado. Pulando migrações...")
-        return True
-
-def start_server():
-    """Inicia o servidor Uvicorn"""
-    print("🚀 Iniciando servidor...")
-    host = os.getenv("API_HOST", "0.0.0.0")
-    port = int(os.getenv("API_PORT", "8000"))
-
-    subprocess.run([
-        "uvicorn",
-        "app.main:app",
-        "--host", host,
-        "--port", str(port),
-        "--reload"
-    ])
-
-if __name__ == "__main__":
-    # Roda migrações
-    if not run_migrations():
-        print("⚠️ Continuando mesmo com erros nas migrações...")
-    
-    # Inicia servidor
-    start_server()
+"""
+Script de inicialização da API
+Roda migrações automaticamente antes de iniciar o servidor
+
+API_MODE=dev (padrão): uvicorn com --reload, um processo
+API_MODE=prod: gunicorn com workers uvicorn (gunicorn.conf.py); no Windows,
+sem gunicorn, uvicorn --workers com o mesmo número de workers
+
+API_MIGRATIONS=auto (padrão): compara a revisão do banco com a head das
+migrações e só chama o Alembic se estiver desatualizado
+API_MIGRATIONS=always: roda `alembic upgrade head` a cada inicialização
+API_MIGRATIONS=skip: não verifica (migrações feitas por um job separado)
+
+`python start.py migrate` só aplica as migrações pendentes e sai (ignora o skip).
+"""
+import runpy
+import subprocess
+import sys
+import os
+import time
+from importlib.util import find_spec
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+def run_migrations():
+    """Executa migrações do Alembic"""
+    print("🔄 Executando migrações do banco de dados...")
+    try:
+        result = subprocess.run(
+            ["alembic", "upgrade", "head"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        print("✅ Migrações aplicadas com sucesso!")
+        if result.stdout:
+            print(result.stdout)
+        return True
+    except subprocess.CalledProcessError as e:
+        print("❌ Erro ao executar migrações:")
+        print(e.stderr)
+        return False
+    except FileNotFoundError:
+        print("⚠️ Alembic não encontrado. Pulando migrações...")
+        return True
+
+def migrations_pending():
+    """Verifica a revisão do banco sem subprocesso nem SQLAlchemy"""
+    from app.migracoes import verificar
+
+    inicio = time.perf_counter()
+    try:
+        head, aplicadas = verificar()
+    except Exception as e:
+        # Sem como verificar: o Alembic roda e reporta o erro
+        print(f"⚠️ Não foi possível verificar a revisão do banco: {e}")
+        return True
+
+    ms = 1000 * (time.perf_counter() - inicio)
+    if aplicadas == head:
+        print(f"✅ Banco na revisão {', '.join(sorted(head))} ({ms:.0f} ms). Migrações dispensadas.")
+        return False
+    print(f"🔄 Banco na revisão {', '.join(sorted(aplicadas)) or 'nenhuma'}, "
+          f"head {', '.join(sorted(head))} ({ms:.0f} ms)")
+    return True
+
+def migrate(na_inicializacao=True):
+    """Aplica as migrações pendentes; False se falharem
+
+    Na inicialização do servidor segue API_MIGRATIONS. O job `start.py migrate`
+    ignora o skip (é ele quem migra quando os servidores usam skip).
+    """
+    modo = os.getenv("API_MIGRATIONS", "auto").lower()
+    if modo == "skip" and na_inicializacao:
+        print("⏭️ API_MIGRATIONS=skip: migrações não verificadas")
+        return True
+    if modo != "always" and not migrations_pending():
+        return True
+    return run_migrations()
+
+def start_server():
+    """Inicia o servidor Uvicorn"""
+    print("🚀 Iniciando servidor...")
+    host = os.getenv("API_HOST", "0.0.0.0")
+    port = int(os.getenv("API_PORT", "8000"))
+
+    subprocess.run([
+        "uvicorn",
+        "app.main:app",
+        "--host", host,
+        "--port", str(port),
+        "--reload"
+    ])
+
+def start_production_server():
+    """Inicia o servidor de produção (vários workers, sem --reload)"""
+    config = runpy.run_path("gunicorn.conf.py")
+    loop = "uvloop" if find_spec("uvloop") else "asyncio"
+    http = "httptools" if find_spec("httptools") else "h11"
+    print(f"🚀 Iniciando servidor de produção: {config['workers']} workers, loop {loop}, http {http}")
+
+    if find_spec("gunicorn") and sys.platform != "win32":
+        os.execvp("gunicorn", ["gunicorn", "-c", "gunicorn.conf.py", "app.main:app"])
+
+    # Windows: sem gunicorn (sem preload nem reciclagem de workers)
+    host, port = config["bind"].rsplit(":", 1)
+    subprocess.run([
+        "uvicorn",
+        "app.main:app",
+        "--host", host,
+        "--port", port,
+        "--workers", str(config["workers"]),
+        "--timeout-keep-alive", str(config["keepalive"]),
+        "--timeout-graceful-shutdown", str(config["graceful_timeout"]),
+        "--no-access-log"
+    ])
+
+if __name__ == "__main__":
+    # Job único: só migrações (ex.: antes do deploy, fora do boot dos servidores)
+    if sys.argv[1:] == ["migrate"]:
+        sys.exit(0 if migrate(na_inicializacao=False) else 1)
+
+    # Roda migrações
+    if not migrate():
+        print("⚠️ Continuando mesmo com erros nas migrações...")
+    
+    # Inicia servidor
+    if os.getenv("API_MODE", "dev").lower() == "prod":
+        start_production_server()
+    else:
+        start_server()
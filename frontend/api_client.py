@@ -0,0 +1,122 @@
+"""
+Cliente HTTP da API usado pelo app Streamlit.
+
+- Uma requests.Session por processo (st.cache_resource): conexões keep-alive
+  reaproveitadas entre reruns e sessões, sem novo handshake TCP/TLS a cada clique.
+- Timeouts e retentativas iguais em todas as chamadas (só GET, com backoff,
+  em erros de conexão e 502/503/504).
+- Respostas em gzip (a API comprime acima de 500 bytes).
+- st.cache_data por endpoint; quando o TTL expira a consulta é revalidada com
+  If-None-Match e um 304 reaproveita o corpo já recebido.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# (conexão, leitura) em segundos
+TIMEOUT = (3.05, 20)
+MAX_ETAGS = 64
+
+
+@st.cache_resource(show_spinner=False)
+def get_session():
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip"})
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def _etags():
+    # url -> (etag, corpo); compartilhado entre sessões, limitado às últimas MAX_ETAGS
+    return OrderedDict(), threading.Lock()
+
+
+def get_json(path: str, params=None, timeout=TIMEOUT):
+    """
+    GET em API_URL + path com revalidação por ETag.
+
+    Retorna {"status": 404} quando o recurso não existe; outros erros HTTP
+    levantam requests.HTTPError.
+    """
+    url = f"{API_URL}{path}"
+    chave = requests.Request("GET", url, params=params).prepare().url
+    cache, lock = _etags()
+
+    with lock:
+        anterior = cache.get(chave)
+    headers = {"If-None-Match": anterior[0]} if anterior else None
+
+    r = get_session().get(url, params=params, headers=headers, timeout=timeout)
+    if r.status_code == 304 and anterior:
+        return anterior[1]
+    if r.status_code == 404:
+        return {"status": 404}
+    r.raise_for_status()
+
+    corpo = r.json()
+    etag = r.headers.get("ETag")
+    if etag:
+        with lock:
+            cache[chave] = (etag, corpo)
+            cache.move_to_end(chave)
+            while len(cache) > MAX_ETAGS:
+                cache.popitem(last=False)
+    return corpo
+
+
+# Funções cacheadas para reduzir latência em reruns do Streamlit
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_datas():
+    return get_json("/api/cotacoes/datas")
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_ativos():
+    return get_json("/api/ativos").get("ativos", [])
+
+
+@st.cache_data(ttl=180, show_spinner=False)
+def fetch_cotacoes_data(data: str):
+    return get_json(f"/api/cotacoes/data/{data}")
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_historico(codigo_ativo: str, limite: int):
+    return get_json(f"/api/cotacoes/{codigo_ativo}", params={"limite": limite})
+
+
+# Série de fechamento por ativo no intervalo
+@st.cache_data(ttl=180, show_spinner=False)
+def fetch_fechamento(inicio: str, fim: str, ativo: str, pontos=None, metodo: str = "lttb"):
+    params = {"inicio": inicio, "fim": fim, "ativo": ativo, "pontos": pontos, "metodo": metodo}
+    return get_json("/api/ativos/intervalo", params=params)
+
+
+# OHLCV em colunas: uma requisição por (ativo, intervalo)
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_ohlcv(ativo: str, inicio: str, fim: str):
+    return get_json("/api/ativos/ohlcv", params={"ativo": ativo, "inicio": inicio, "fim": fim})
+
+
+# Sugestões de ativos (índice em memória da API)
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_sugestoes(termo: str):
+    payload = get_json("/api/ativos/search", params={"q": termo, "limite": 8}, timeout=(3.05, 5))
+    return [s["ativo"] for s in payload.get("resultados", [])]
@@ -0,0 +1,89 @@
+"""
+Tabelas do app: os DataFrames mantêm dtypes numéricos/datas e a formatação
+(R$, milhares, datas) fica só na exibição, via column_config do Streamlit.
+
+Os arquivos de download (CSV/Parquet) são gerados apenas quando o usuário
+pede, não a cada rerun da página.
+"""
+import io
+
+import pandas as pd
+import streamlit as st
+
+ROTULOS = {
+    "ativo": "Ativo",
+    "data_pregao": "Data Pregão",
+    "data": "Data",
+    "abertura": "Abertura",
+    "fechamento": "Fechamento",
+    "maximo": "Máximo",
+    "minimo": "Mínimo",
+    "volume": "Volume",
+}
+
+COLUNAS = {
+    "ativo": st.column_config.TextColumn("Ativo"),
+    "data_pregao": st.column_config.DateColumn("Data Pregão", format="YYYY-MM-DD"),
+    "data": st.column_config.DateColumn("Data", format="YYYY-MM-DD"),
+    "abertura": st.column_config.NumberColumn("Abertura", format="R$ %.2f"),
+    "fechamento": st.column_config.NumberColumn("Fechamento", format="R$ %.2f"),
+    "maximo": st.column_config.NumberColumn("Máximo", format="R$ %.2f"),
+    "minimo": st.column_config.NumberColumn("Mínimo", format="R$ %.2f"),
+    "volume": st.column_config.NumberColumn("Volume", format="%d"),
+}
+
+# formato -> (extensão, mime)
+FORMATOS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def para_df(registros) -> pd.DataFrame:
+    """DataFrame tipado a partir da lista de registros da API."""
+    df = pd.DataFrame(registros)
+    for coluna in ("data_pregao", "data"):
+        if coluna in df:
+            df[coluna] = pd.to_datetime(df[coluna])
+    return df
+
+
+def exibir(df: pd.DataFrame, **kwargs):
+    colunas = {c: COLUNAS[c] for c in df.columns if c in COLUNAS}
+    st.dataframe(df, column_config=colunas, hide_index=True, use_container_width=True, **kwargs)
+
+
+def _exportar(df: pd.DataFrame, formato: str) -> bytes:
+    saida = df.rename(columns=ROTULOS)
+    if formato == "Parquet":
+        buffer = io.BytesIO()
+        saida.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    return saida.to_csv(index=False).encode("utf-8")
+
+
+def download_sob_demanda(df, nome_base: str, rotulo: str = "📥 Preparar download"):
+    """
+    Seletor de formato + botão que gera o arquivo só quando clicado.
+
+    df pode ser uma função que devolve o DataFrame (ex.: série completa de um
+    gráfico reduzido): a consulta só acontece no clique.
+    """
+    col1, col2, col3 = st.columns([1, 1, 2])
+    formato = col1.selectbox("Formato", list(FORMATOS), key=f"formato_{nome_base}", label_visibility="collapsed")
+
+    # Um arquivo por vez na sessão: trocar de consulta descarta o anterior
+    if col2.button(rotulo, key=f"preparar_{nome_base}"):
+        dados = df() if callable(df) else df
+        st.session_state["_download"] = (nome_base, formato, _exportar(dados, formato))
+
+    arquivo = st.session_state.get("_download")
+    if arquivo and arquivo[:2] == (nome_base, formato):
+        extensao, mime = FORMATOS[formato]
+        col3.download_button(
+            label=f"💾 Baixar {formato}",
+            data=arquivo[2],
+            file_name=f"{nome_base}.{extensao}",
+            mime=mime,
+            key=f"baixar_{nome_base}",
+        )
@@ -1,204 +1,203 @@
-"""
-Script de Backfill - Carrega dados históricos dos últimos 30 dias da B3
-
-Execução:
-    python backfill_historico.py
-
-Configuração:
-    Certifique-se de ter as variáveis de ambiente configuradas:
-    - POSTGRES_HOST, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB
-    - AZURE_STORAGE_CONNECTION_STRING
-    - AZURE_BLOB_CONTAINER
-"""
-
-import os
-import sys
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from pathlib import Path
-from dotenv import load_dotenv
-
-# Carregar variáveis de ambiente
-load_dotenv()
-
-# Importar módulos ETL
-from b3_extractor import B3Extractor
-from xml_parse import B3XMLParser
-from postgres_loader import PostgresLoader
-from storage import get_container_client, upload_blob
-from helpers import yymmdd
-
-def is_dia_util(data: datetime) -> bool:
-    """Verifica se é dia útil (segunda a sexta)"""
-    return data.weekday() < 5
-
-def backfill_historico(dias_atras: int = 30, max_workers: int = 4):
-    """
-    Processa dados históricos dos últimos N dias
-    
-    Args:
-        dias_atras: Número de dias para retroceder (padrão: 30)
-    """
-    print(f"🚀 Iniciando backfill de {dias_atras} dias...")
-    print(f"📅 Data de referência: {datetime.now().strftime('%Y-%m-%d')}\n")
-    
-    # Inicializar componentes de infraestrutura
-    container_client = get_container_client()
-    
-    # Limpar banco de dados antes de começar
-    print("🗑️  Limpando banco de dados...")
-    try:
-        _loader = PostgresLoader()
-        _loader.truncate_table()
-        _loader.disconnect()
-        print("✅ Banco de dados esvaziado com sucesso!\n")
-    except Exception as e:
-        print(f"❌ ERRO ao limpar banco: {str(e)}")
-        print("⚠️  Continuando mesmo assim...\n")
-    
-    # Calcular intervalo de datas
-    data_fim = datetime.now() - timedelta(days=1)  # Ontem
-    data_inicio = data_fim - timedelta(days=dias_atras)
-    
-    print(f"📊 Período: {data_inicio.strftime('%d/%m/%Y')} até {data_fim.strftime('%d/%m/%Y')}\n")
-    
-    # Montar lista de dias úteis no período
-    datas = []
-    data_atual = data_inicio
-    while data_atual <= data_fim:
-        if is_dia_util(data_atual):
-            datas.append(data_atual)
-        data_atual += timedelta(days=1)
-
-    print(f"🧵 Rodando em paralelo com até {max_workers} workers...\n")
-
-    total_dias = len(datas)
-    dias_processados = 0
-    dias_pulados = 0
-    total_cotacoes = 0
-    erros = []
-
-    def processar_dia(data_ref: datetime):
-        data_str = data_ref.strftime('%Y-%m-%d')
-        dia_semana = data_ref.strftime('%A')
-        print(f"\n{'='*70}")
-        print(f"📅 Processando: {data_str} ({dia_semana})")
-        print(f"{'='*70}")
-
-        extractor_local = B3Extractor()
-        parser_local = B3XMLParser()
-        loader_local = PostgresLoader()
-        try:
-            # 1. EXTRACT - download
-            print(f"🌐 [1/4] Extraindo dados da B3...")
-            date_str_download = yymmdd(data_ref)
-            zip_bytes, ok_date = extractor_local.download_zip(date_str_download)
-            if not zip_bytes:
-                print(f"⚠️  Arquivo não encontrado na B3 para {data_str}")
-                return {"ok": False, "cotacoes": 0, "msg": f"{data_str}: Arquivo não disponível"}
-
-            # Extrair
-            result = extractor_local.extract_files(zip_bytes, date_str_download)
-            xml_files = result['xml_files']
-            print(f"✅ {len(xml_files)} arquivo(s) XML extraído(s)")
-
-            # 2. UPLOAD - Blob com paralelismo interno
-            print(f"☁️  [2/4] Enviando para Azure Blob Storage...")
-            uploaded = 0
-            for xml_file in xml_files:
-                relative_path = xml_file.relative_to(result['xml_dir'])
-                blob_name = f"xml/{date_str_download}/{relative_path}"
-                if upload_blob(container_client, blob_name, xml_file, max_concurrency=8, content_type='application/xml', skip_if_exists=True):
-                    uploaded += 1
-            print(f"✅ {uploaded} arquivo(s) enviado(s) para o blob")
-
-            # 3. TRANSFORM - parse
-            print(f"🔄 [3/4] Processando XML...")
-            all_cotacoes = []
-            for xml_file in xml_files:
-                with open(xml_file, 'r', encoding='utf-8') as f:
-                    xml_content = f.read()
-                cotacoes = parser_local.parse_xml(xml_content)
-                all_cotacoes.extend(cotacoes)
-            num_cotacoes = len(all_cotacoes)
-            print(f"✅ Extraídas {num_cotacoes:,} cotações válidas")
-
-            # 4. LOAD - banco
-            print(f"💾 [4/4] Carregando no PostgreSQL...")
-            loader_local.load_cotacoes(all_cotacoes)
-            print(f"✅ {num_cotacoes:,} cotações inseridas/atualizadas no banco")
-
-            # Limpeza
-            import shutil
-            if result['zip_path'].exists():
-                result['zip_path'].unlink()
-            if result['xml_dir'].exists():
-                shutil.rmtree(result['xml_dir'])
-
-            return {"ok": True, "cotacoes": num_cotacoes}
-        except Exception as e:
-            return {"ok": False, "cotacoes": 0, "msg": f"{data_str}: {str(e)}"}
-        finally:
-            loader_local.disconnect()
-
-    # Executar em paralelo
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_map = {executor.submit(processar_dia, dt): dt for dt in datas}
-        for future in as_completed(future_map):
-            res = future.result()
-            if res.get("ok"):
-                dias_processados += 1
-                total_cotacoes += res.get("cotacoes", 0)
-            else:
-                dias_pulados += 1
-                erros.append(res.get("msg", "Erro desconhecido"))
-    
-    # Resumo final
-    print(f"\n{'='*70}")
-    print(f"📊 RESUMO DO BACKFILL")
-    print(f"{'='*70}")
-    print(f"📅 Total de dias no período: {total_dias}")
-    print(f"✅ Dias processados com sucesso: {dias_processados}")
-    print(f"⏭️  Dias pulados (fim de semana/feriado): {dias_pulados}")
-    print(f"📈 Total de cotações carregadas: {total_cotacoes:,}")
-    
-    if total_cotacoes > 0 and dias_processados > 0:
-        media = total_cotacoes / dias_processados
-        print(f"📊 Média de cotações por dia: {media:.0f}")
-    
-    if erros:
-        print(f"\n⚠️  ERROS ENCONTRADOS ({len(erros)}):")
-        for erro in erros:
-            print(f"   - {erro}")
-    else:
-        print(f"\n🎉 Backfill concluído sem erros!")
-    
-    print(f"\n{'='*70}\n")
-    
-    # Nada a fechar aqui (cada worker fechou sua conexão)
-
-if __name__ == "__main__":
-    # Verificar variáveis de ambiente
-    required_vars = [
-        'POSTGRES_HOST', 'POSTGRES_USER', 'POSTGRES_PASSWORD', 'POSTGRES_DB',
-        'AZURE_STORAGE_CONNECTION_STRING', 'AZURE_BLOB_CONTAINER'
-    ]
-    
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
-    
-    if missing_vars:
-        print("❌ ERRO: Variáveis de ambiente faltando:")
-        for var in missing_vars:
-            print(f"   - {var}")
-        print("\n💡 Configure as variáveis no arquivo .env ou no ambiente do sistema")
-        sys.exit(1)
-    
-    # Executar backfill
-    try:
-        backfill_historico(dias_atras=30)
-    except KeyboardInterrupt:
-        print("\n\n⚠️  Backfill interrompido pelo usuário")
-        sys.exit(0)
-    except Exception as e:
-        print(f"\n❌ ERRO FATAL: {str(e)}")
-        sys.exit(1)
+"""
+Script de Backfill - Carrega dados históricos dos últimos 30 dias da B3
+
+Execução:
+    python backfill_historico.py                 # incremental (padrão)
+    python backfill_historico.py --dias 730      # incremental, 2 anos
+    python backfill_historico.py --dias 2000 --conexoes 4 --lote 100000  # vários anos, carga paralela
+    python backfill_historico.py --completo      # esvazia a tabela e refaz tudo
+
+Modo incremental:
+    Consulta o manifesto local (Config.BACKFILL_MANIFEST), as datas já
+    presentes no PostgreSQL e os checksums dos XMLs no Blob, e processa apenas
+    datas faltantes ou alteradas. Datas interrompidas são refeitas na próxima
+    execução. Datas sem arquivo na B3 ficam marcadas como indisponíveis e só
+    voltam a ser tentadas após BACKFILL_RETENTAR_HORAS (dobrado a cada
+    tentativa) ou com --completo.
+
+Configuração:
+    Certifique-se de ter as variáveis de ambiente configuradas:
+    - POSTGRES_HOST, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB
+    - AZURE_STORAGE_CONNECTION_STRING
+    - AZURE_BLOB_CONTAINER
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+# Importar módulos ETL
+from postgres_loader import PostgresLoader
+from storage import get_container_client, list_blob_checksums
+from calendario_b3 import dias_uteis_entre
+from manifest import BackfillManifest
+from pipeline_backfill import BackfillPipeline
+from metricas import execucao
+
+def backfill_historico(dias_atras: int = 30, downloads: int = 4, incremental: bool = True,
+                       parsers: int | None = None, lote_linhas: int = 20000, tamanho_fila: int = 8,
+                       conexoes: int = 1):
+    """
+    Processa dados históricos dos últimos N dias
+    
+    Args:
+        dias_atras: Número de dias para retroceder (padrão: 30)
+        downloads: Downloads/uploads simultâneos (threads)
+        incremental: Processa só datas faltantes/alteradas (False esvazia a tabela)
+        parsers: Processos de parse (padrão: número de CPUs)
+        lote_linhas: Cotações acumuladas por transação no writer
+        tamanho_fila: Dias em espera entre estágios (backpressure)
+        conexoes: Conexões simultâneas do writer (lotes divididos por data)
+    """
+    modo = "incremental" if incremental else "completo"
+    print(f"🚀 Iniciando backfill {modo} de {dias_atras} dias...")
+    print(f"📅 Data de referência: {datetime.now().strftime('%Y-%m-%d')}\n")
+    
+    # Inicializar componentes de infraestrutura
+    container_client = get_container_client()
+    manifest = BackfillManifest()
+    
+    if not incremental:
+        # Limpar banco de dados antes de começar
+        print("🗑️  Limpando banco de dados...")
+        try:
+            _loader = PostgresLoader()
+            _loader.truncate_table()
+            _loader.disconnect()
+            manifest.limpar()
+            print("✅ Banco de dados esvaziado com sucesso!\n")
+        except Exception as e:
+            print(f"❌ ERRO ao limpar banco: {str(e)}")
+            print("⚠️  Continuando mesmo assim...\n")
+    
+    # Calcular intervalo de datas
+    data_fim = datetime.now() - timedelta(days=1)  # Ontem
+    data_inicio = data_fim - timedelta(days=dias_atras)
+    
+    print(f"📊 Período: {data_inicio.strftime('%d/%m/%Y')} até {data_fim.strftime('%d/%m/%Y')}\n")
+    
+    # Montar lista de dias de pregão no período (sem fins de semana e feriados da B3)
+    datas = [datetime.combine(d, datetime.min.time()) for d in dias_uteis_entre(data_inicio, data_fim)]
+    total_dias = len(datas)
+    dias_em_dia = 0
+    indisponiveis = 0
+
+    if incremental:
+        # Estado atual: 1 consulta agregada no Postgres + 1 listagem do Blob
+        print("🔎 Consultando manifesto, PostgreSQL e Blob...")
+        _loader = PostgresLoader()
+        try:
+            contagem_db = _loader.contar_por_data(data_inicio.date(), data_fim.date())
+        finally:
+            _loader.disconnect()
+        checksums = list_blob_checksums(container_client, name_starts_with="xml/")
+
+        datas, adotadas, indisponiveis = manifest.planejar(datas, contagem_db, checksums)
+        dias_em_dia = total_dias - len(datas) - indisponiveis
+        print(f"✅ {dias_em_dia} dia(s) já carregado(s) ({adotadas} registrado(s) agora no manifesto)")
+        if indisponiveis:
+            print(f"⏭️  {indisponiveis} dia(s) sem arquivo na B3, aguardando nova tentativa")
+        print(f"📋 {len(datas)} dia(s) pendente(s)\n")
+
+    print(f"🧵 Pipeline: {downloads} download(s), {parsers or os.cpu_count()} parser(s), 1 writer "
+          f"com {conexoes} conexão(ões) (lotes de {lote_linhas:,} cotações)...\n")
+
+    pipeline = BackfillPipeline(
+        container_client,
+        manifest=manifest,
+        downloads=downloads,
+        parsers=parsers,
+        lote_linhas=lote_linhas,
+        tamanho_fila=tamanho_fila,
+        conexoes=conexoes,
+    )
+    resultado = pipeline.executar(datas)
+
+    dias_processados = resultado["dias_ok"]
+    total_cotacoes = resultado["total_cotacoes"]
+    erros = resultado["erros"]
+    dias_com_erro = len(datas) - dias_processados - resultado["indisponiveis"]
+    
+    # Resumo final
+    print(f"\n{'='*70}")
+    print(f"📊 RESUMO DO BACKFILL")
+    print(f"{'='*70}")
+    print(f"📅 Dias de pregão no período: {total_dias}")
+    if incremental:
+        print(f"💤 Dias já carregados (pulados pelo manifesto): {dias_em_dia}")
+    print(f"✅ Dias processados com sucesso: {dias_processados}")
+    print(f"⏭️  Dias indisponíveis na B3: {indisponiveis + resultado['indisponiveis']} "
+          f"({resultado['indisponiveis']} nesta execução, {indisponiveis} aguardando nova tentativa)")
+    print(f"❌ Dias com erro: {dias_com_erro}")
+    print(f"📈 Total de cotações carregadas: {total_cotacoes:,}")
+    
+    if total_cotacoes > 0 and dias_processados > 0:
+        media = total_cotacoes / dias_processados
+        print(f"📊 Média de cotações por dia: {media:.0f}")
+    
+    if erros:
+        print(f"\n⚠️  ERROS ENCONTRADOS ({len(erros)}):")
+        for erro in erros:
+            print(f"   - {erro}")
+    else:
+        print(f"\n🎉 Backfill concluído sem erros!")
+    
+    print(f"🌐 Requisições ao Blob no pipeline: {resultado['requisicoes_blob']:,}")
+
+    print(f"\n⏱️  Vazão por estágio ({resultado['duracao']:.1f}s no total):")
+    for linha in pipeline.relatorio():
+        print(f"   {linha}")
+    
+    print(f"\n{'='*70}\n")
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Backfill histórico de cotações da B3")
+    arg_parser.add_argument("--dias", type=int, default=30, help="Dias corridos para retroceder (padrão: 30)")
+    arg_parser.add_argument("--downloads", "--workers", type=int, default=4, help="Downloads simultâneos (padrão: 4)")
+    arg_parser.add_argument("--parsers", type=int, default=None, help="Processos de parse (padrão: nº de CPUs)")
+    arg_parser.add_argument("--lote", type=int, default=20000, help="Cotações por transação no writer (padrão: 20000)")
+    arg_parser.add_argument("--fila", type=int, default=8, help="Dias em espera entre estágios (padrão: 8)")
+    arg_parser.add_argument("--conexoes", type=int, default=1,
+                            help="Conexões do writer; >1 grava cada lote em paralelo por data (padrão: 1)")
+    arg_parser.add_argument("--completo", action="store_true", help="Esvazia a tabela e reprocessa todas as datas")
+    args = arg_parser.parse_args()
+
+    # Verificar variáveis de ambiente
+    required_vars = [
+        'POSTGRES_HOST', 'POSTGRES_USER', 'POSTGRES_PASSWORD', 'POSTGRES_DB',
+        'AZURE_STORAGE_CONNECTION_STRING', 'AZURE_BLOB_CONTAINER'
+    ]
+    
+    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    
+    if missing_vars:
+        print("❌ ERRO: Variáveis de ambiente faltando:")
+        for var in missing_vars:
+            print(f"   - {var}")
+        print("\n💡 Configure as variáveis no arquivo .env ou no ambiente do sistema")
+        sys.exit(1)
+    
+    # Executar backfill
+    try:
+        with execucao("backfill_historico"):
+            backfill_historico(
+                dias_atras=args.dias,
+                downloads=args.downloads,
+                incremental=not args.completo,
+                parsers=args.parsers,
+                lote_linhas=args.lote,
+                tamanho_fila=args.fila,
+                conexoes=args.conexoes,
+            )
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Backfill interrompido pelo usuário")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ ERRO FATAL: {str(e)}")
+        sys.exit(1)
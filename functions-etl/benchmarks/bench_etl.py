@@ -0,0 +1,244 @@
+"""
+Benchmark do ETL sobre um SPRE sintético: extração, parse e carga
+
+Execução (a partir de functions-etl/):
+    python benchmarks/bench_etl.py                         # 400 ações, 4000 derivativos
+    python benchmarks/bench_etl.py --acoes 800 --derivativos 20000 --repeticoes 5
+    python benchmarks/bench_etl.py --sem-postgres          # só extração e parse
+
+Estágios, sobre o ZIP gerado por gerar_spre.py:
+    extracao  B3Extractor.extract_files (grava o ZIP e extrai as duas camadas)
+    parse     parse de cada XML pelo mesmo caminho de B3XMLParser.parse_xml,
+              com o cache de parse desligado (não exige o Blob)
+    carga     PostgresLoader.execute das cotações do dia (Postgres do .env),
+              com a tabela limpa antes de cada repetição
+
+Para cada estágio: mediana do tempo entre as repetições, MB/s, linhas/s e
+pico de memória Python (tracemalloc, numa repetição extra fora da medição de
+tempo; buffers do libxml2 e do libpq não entram). O pico de RSS do processo
+vai no resumo.
+
+Cada execução é acrescentada como uma linha JSON em --historico e comparada
+com a última de mesmos parâmetros na mesma máquina; quedas de vazão acima de
+--tolerancia são marcadas como regressão (com --falhar, saída com código 1).
+As cotações sintéticas (ZB??, 1990) são removidas ao final.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from b3_extractor import B3Extractor
+from config import Config
+from gerar_spre import DATA_PADRAO, gerar_zip
+from metricas import rss_pico_mb
+from parse_cache import ParseCache
+from xml_parse import parse_xml_cacheado
+
+HISTORICO_PADRAO = Config.DATA_DIR / "bench_etl.jsonl"
+
+
+def _silencioso():
+    # Os estágios imprimem uma linha por arquivo/lote: fora da medição
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def medir(funcao, repeticoes, preparar=None):
+    """(mediana dos tempos em s, pico tracemalloc em MB, último retorno)."""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        with _silencioso():
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+
+    # Repetição extra só para a memória: o tracemalloc deixa o código mais lento
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        with _silencioso():
+            funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(tempos), pico / 1e6, resultado
+
+
+def _vazao(segundos, bytes_=0, linhas=0, pico_python_mb=0.0):
+    return {
+        "segundos": round(segundos, 4),
+        "mb_s": round(bytes_ / 1e6 / segundos, 2) if bytes_ else None,
+        "linhas_s": round(linhas / segundos) if linhas else None,
+        "pico_python_mb": round(pico_python_mb, 1),
+    }
+
+
+def bench_extracao(zip_bytes, date_str, diretorio, repeticoes):
+    extractor = B3Extractor()
+    extractor.data_dir = diretorio
+    segundos, pico, resultado = medir(lambda: extractor.extract_files(zip_bytes, date_str), repeticoes)
+    tamanho = sum(f.stat().st_size for f in resultado["xml_files"])
+    return _vazao(segundos, tamanho, pico_python_mb=pico)
+
+
+def bench_parse(xmls, repeticoes):
+    cache = ParseCache(modo="off")
+
+    def parse():
+        cotacoes = []
+        for conteudo in xmls:
+            cotacoes.extend(parse_xml_cacheado(conteudo, cache))
+        return cotacoes
+
+    segundos, pico, cotacoes = medir(parse, repeticoes)
+    return _vazao(segundos, sum(len(x) for x in xmls), len(cotacoes), pico), cotacoes
+
+
+def bench_carga(cotacoes, repeticoes):
+    from bench_loader import limpar
+    from postgres_loader import PostgresLoader
+
+    dias = [(DATA_PADRAO, cotacoes)]
+    loader = PostgresLoader(manter_conexao=True)
+    try:
+        segundos, pico, _ = medir(lambda: loader.execute(cotacoes), repeticoes, preparar=lambda: limpar(dias))
+    finally:
+        loader.disconnect()
+        limpar(dias)
+    return _vazao(segundos, linhas=len(cotacoes), pico_python_mb=pico)
+
+
+def _commit():
+    try:
+        saida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                               cwd=Path(__file__).resolve().parent, timeout=5)
+        return saida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _anterior(historico, parametros, maquina):
+    if not historico.exists():
+        return None
+    ultimo = None
+    for linha in historico.read_text(encoding="utf-8").splitlines():
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            continue
+        if registro.get("parametros") == parametros and registro.get("maquina") == maquina:
+            ultimo = registro
+    return ultimo
+
+
+def comparar(atual, anterior, tolerancia):
+    """Linhas do relatório e lista de regressões (vazão abaixo da tolerância)."""
+    regressoes = []
+    linhas = []
+    for nome, estagio in atual["estagios"].items():
+        antes = (anterior or {}).get("estagios", {}).get(nome)
+        metrica = "mb_s" if estagio["mb_s"] else "linhas_s"
+        valor = estagio[metrica]
+        delta = ""
+        if antes and antes.get(metrica):
+            variacao = valor / antes[metrica] - 1
+            delta = f"{variacao:+.1%}"
+            if variacao < -tolerancia:
+                regressoes.append(nome)
+                delta += " ⚠️"
+        mb_s = f"{estagio['mb_s']:.1f}" if estagio["mb_s"] else "-"
+        linhas_s = f"{estagio['linhas_s']:,}" if estagio["linhas_s"] else "-"
+        linhas.append(f"{nome:<9} {estagio['segundos'] * 1000:>9.1f} {mb_s:>8} {linhas_s:>11} "
+                      f"{estagio['pico_python_mb']:>9.1f} {delta:>10}")
+    return linhas, regressoes
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark do ETL (extração, parse e carga) com SPRE sintético")
+    arg_parser.add_argument("--acoes", type=int, default=400, help="Ações à vista (padrão: 400)")
+    arg_parser.add_argument("--derivativos", type=int, default=4000, help="Opções e futuros (padrão: 4000)")
+    arg_parser.add_argument("--arquivos", type=int, default=4, help="XMLs dentro do ZIP (padrão: 4)")
+    arg_parser.add_argument("--repeticoes", type=int, default=3, help="Repetições por estágio (padrão: 3)")
+    arg_parser.add_argument("--sem-postgres", action="store_true", help="Não mede a carga no Postgres")
+    arg_parser.add_argument("--historico", type=Path, default=HISTORICO_PADRAO,
+                            help=f"Histórico JSONL (padrão: {HISTORICO_PADRAO})")
+    arg_parser.add_argument("--tolerancia", type=float, default=0.10,
+                            help="Queda de vazão tolerada frente à execução anterior (padrão: 0.10)")
+    arg_parser.add_argument("--falhar", action="store_true", help="Sai com código 1 se houver regressão")
+    args = arg_parser.parse_args()
+    repeticoes = max(1, args.repeticoes)
+
+    zip_bytes, date_str = gerar_zip(DATA_PADRAO, args.acoes, args.derivativos, args.arquivos)
+    print(f"🧪 SPRE sintético: {args.acoes:,} ações + {args.derivativos:,} derivativos, "
+          f"{args.arquivos} XML(s), ZIP de {len(zip_bytes) / 1e6:.1f} MB, {repeticoes} repetição(ões)\n")
+
+    estagios = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("⏱️  extracao...")
+        estagios["extracao"] = bench_extracao(zip_bytes, date_str, Path(tmp_dir), repeticoes)
+
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as externo:
+        with zipfile.ZipFile(io.BytesIO(externo.read(externo.namelist()[0]))) as interno:
+            xmls = [interno.read(nome) for nome in interno.namelist()]
+
+    print("⏱️  parse...")
+    estagios["parse"], cotacoes = bench_parse(xmls, repeticoes)
+
+    if not args.sem_postgres:
+        print("⏱️  carga...")
+        estagios["carga"] = bench_carga(cotacoes, repeticoes)
+
+    parametros = {
+        "acoes": args.acoes, "derivativos": args.derivativos,
+        "arquivos": args.arquivos, "repeticoes": repeticoes,
+    }
+    registro = {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "maquina": platform.node(),
+        "parametros": parametros,
+        "cotacoes": len(cotacoes),
+        "estagios": estagios,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+    anterior = _anterior(args.historico, parametros, registro["maquina"])
+    linhas, regressoes = comparar(registro, anterior, args.tolerancia)
+    referencia = f"vs {anterior['quando']} ({anterior.get('commit') or '?'})" if anterior else "sem execução anterior"
+
+    print(f"\n{len(cotacoes):,} cotações válidas | pico RSS {registro['rss_pico_mb']} MB | {referencia}")
+    print(f"{'estágio':<9} {'ms':>9} {'MB/s':>8} {'linhas/s':>11} {'pico MB':>9} {'variação':>10}")
+    for linha in linhas:
+        print(linha)
+
+    args.historico.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.historico, "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    print(f"\n📝 Histórico: {args.historico}")
+
+    if regressoes:
+        print(f"⚠️  Regressão acima de {args.tolerancia:.0%} em: {', '.join(regressoes)}")
+        if args.falhar:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark do PostgresLoader: carga de N dias com e sem reaproveitar a conexão
+
+Execução (a partir de functions-etl/):
+    python benchmarks/bench_loader.py                  # 30 dias x 400 ativos
+    python benchmarks/bench_loader.py --dias 60 --ativos 800
+
+Modos comparados, cada um sobre a mesma massa sintética (tabela limpa antes):
+    reconexao     um PostgresLoader por dia, SQL simples (comportamento antigo)
+    persistente   uma conexão para todos os dias, SQL simples
+    preparado     uma conexão para todos os dias, upsert com PREPARE/EXECUTE
+
+As cotações sintéticas usam tickers ZB?? e datas de 1990 em diante, e são
+removidas ao final (use --manter para inspecioná-las).
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import random
+import string
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from calendario_b3 import dias_uteis_entre
+from postgres_loader import PostgresLoader
+
+PREFIXO_TICKER = "ZB"
+
+
+def gerar_dias(dias, ativos, semente=42):
+    """Lista de (data, cotações) com preços em passeio aleatório."""
+    rnd = random.Random(semente)
+    tickers = [
+        f"{PREFIXO_TICKER}{a}{b}{rnd.choice('3456')}"
+        for a, b in itertools.islice(itertools.product(string.ascii_uppercase, repeat=2), ativos)
+    ]
+    precos = {t: rnd.uniform(5, 100) for t in tickers}
+    datas = dias_uteis_entre(date(1990, 1, 2), date(1990 + dias // 200 + 1, 12, 31))[:dias]
+
+    resultado = []
+    for data_pregao in datas:
+        cotacoes = []
+        for ticker in tickers:
+            abertura = precos[ticker]
+            fechamento = max(0.01, abertura * (1 + rnd.gauss(0, 0.02)))
+            precos[ticker] = fechamento
+            cotacoes.append({
+                "ativo": ticker,
+                "data_pregao": data_pregao,
+                "abertura": round(abertura, 2),
+                "fechamento": round(fechamento, 2),
+                "maximo": round(max(abertura, fechamento) * 1.01, 2),
+                "minimo": round(min(abertura, fechamento) * 0.99, 2),
+                "volume": rnd.randint(100, 1_000_000),
+            })
+        resultado.append((data_pregao, cotacoes))
+    return resultado
+
+
+def limpar(dias):
+    loader = PostgresLoader()
+    try:
+        loader.connect()
+        loader.cursor.execute(
+            "DELETE FROM cotacoes WHERE ativo LIKE %s AND data_pregao BETWEEN %s AND %s",
+            (f"{PREFIXO_TICKER}%", dias[0][0], dias[-1][0]),
+        )
+        loader.conn.commit()
+    finally:
+        loader.disconnect()
+
+
+def medir(nome, dias, fabrica, reaproveitar):
+    limpar(dias)
+    tempos = []
+    loader = fabrica() if reaproveitar else None
+    inicio = time.perf_counter()
+    try:
+        # Silencia os logs por lote do loader durante a medição
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _, cotacoes in dias:
+                t0 = time.perf_counter()
+                (loader or fabrica()).execute(cotacoes)
+                tempos.append(time.perf_counter() - t0)
+    finally:
+        if loader:
+            loader.disconnect()
+    total = time.perf_counter() - inicio
+    linhas = sum(len(c) for _, c in dias)
+    tempos.sort()
+    return {
+        "modo": nome,
+        "total": total,
+        "ms_dia": 1000 * total / len(dias),
+        "p95_ms": 1000 * tempos[int(0.95 * (len(tempos) - 1))],
+        "linhas_s": linhas / total,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark de carga do PostgresLoader")
+    arg_parser.add_argument("--dias", type=int, default=30, help="Dias de pregão sintéticos (padrão: 30)")
+    arg_parser.add_argument("--ativos", type=int, default=400, help="Ativos por dia (padrão: 400)")
+    arg_parser.add_argument("--manter", action="store_true", help="Não remove as cotações sintéticas ao final")
+    args = arg_parser.parse_args()
+
+    dias = gerar_dias(args.dias, args.ativos)
+    print(f"🧪 {len(dias)} dias x {args.ativos} ativos = {len(dias) * args.ativos:,} cotações\n")
+
+    modos = [
+        ("reconexao", lambda: PostgresLoader(preparar=False), False),
+        ("persistente", lambda: PostgresLoader(manter_conexao=True, preparar=False), True),
+        ("preparado", lambda: PostgresLoader(manter_conexao=True), True),
+    ]
+    resultados = []
+    try:
+        for nome, fabrica, reaproveitar in modos:
+            print(f"⏱️  {nome}...")
+            resultados.append(medir(nome, dias, fabrica, reaproveitar))
+    finally:
+        if not args.manter:
+            limpar(dias)
+
+    base = resultados[0]["total"]
+    print(f"\n{'modo':<12} {'total (s)':>10} {'ms/dia':>9} {'p95 ms':>9} {'linhas/s':>11} {'ganho':>7}")
+    for r in resultados:
+        print(f"{r['modo']:<12} {r['total']:>10.2f} {r['ms_dia']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['linhas_s']:>11,.0f} {base / r['total']:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
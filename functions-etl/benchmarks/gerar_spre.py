@@ -0,0 +1,165 @@
+"""
+Gerador de arquivos SPRE sintéticos (BVMF.217 PricRpt), para benchmarks offline
+
+Execução (a partir de functions-etl/):
+    python benchmarks/gerar_spre.py                          # 400 ações, 4000 derivativos
+    python benchmarks/gerar_spre.py --acoes 800 --derivativos 20000 --saida /tmp/spre
+
+O ZIP segue o formato do download da B3: pregao_<AAMMDD>.zip contém
+SPRE<AAMMDD>.zip, que contém os XMLs. Cada XML tem o cabeçalho BizFileHdr
+(bvmf.052) e um BizGrp por instrumento com um PricRpt (bvmf.217), com os
+mesmos campos do arquivo real.
+
+Ações (ZB??3, mercado BVMF) passam no filtro do parser; derivativos são
+descartados por ele, como no arquivo real: opções (ZB??K123) pelo formato do
+ticker e futuros (ZB?F26, mercado BMF) pelo código de mercado. A geração é
+determinística para a mesma semente.
+"""
+
+import argparse
+import io
+import itertools
+import random
+import string
+import sys
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from helpers import yymmdd
+
+PREFIXO_TICKER = "ZB"  # mesmo prefixo do bench_loader: fácil de limpar do banco
+DATA_PADRAO = date(1990, 1, 2)
+
+_CABECALHO = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<BizFileHdr xmlns="urn:bvmf.052.01.xsd" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+    '<Xchg><BizGrpDstn>00000</BizGrpDstn><BizGrpDtls><BizGrpId>{grupo}</BizGrpId>'
+    '<BizGrpDesc>Price Report</BizGrpDesc><CreDtAndTm>{criacao}</CreDtAndTm></BizGrpDtls>'
+)
+_RODAPE = '</Xchg></BizFileHdr>\n'
+
+_PRIC_RPT = (
+    '<BizGrp>'
+    '<AppHdr xmlns="urn:iso:std:iso:20022:tech:xsd:head.001.001.01">'
+    '<Fr><FIId><FinInstnId><Othr><Id>BVMF</Id><Issr>BVMF</Issr></Othr></FinInstnId></FIId></Fr>'
+    '<To><FIId><FinInstnId><Othr><Id>00000</Id><Issr>BVMF</Issr></Othr></FinInstnId></FIId></To>'
+    '<BizMsgIdr>BVMF.217.01/{seq}</BizMsgIdr><MsgDefIdr>bvmf.217.01</MsgDefIdr>'
+    '<CreDt>{criacao}</CreDt></AppHdr>'
+    '<Document xmlns="urn:bvmf.217.01.xsd"><PricRpt>'
+    '<TradDt><Dt>{data}</Dt></TradDt>'
+    '<SctyId><TckrSymb>{ticker}</TckrSymb></SctyId>'
+    '<FinInstrmId><OthrId><Id>{id}</Id><Tp><Prtry>8</Prtry></Tp></OthrId>'
+    '<PlcOfListg><MktIdrCd>{mercado}</MktIdrCd></PlcOfListg></FinInstrmId>'
+    '<TradDtls><TradQty>{negocios}</TradQty></TradDtls>'
+    '<FinInstrmAttrbts><MktDataStrmId>E</MktDataStrmId>'
+    '<NtlFinVol Ccy="BRL">{financeiro}</NtlFinVol><IntlFinVol>0</IntlFinVol>'
+    '<OpnIntrst>0</OpnIntrst><FinInstrmQty>{quantidade}</FinInstrmQty>'
+    '<BestBidPric Ccy="BRL">{compra}</BestBidPric><BestAskPric Ccy="BRL">{venda}</BestAskPric>'
+    '<FrstPric Ccy="BRL">{abertura}</FrstPric><MinPric Ccy="BRL">{minimo}</MinPric>'
+    '<MaxPric Ccy="BRL">{maximo}</MaxPric><TradAvrgPric Ccy="BRL">{medio}</TradAvrgPric>'
+    '<LastPric Ccy="BRL">{fechamento}</LastPric><RglrTxsQty>{negocios}</RglrTxsQty>'
+    '<RglrTraddCtrcts>{quantidade}</RglrTraddCtrcts><NtlRglrVol>{financeiro}</NtlRglrVol>'
+    '<IntlRglrVol>0</IntlRglrVol></FinInstrmAttrbts>'
+    '</PricRpt></Document></BizGrp>'
+)
+
+
+# ZBAA..ZBZZ com os sufixos 3, 4, 5 e 6
+RAIZES = [f"{PREFIXO_TICKER}{a}{b}" for a, b in itertools.product(string.ascii_uppercase, repeat=2)]
+MAX_ACOES = 4 * len(RAIZES)
+
+
+def gerar_instrumentos(acoes, derivativos, semente=42):
+    """Lista de (ticker, mercado) com a proporção ações/derivativos pedida."""
+    if acoes > MAX_ACOES:
+        raise ValueError(f"No máximo {MAX_ACOES} ações sintéticas (pedidas: {acoes})")
+    rnd = random.Random(semente)
+    raizes = RAIZES[:max(1, min(acoes, len(RAIZES)))]
+    instrumentos = [(raizes[i % len(raizes)] + "3456"[i // len(raizes)], "BVMF") for i in range(acoes)]
+
+    meses_opcao = "ABCDEFGHIJKLMNOPQRSTUVWX"
+    for i in range(derivativos):
+        raiz = raizes[i % len(raizes)]
+        if rnd.random() < 0.8:
+            instrumentos.append((f"{raiz}{rnd.choice(meses_opcao)}{rnd.randint(10, 999)}", "BVMF"))  # opção
+        else:
+            instrumentos.append((f"{raiz[:3]}{rnd.choice('FGHJKMNQUVXZ')}{rnd.randint(24, 35)}", "BMF"))  # futuro
+    return instrumentos
+
+
+def gerar_xml(data_pregao, instrumentos, semente=42, grupo=0) -> bytes:
+    """Um XML BVMF.217 com um PricRpt por instrumento."""
+    rnd = random.Random(f"{semente}-{data_pregao}-{grupo}")
+    criacao = datetime.combine(data_pregao, datetime.min.time()).replace(hour=20).isoformat() + "Z"
+    partes = [_CABECALHO.format(grupo=grupo, criacao=criacao)]
+    for seq, (ticker, mercado) in enumerate(instrumentos):
+        abertura = rnd.uniform(1, 100)
+        fechamento = max(0.01, abertura * (1 + rnd.gauss(0, 0.02)))
+        maximo = max(abertura, fechamento) * (1 + rnd.uniform(0, 0.02))
+        minimo = min(abertura, fechamento) * (1 - rnd.uniform(0, 0.02))
+        negocios = rnd.randint(1, 50_000)
+        quantidade = negocios * rnd.randint(1, 500)
+        partes.append(_PRIC_RPT.format(
+            seq=seq, criacao=criacao, data=data_pregao.isoformat(), ticker=ticker,
+            id=200_000_000 + seq, mercado=mercado, negocios=negocios, quantidade=quantidade,
+            financeiro=f"{quantidade * fechamento:.2f}",
+            compra=f"{fechamento * 0.999:.2f}", venda=f"{fechamento * 1.001:.2f}",
+            abertura=f"{abertura:.2f}", minimo=f"{minimo:.2f}", maximo=f"{maximo:.2f}",
+            medio=f"{(minimo + maximo) / 2:.2f}", fechamento=f"{fechamento:.2f}",
+        ))
+    partes.append(_RODAPE)
+    return "".join(partes).encode("utf-8")
+
+
+def gerar_xmls(data_pregao=DATA_PADRAO, acoes=400, derivativos=4000, arquivos=4, semente=42):
+    """[(nome, xml)] do dia, com os instrumentos divididos em `arquivos` XMLs."""
+    instrumentos = gerar_instrumentos(acoes, derivativos, semente)
+    random.Random(semente).shuffle(instrumentos)
+    arquivos = max(1, min(arquivos, len(instrumentos) or 1))
+    tamanho = -(-len(instrumentos) // arquivos)
+    return [
+        (f"BVBG.186.01_BV000471{data_pregao:%Y%m%d}{i + 1:04d}.xml",
+         gerar_xml(data_pregao, instrumentos[i * tamanho:(i + 1) * tamanho], semente, grupo=i))
+        for i in range(arquivos)
+    ]
+
+
+def _zipar(arquivos) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nome, conteudo in arquivos:
+            zf.writestr(nome, conteudo)
+    return buffer.getvalue()
+
+
+def gerar_zip(data_pregao=DATA_PADRAO, acoes=400, derivativos=4000, arquivos=4, semente=42):
+    """(bytes do ZIP externo, AAMMDD) no mesmo formato do download da B3."""
+    date_str = yymmdd(data_pregao)
+    xmls = gerar_xmls(data_pregao, acoes, derivativos, arquivos, semente)
+    interno = _zipar(xmls)
+    return _zipar([(f"SPRE{date_str}.zip", interno)]), date_str
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Gera um SPRE sintético (ZIP duplo com XMLs BVMF.217)")
+    arg_parser.add_argument("--acoes", type=int, default=400, help="Ações à vista (padrão: 400)")
+    arg_parser.add_argument("--derivativos", type=int, default=4000, help="Opções e futuros (padrão: 4000)")
+    arg_parser.add_argument("--arquivos", type=int, default=4, help="XMLs dentro do ZIP (padrão: 4)")
+    arg_parser.add_argument("--data", type=date.fromisoformat, default=DATA_PADRAO,
+                            help=f"Data do pregão (padrão: {DATA_PADRAO})")
+    arg_parser.add_argument("--semente", type=int, default=42)
+    arg_parser.add_argument("--saida", type=Path, default=Path("."), help="Diretório de saída (padrão: .)")
+    args = arg_parser.parse_args()
+
+    conteudo, date_str = gerar_zip(args.data, args.acoes, args.derivativos, args.arquivos, args.semente)
+    args.saida.mkdir(parents=True, exist_ok=True)
+    caminho = args.saida / f"pregao_{date_str}.zip"
+    caminho.write_bytes(conteudo)
+    print(f"✅ {caminho} ({len(conteudo) / 1e6:.1f} MB, {args.acoes + args.derivativos:,} instrumentos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Calendário de pregões da B3.
+
+Tabela de feriados pré-calculada (fixos + móveis derivados da Páscoa) para
+evitar downloads e listagens de blob em dias sem pregão. Consultas O(1).
+"""
+from datetime import date, datetime, timedelta
+
+# Faixa de anos pré-calculada na importação (demais anos são calculados sob demanda)
+_ANO_INICIAL = 2000
+_ANO_FINAL = 2050
+
+# Feriados fixos em que não há pregão: (mês, dia)
+_FERIADOS_FIXOS = (
+    (1, 1),    # Confraternização Universal
+    (4, 21),   # Tiradentes
+    (5, 1),    # Dia do Trabalho
+    (9, 7),    # Independência
+    (10, 12),  # Nossa Senhora Aparecida
+    (11, 2),   # Finados
+    (11, 15),  # Proclamação da República
+    (12, 24),  # Véspera de Natal (sem pregão)
+    (12, 25),  # Natal
+)
+
+# Feriados municipais/estaduais de SP observados pela B3 até 2021
+_FERIADOS_SP = (
+    (1, 25),   # Aniversário de São Paulo
+    (7, 9),    # Revolução Constitucionalista
+    (11, 20),  # Consciência Negra (municipal)
+)
+_ULTIMO_ANO_FERIADOS_SP = 2021
+
+# Consciência Negra passou a ser feriado nacional (Lei 14.759/2023)
+_PRIMEIRO_ANO_CONSCIENCIA_NEGRA = 2024
+
+
+def pascoa(ano: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)."""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+
+def encerramento_do_ano(ano: int, feriados=()) -> date:
+    """
+    Último dia útil de dezembro, sem pregão (encerramento do ano na B3).
+
+    Quando 31/12 cai no fim de semana, o fechamento passa para a sexta
+    anterior que ainda não é feriado:
+
+    >>> encerramento_do_ano(2024)
+    datetime.date(2024, 12, 31)
+    >>> encerramento_do_ano(2022)
+    datetime.date(2022, 12, 30)
+    >>> encerramento_do_ano(2023)
+    datetime.date(2023, 12, 29)
+    >>> encerramento_do_ano(2028)
+    datetime.date(2028, 12, 29)
+    """
+    dia = date(ano, 12, 31)
+    while dia.weekday() >= 5 or dia in feriados:
+        dia -= timedelta(days=1)
+    return dia
+
+
+def _calcular_feriados(ano: int) -> frozenset:
+    feriados = {date(ano, mes, dia) for mes, dia in _FERIADOS_FIXOS}
+
+    if ano <= _ULTIMO_ANO_FERIADOS_SP:
+        feriados.update(date(ano, mes, dia) for mes, dia in _FERIADOS_SP)
+    if ano >= _PRIMEIRO_ANO_CONSCIENCIA_NEGRA:
+        feriados.add(date(ano, 11, 20))
+
+    # Móveis: Carnaval (seg/ter), Sexta-feira Santa e Corpus Christi
+    p = pascoa(ano)
+    feriados.update({
+        p - timedelta(days=48),
+        p - timedelta(days=47),
+        p - timedelta(days=2),
+        p + timedelta(days=60),
+    })
+    feriados.add(encerramento_do_ano(ano, feriados))
+    return frozenset(feriados)
+
+
+_FERIADOS_POR_ANO = {ano: _calcular_feriados(ano) for ano in range(_ANO_INICIAL, _ANO_FINAL + 1)}
+
+
+def _como_date(dia) -> date:
+    return dia.date() if isinstance(dia, datetime) else dia
+
+
+def feriados_b3(ano: int) -> frozenset:
+    """Conjunto de feriados da B3 (dias de semana sem pregão) no ano."""
+    feriados = _FERIADOS_POR_ANO.get(ano)
+    if feriados is None:
+        feriados = _FERIADOS_POR_ANO[ano] = _calcular_feriados(ano)
+    return feriados
+
+
+def is_feriado(dia) -> bool:
+    dia = _como_date(dia)
+    return dia in feriados_b3(dia.year)
+
+
+def is_dia_util(dia) -> bool:
+    """Verifica se há pregão na data (dia de semana e não feriado)."""
+    dia = _como_date(dia)
+    return dia.weekday() < 5 and dia not in feriados_b3(dia.year)
+
+
+def dias_uteis_entre(inicio, fim) -> list:
+    """Dias de pregão entre inicio e fim (inclusive), em ordem crescente."""
+    inicio, fim = _como_date(inicio), _como_date(fim)
+    dias = []
+    dia = inicio
+    while dia <= fim:
+        if is_dia_util(dia):
+            dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
+
+
+def dias_uteis_anteriores(base, n: int, incluir_base: bool = False) -> list:
+    """Os n dias de pregão anteriores a base, do mais recente ao mais antigo."""
+    dia = _como_date(base)
+    if not incluir_base:
+        dia -= timedelta(days=1)
+    dias = []
+    while len(dias) < n:
+        if is_dia_util(dia):
+            dias.append(dia)
+        dia -= timedelta(days=1)
+    return dias
+
+
+def proximos_dias_uteis(base, n: int, incluir_base: bool = False) -> list:
+    """Os n próximos dias de pregão após base, em ordem crescente."""
+    dia = _como_date(base)
+    if not incluir_base:
+        dia += timedelta(days=1)
+    dias = []
+    while len(dias) < n:
+        if is_dia_util(dia):
+            dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
+
+
+def dia_util_anterior(base, n: int = 1) -> date:
+    """N-ésimo dia de pregão antes de base."""
+    return dias_uteis_anteriores(base, n)[-1]
+
+
+def proximo_dia_util(base, n: int = 1) -> date:
+    """N-ésimo dia de pregão depois de base."""
+    return proximos_dias_uteis(base, n)[-1]
+
+
+def iter_uteis_ate(max_days: int = 10, base: datetime | None = None):
+    """Dias de pregão (decrescente) nos últimos max_days dias corridos até base."""
+    if base is None:
+        base = datetime.now()
+    today = datetime.now().date()
+
+    for i in range(max_days):
+        dt = (base - timedelta(days=i)).date()
+
+        if dt > today:
+            continue
+
+        if is_dia_util(dt):
+            yield datetime.combine(dt, datetime.min.time())
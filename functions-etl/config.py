@@ -1,41 +1,67 @@
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-
-# Procura o .env na pasta atual OU na raiz do projeto
-env_candidates = [
-    Path(__file__).parent / '.env',
-    Path(__file__).parent.parent / '.env',
-    Path.cwd() / '.env'
-]
-for env_path in env_candidates:
-    if env_path.exists():
-        load_dotenv(env_path)
-        break
-
-class Config:
-    # Diretórios
-    BASE_DIR = Path(__file__).parent.resolve()
-    DATA_DIR = Path(os.getenv("PATH_TO_SAVE", "./dados_b3")).resolve()
-    
-    # Azure Storage
-    AZURE_STORAGE_CONNECTION = os.getenv(
-        "AZURE_STORAGE_CONNECTION_STRING")
-    CONTAINER_NAME = os.getenv("AZURE_BLOB_CONTAINER", "dados-pregao")
-    UPLOAD_TO_BLOB = os.getenv("UPLOAD_TO_BLOB", "true").lower() == "true"
-    
-    # PostgreSQL
-    POSTGRES_HOST = os.getenv("POSTGRES_HOST")
-    POSTGRES_PORT = os.getenv("POSTGRES_PORT")
-    POSTGRES_DB = os.getenv("POSTGRES_DB")
-    POSTGRES_USER = os.getenv("POSTGRES_USER")
-    POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
-    POSTGRES_SSL_MODE = os.getenv("POSTGRES_SSL_MODE")
-    POSTGRES_CONNECTION_STRING = os.getenv("POSTGRES_CONNECTION_STRING")
-    
-    # Exportação opcional
-    EXPORT_JSON = os.getenv("EXPORT_JSON", "false").lower() == "true"
-
-    # Processamento multi-dia
-    MULTI_DAY_PROCESSING = os.getenv("MULTI_DAY_PROCESSING", "false")
-    MULTI_DAY_LIMIT = int(os.getenv("MULTI_DAY_LIMIT", "5"))  # Número de dias úteis para processar
\ No newline at end of file
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Procura o .env na pasta atual OU na raiz do projeto
+env_candidates = [
+    Path(__file__).parent / '.env',
+    Path(__file__).parent.parent / '.env',
+    Path.cwd() / '.env'
+]
+for env_path in env_candidates:
+    if env_path.exists():
+        load_dotenv(env_path)
+        break
+
+class Config:
+    # Diretórios
+    BASE_DIR = Path(__file__).parent.resolve()
+    DATA_DIR = Path(os.getenv("PATH_TO_SAVE", "./dados_b3")).resolve()
+    
+    # Azure Storage
+    AZURE_STORAGE_CONNECTION = os.getenv(
+        "AZURE_STORAGE_CONNECTION_STRING")
+    CONTAINER_NAME = os.getenv("AZURE_BLOB_CONTAINER", "dados-pregao")
+    UPLOAD_TO_BLOB = os.getenv("UPLOAD_TO_BLOB", "true").lower() == "true"
+    # Diretório local usado no lugar do Blob (container fake, sem Azure/Azurite)
+    LOCAL_BLOB_DIR = os.getenv("LOCAL_BLOB_DIR")
+    # Compressão dos XMLs gravados no Blob: gzip | none
+    BLOB_COMPRESSION = os.getenv("BLOB_COMPRESSION", "gzip").lower()
+    # Conexões HTTP simultâneas no pool compartilhado do Blob
+    BLOB_POOL_SIZE = int(os.getenv("BLOB_POOL_SIZE", "32"))
+    
+    # PostgreSQL
+    POSTGRES_HOST = os.getenv("POSTGRES_HOST")
+    POSTGRES_PORT = os.getenv("POSTGRES_PORT")
+    POSTGRES_DB = os.getenv("POSTGRES_DB")
+    POSTGRES_USER = os.getenv("POSTGRES_USER")
+    POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+    POSTGRES_SSL_MODE = os.getenv("POSTGRES_SSL_MODE")
+    POSTGRES_CONNECTION_STRING = os.getenv("POSTGRES_CONNECTION_STRING")
+    
+    # Exportação opcional
+    EXPORT_JSON = os.getenv("EXPORT_JSON", "false").lower() == "true"
+
+    # Processamento multi-dia
+    MULTI_DAY_PROCESSING = os.getenv("MULTI_DAY_PROCESSING", "false")
+    MULTI_DAY_LIMIT = int(os.getenv("MULTI_DAY_LIMIT", "5"))  # Número de dias úteis para processar
+
+    # Backfill incremental (manifesto de datas processadas)
+    BACKFILL_MANIFEST = Path(os.getenv("BACKFILL_MANIFEST", str(DATA_DIR / "backfill_manifest.json"))).resolve()
+    # Datas sem arquivo na B3 são retentadas após este intervalo, dobrado a cada nova tentativa
+    BACKFILL_RETENTAR_HORAS = float(os.getenv("BACKFILL_RETENTAR_HORAS", "24"))
+
+    # Cache de cotações extraídas por hash do XML: blob | local | ambos | off
+    PARSE_CACHE = os.getenv("PARSE_CACHE", "blob")
+    PARSE_CACHE_DIR = Path(os.getenv("PARSE_CACHE_DIR", str(DATA_DIR / "parse_cache"))).resolve()
+
+    # Blob Trigger: parse vai para staging e o dia é carregado em uma transação
+    LOADER_BATCH_MODE = os.getenv("LOADER_BATCH_MODE", "true").lower() == "true"
+    # Dia incompleto no staging há mais que isso é carregado com os arquivos presentes
+    STAGING_EXPIRA_MINUTOS = float(os.getenv("STAGING_EXPIRA_MINUTOS", "30"))
+
+    # Instrumentação: resumo JSON por execução (também anexado ao arquivo, se definido)
+    ETL_METRICS_FILE = Path(os.getenv("ETL_METRICS_FILE")).resolve() if os.getenv("ETL_METRICS_FILE") else None
+    # Profiler opcional da execução: cprofile | pyinstrument (vazio = desligado)
+    ETL_PROFILE = os.getenv("ETL_PROFILE", "")
+    ETL_PROFILE_DIR = Path(os.getenv("ETL_PROFILE_DIR", str(DATA_DIR / "profiles"))).resolve()
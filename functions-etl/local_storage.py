@@ -0,0 +1,185 @@
+"""
+Container de Blob simulado em disco.
+
+Implementa o subconjunto da API do azure-storage-blob usado pelo ETL
+(ContainerClient/BlobClient, inclusive leases) para rodar uploads, o Blob
+Trigger em modo lote e os benchmarks sem Azure nem Azurite. Ativado por
+LOCAL_BLOB_DIR.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceNotFoundError
+
+_lock = threading.Lock()
+
+
+class _Download:
+    def __init__(self, conteudo: bytes, properties, chunk_size: int = 4 * 1024 * 1024):
+        self._conteudo = conteudo
+        self._chunk_size = chunk_size
+        self.properties = properties
+        self.size = len(conteudo)
+
+    def readall(self):
+        return self._conteudo
+
+    def chunks(self):
+        for i in range(0, len(self._conteudo), self._chunk_size):
+            yield self._conteudo[i:i + self._chunk_size]
+
+
+class _Lease:
+    # Lease exclusivo gravado em arquivo (vale entre processos); expira como no Azure
+    def __init__(self, blob_client, lease_duration=-1, lease_id=None):
+        self.blob_client = blob_client
+        self.id = lease_id or str(uuid.uuid4())
+        with _lock:
+            if not blob_client._dados.exists():
+                raise ResourceNotFoundError(f"Blob não encontrado: {blob_client.blob_name}")
+            atual = blob_client._lease_ativo()
+            if atual and atual != self.id:
+                raise ResourceExistsError(f"Lease já ativo: {blob_client.blob_name}")
+            expira = time.time() + lease_duration if lease_duration and lease_duration > 0 else None
+            blob_client._lease.parent.mkdir(parents=True, exist_ok=True)
+            blob_client._lease.write_text(json.dumps({"id": self.id, "expira": expira}), encoding="utf-8")
+
+    def release(self, **kwargs):
+        with _lock:
+            if self.blob_client._lease_ativo() == self.id:
+                self.blob_client._lease.unlink()
+
+
+class LocalBlobClient:
+    def __init__(self, container, blob_name):
+        self.container = container
+        self.blob_name = blob_name
+        self._dados = container.root / "blobs" / blob_name
+        self._props = container.root / "props" / f"{blob_name}.json"
+        self._lease = container.root / "leases" / f"{blob_name}.json"
+
+    def exists(self):
+        return self._dados.exists()
+
+    def _lease_ativo(self):
+        if not self._lease.exists():
+            return None
+        lease = json.loads(self._lease.read_text(encoding="utf-8"))
+        if lease["expira"] is not None and lease["expira"] < time.time():
+            return None
+        return lease["id"]
+
+    def _verificar_lease(self, lease):
+        atual = self._lease_ativo()
+        lease_id = getattr(lease, "id", lease)
+        if atual and atual != lease_id:
+            raise HttpResponseError(message=f"Blob com lease ativo: {self.blob_name}")
+
+    def acquire_lease(self, lease_duration=-1, lease_id=None, **kwargs):
+        return _Lease(self, lease_duration, lease_id)
+
+    def upload_blob(self, data, overwrite=False, content_settings=None, metadata=None, lease=None, **kwargs):
+        conteudo = data.read() if hasattr(data, "read") else bytes(data)
+        settings = content_settings or SimpleNamespace()
+        md5 = getattr(settings, "content_md5", None)
+        props = {
+            "etag": uuid.uuid4().hex,
+            "last_modified": datetime.now(timezone.utc).isoformat(),
+            "content_type": getattr(settings, "content_type", None),
+            "content_encoding": getattr(settings, "content_encoding", None),
+            # Como no Azure: sem MD5 informado, o serviço calcula em uploads de uma parte
+            "content_md5": bytes(md5).hex() if md5 else hashlib.md5(conteudo).hexdigest(),
+            "metadata": metadata or {},
+        }
+        with _lock:
+            if self._dados.exists() and not overwrite:
+                raise ResourceExistsError(f"Blob já existe: {self.blob_name}")
+            self._verificar_lease(lease)
+            self._dados.parent.mkdir(parents=True, exist_ok=True)
+            self._props.parent.mkdir(parents=True, exist_ok=True)
+            self._dados.write_bytes(conteudo)
+            self._props.write_text(json.dumps(props), encoding="utf-8")
+        return {"etag": props["etag"]}
+
+    def get_blob_properties(self):
+        if not self._dados.exists():
+            raise ResourceNotFoundError(f"Blob não encontrado: {self.blob_name}")
+        return self.container._propriedades(self.blob_name, self._dados, self._props)
+
+    def download_blob(self, **kwargs):
+        with _lock:
+            if not self._dados.exists():
+                raise ResourceNotFoundError(f"Blob não encontrado: {self.blob_name}")
+            conteudo = self._dados.read_bytes()
+        return _Download(conteudo, self.get_blob_properties())
+
+    def delete_blob(self, lease=None, **kwargs):
+        with _lock:
+            if not self._dados.exists():
+                raise ResourceNotFoundError(f"Blob não encontrado: {self.blob_name}")
+            self._verificar_lease(lease)
+            self._dados.unlink()
+            for extra in (self._props, self._lease):
+                if extra.exists():
+                    extra.unlink()
+
+
+class LocalContainerClient:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.container_name = self.root.name
+
+    def exists(self):
+        return self.root.exists()
+
+    def create_container(self, **kwargs):
+        if self.root.exists():
+            raise ResourceExistsError(f"Container já existe: {self.container_name}")
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+
+    def get_blob_client(self, blob):
+        return LocalBlobClient(self, blob)
+
+    def upload_blob(self, name, data, **kwargs):
+        self.get_blob_client(name).upload_blob(data, **kwargs)
+        return self.get_blob_client(name)
+
+    def download_blob(self, blob, **kwargs):
+        return self.get_blob_client(blob).download_blob(**kwargs)
+
+    def delete_blob(self, blob, **kwargs):
+        self.get_blob_client(blob).delete_blob(**kwargs)
+
+    def list_blobs(self, name_starts_with=None, include=None, **kwargs):
+        base = self.root / "blobs"
+        if not base.exists():
+            return
+        for caminho in sorted(base.rglob("*")):
+            if not caminho.is_file():
+                continue
+            nome = caminho.relative_to(base).as_posix()
+            if name_starts_with and not nome.startswith(name_starts_with):
+                continue
+            yield self._propriedades(nome, caminho, self.root / "props" / f"{nome}.json")
+
+    def _propriedades(self, nome, dados, props_path):
+        props = json.loads(props_path.read_text(encoding="utf-8")) if props_path.exists() else {}
+        md5 = props.get("content_md5")
+        return SimpleNamespace(
+            name=nome,
+            size=dados.stat().st_size,
+            etag=props.get("etag", ""),
+            last_modified=props.get("last_modified"),
+            metadata=props.get("metadata", {}),
+            content_settings=SimpleNamespace(
+                content_type=props.get("content_type"),
+                content_encoding=props.get("content_encoding"),
+                content_md5=bytearray.fromhex(md5) if md5 else None,
+            ),
+        )
@@ -0,0 +1,168 @@
+"""
+Manifesto do backfill incremental.
+
+Registra, por data de pregão, quantas cotações foram carregadas e o checksum
+de cada XML no Blob. Cruzado com o estado atual do Postgres e do Blob, decide
+quais datas estão faltando ou mudaram. É regravado de forma atômica a cada
+dia concluído, permitindo retomar após uma falha.
+
+Datas sem arquivo na B3 ficam como indisponíveis e só são tentadas de novo
+depois de Config.BACKFILL_RETENTAR_HORAS, intervalo que dobra a cada
+tentativa (ou no modo completo, que limpa o manifesto).
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from config import Config
+from helpers import yymmdd
+
+STATUS_OK = "ok"
+STATUS_EM_ANDAMENTO = "em_andamento"
+STATUS_INDISPONIVEL = "indisponivel"
+
+# Teto do intervalo entre tentativas de uma data indisponível
+_RETENTAR_MAXIMO = timedelta(days=30)
+
+
+class BackfillManifest:
+    def __init__(self, path=None):
+        self.path = Path(path or Config.BACKFILL_MANIFEST)
+        self.datas = {}
+        self._lock = threading.Lock()
+        self._carregar()
+
+    def _carregar(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.datas = json.load(f).get("datas", {})
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Manifesto ilegível em {self.path}, ignorando: {e}")
+            self.datas = {}
+
+    def _salvar(self):
+        # Grava em arquivo temporário e troca (não corrompe o manifesto em caso de queda)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"datas": self.datas}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def limpar(self):
+        with self._lock:
+            self.datas = {}
+            self._salvar()
+
+    def iniciar(self, data_ref):
+        """Marca a data como em andamento (refeita se o processo cair no meio)."""
+        with self._lock:
+            self.datas[_chave(data_ref)] = {
+                "status": STATUS_EM_ANDAMENTO,
+                "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._salvar()
+
+    def registrar(self, data_ref, cotacoes: int, arquivos: dict):
+        """Marca a data como concluída com a contagem carregada e checksums dos blobs."""
+        with self._lock:
+            self.datas[_chave(data_ref)] = {
+                "status": STATUS_OK,
+                "cotacoes": cotacoes,
+                "arquivos": arquivos,
+                "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._salvar()
+
+    def marcar_indisponivel(self, data_ref):
+        """Registra que a B3 não tinha o arquivo da data (conta as tentativas)."""
+        with self._lock:
+            anterior = self.datas.get(_chave(data_ref)) or {}
+            tentativas = anterior.get("tentativas", 0) if anterior.get("status") == STATUS_INDISPONIVEL else 0
+            self.datas[_chave(data_ref)] = {
+                "status": STATUS_INDISPONIVEL,
+                "tentativas": tentativas + 1,
+                "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._salvar()
+
+    def descartar(self, data_ref):
+        with self._lock:
+            if self.datas.pop(_chave(data_ref), None) is not None:
+                self._salvar()
+
+    def planejar(self, datas, contagem_db: dict, checksums_blob: dict):
+        """
+        Separa as datas em pendentes, já processadas e indisponíveis.
+
+        contagem_db: {date: total de cotações no Postgres}
+        checksums_blob: {"xml/AAMMDD/arquivo.xml": checksum}
+        Datas presentes no Postgres e no Blob sem entrada no manifesto (ex.: carga
+        anterior ao manifesto) são adotadas sem reprocessamento. Datas marcadas
+        como indisponíveis ficam de fora até vencer o intervalo de nova tentativa.
+
+        Retorna (pendentes, adotadas, indisponiveis).
+        """
+        blobs_por_data = {}
+        for nome, checksum in checksums_blob.items():
+            partes = nome.split("/")
+            if len(partes) >= 3:
+                blobs_por_data.setdefault(partes[1], {})[nome] = checksum
+
+        pendentes, adotadas, indisponiveis = [], 0, 0
+        agora = datetime.now()
+        with self._lock:
+            for data_ref in datas:
+                total_db = contagem_db.get(_como_date(data_ref), 0)
+                arquivos = blobs_por_data.get(yymmdd(data_ref), {})
+                entrada = self.datas.get(_chave(data_ref))
+
+                if entrada is not None and entrada.get("status") == STATUS_INDISPONIVEL:
+                    if total_db and arquivos:
+                        # Carregada depois por outro caminho (ex.: execução diária): adota
+                        entrada = None
+                    elif not _retentar(entrada, agora):
+                        indisponiveis += 1
+                        continue
+
+                if not total_db or not arquivos:
+                    pendentes.append(data_ref)
+                elif entrada is None:
+                    self.datas[_chave(data_ref)] = {
+                        "status": STATUS_OK,
+                        "cotacoes": total_db,
+                        "arquivos": arquivos,
+                        "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+                    }
+                    adotadas += 1
+                elif (entrada.get("status") != STATUS_OK
+                      or entrada.get("cotacoes") != total_db
+                      or entrada.get("arquivos") != arquivos):
+                    pendentes.append(data_ref)
+
+            if adotadas:
+                self._salvar()
+
+        return pendentes, adotadas, indisponiveis
+
+
+def _retentar(entrada, agora):
+    # Intervalo base dobrado a cada tentativa, com teto
+    try:
+        ultima = datetime.fromisoformat(entrada["atualizado_em"])
+    except (KeyError, TypeError, ValueError):
+        return True
+    tentativas = max(1, int(entrada.get("tentativas", 1)))
+    intervalo = timedelta(hours=Config.BACKFILL_RETENTAR_HORAS) * 2 ** min(tentativas - 1, 10)
+    return agora - ultima >= min(intervalo, _RETENTAR_MAXIMO)
+
+
+def _como_date(data_ref):
+    return data_ref.date() if isinstance(data_ref, datetime) else data_ref
+
+
+def _chave(data_ref):
+    return _como_date(data_ref).isoformat()
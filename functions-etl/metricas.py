@@ -0,0 +1,227 @@
+"""
+Instrumentação do ETL: tempo, bytes, linhas e itens por estágio, pico de
+memória (RSS) e um resumo JSON por execução.
+
+    with execucao("ExtractorTimer"):
+        with etapa("download") as e:
+            conteudo = baixar()
+            e.bytes += len(conteudo)
+
+Ao sair, execucao() imprime uma linha "[METRICS] {...}" e, se
+ETL_METRICS_FILE estiver definido, acrescenta o JSON ao arquivo (JSONL).
+
+etapa() fora de uma execução não registra nada. Threads de pools (upload,
+carga paralela) registram na execução ativa mais recente do processo;
+processos filhos (parse do backfill) não compartilham memória, então o pai
+registra o tempo que eles devolvem (registrar()).
+
+ETL_PROFILE=cprofile|pyinstrument perfila a execução (só a thread que a
+abriu) e grava o relatório em ETL_PROFILE_DIR.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from config import Config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("etl")
+
+_atual = ContextVar("execucao_etl", default=None)
+_ativas = []
+_ativas_lock = threading.Lock()
+
+
+def rss_pico_mb():
+    """Pico de memória residente do processo e dos filhos já encerrados, em MB."""
+    if resource is None:
+        return None
+    # ru_maxrss: KB no Linux, bytes no macOS
+    escala = 1 if sys.platform == "darwin" else 1024
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * escala
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * escala
+    return round(max(proprio, filhos) / 1e6, 1)
+
+
+class Medicao:
+    """Acumuladores de uma chamada de etapa(); preenchidos pelo chamador."""
+
+    __slots__ = ("bytes", "linhas", "itens")
+
+    def __init__(self):
+        self.bytes = 0
+        self.linhas = 0
+        self.itens = 0
+
+
+class Execucao:
+    def __init__(self, nome):
+        self.nome = nome
+        self.inicio = time.perf_counter()
+        self.iniciada_em = datetime.now().isoformat(timespec="seconds")
+        self.etapas = {}
+        self.contadores = {}
+        self.status = "ok"
+        self._lock = threading.Lock()
+
+    def registrar(self, nome, segundos, bytes=0, linhas=0, itens=0, erro=False):
+        with self._lock:
+            e = self.etapas.setdefault(nome, {
+                "chamadas": 0, "segundos": 0.0, "bytes": 0, "linhas": 0, "itens": 0, "erros": 0
+            })
+            e["chamadas"] += 1
+            e["segundos"] += segundos
+            e["bytes"] += bytes
+            e["linhas"] += linhas
+            e["itens"] += itens
+            e["erros"] += int(erro)
+            e["rss_pico_mb"] = rss_pico_mb()
+
+    def contar(self, nome, n=1):
+        with self._lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def resumo(self):
+        with self._lock:
+            etapas = {
+                nome: dict(e, segundos=round(e["segundos"], 3))
+                for nome, e in self.etapas.items()
+            }
+            contadores = dict(self.contadores)
+        return {
+            "execucao": self.nome,
+            "inicio": self.iniciada_em,
+            "duracao_s": round(time.perf_counter() - self.inicio, 3),
+            "status": self.status,
+            "rss_pico_mb": rss_pico_mb(),
+            "etapas": etapas,
+            "contadores": contadores,
+        }
+
+
+def execucao_atual():
+    atual = _atual.get()
+    if atual is not None:
+        return atual
+    with _ativas_lock:
+        return _ativas[-1] if _ativas else None
+
+
+@contextmanager
+def etapa(nome):
+    """Mede o bloco; segundos somam entre threads (tempo ocupado, não de parede)."""
+    medicao = Medicao()
+    inicio = time.perf_counter()
+    erro = False
+    try:
+        yield medicao
+    except BaseException:
+        erro = True
+        raise
+    finally:
+        execucao = execucao_atual()
+        if execucao is not None:
+            execucao.registrar(nome, time.perf_counter() - inicio, medicao.bytes,
+                               medicao.linhas, medicao.itens, erro)
+
+
+def registrar(nome, segundos, **kwargs):
+    """Registra uma medição feita fora deste processo (ex.: parse em processo filho)."""
+    execucao = execucao_atual()
+    if execucao is not None:
+        execucao.registrar(nome, segundos, **kwargs)
+
+
+def contar(nome, n=1):
+    execucao = execucao_atual()
+    if execucao is not None:
+        execucao.contar(nome, n)
+
+
+# --- profiler opcional (ETL_PROFILE) ---
+
+def _iniciar_profiler():
+    modo = (Config.ETL_PROFILE or "").lower()
+    if modo == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return modo, profiler
+    if modo == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[WARNING] ETL_PROFILE=pyinstrument, mas o pyinstrument não está instalado")
+            return None
+        profiler = Profiler()
+        profiler.start()
+        return modo, profiler
+    if modo:
+        print(f"[WARNING] ETL_PROFILE desconhecido: {modo} (use cprofile ou pyinstrument)")
+    return None
+
+
+def _finalizar_profiler(perfil, nome):
+    modo, profiler = perfil
+    Config.ETL_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    base = Config.ETL_PROFILE_DIR / f"{nome}_{datetime.now():%Y%m%d_%H%M%S}"
+    if modo == "cprofile":
+        profiler.disable()
+        caminho = base.with_suffix(".prof")
+        profiler.dump_stats(caminho)
+    else:
+        profiler.stop()
+        caminho = base.with_suffix(".html")
+        caminho.write_text(profiler.output_html(), encoding="utf-8")
+    print(f"[INFO] Perfil ({modo}) salvo em {caminho}")
+
+
+@contextmanager
+def execucao(nome):
+    """Abre uma execução instrumentada e emite o resumo JSON ao final."""
+    if _atual.get() is not None:
+        # Entry point chamado por outro (ex.: postgres_loader.run -> xml_parse.run): um resumo só
+        yield _atual.get()
+        return
+
+    run = Execucao(nome)
+    token = _atual.set(run)
+    with _ativas_lock:
+        _ativas.append(run)
+    perfil = _iniciar_profiler()
+    try:
+        yield run
+    except BaseException:
+        run.status = "erro"
+        raise
+    finally:
+        if perfil:
+            try:
+                _finalizar_profiler(perfil, nome)
+            except Exception as e:
+                print(f"[WARNING] Falha ao salvar o perfil: {e}")
+        with _ativas_lock:
+            _ativas.remove(run)
+        _atual.reset(token)
+        _emitir(run.resumo())
+
+
+def _emitir(resumo):
+    linha = json.dumps(resumo, ensure_ascii=False, default=str)
+    print(f"[METRICS] {linha}")
+    if Config.ETL_METRICS_FILE:
+        try:
+            Config.ETL_METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(Config.ETL_METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(linha + "\n")
+        except OSError as e:
+            print(f"[WARNING] Não foi possível gravar as métricas em {Config.ETL_METRICS_FILE}: {e}")
@@ -0,0 +1,143 @@
+"""
+Migração dos XMLs do Blob para o formato comprimido (gzip)
+
+Execução:
+    python migrar_compressao.py                  # migra todo o prefixo xml/
+    python migrar_compressao.py --prefixo xml/25 # só um ano/mês
+    python migrar_compressao.py --simular        # apenas mostra a economia estimada
+
+Cada blob sem Content-Encoding gzip é baixado, comprimido e regravado com o
+mesmo nome, com o MD5 original no metadado md5_original (o checksum usado pelo
+manifesto do backfill e pelo upload incremental não muda). A regravação é
+condicionada ao ETag lido: blobs alterados durante a migração são pulados.
+
+Observação: a regravação dispara o Blob Trigger; o parse sai do cache (a
+chave é o hash do XML descomprimido) e o upsert é idempotente.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+from azure.core import MatchConditions
+from azure.storage.blob import ContentSettings
+
+from storage import GZIP_MAGIC, comprimir, get_container_client, list_blobs
+from metricas import execucao
+
+
+def _migrar_blob(container_client, blob, simular):
+    # Retorna (bytes antes, bytes depois, migrado)
+    settings = blob.content_settings
+    if (settings.content_encoding or "").lower() == "gzip":
+        return blob.size, blob.size, False
+
+    blob_client = container_client.get_blob_client(blob.name)
+    conteudo = blob_client.download_blob().readall()
+    if conteudo[:2] == GZIP_MAGIC:
+        # Já comprimido sem o cabeçalho correto: não comprime de novo
+        return len(conteudo), len(conteudo), False
+
+    payload = comprimir(conteudo)
+    if not simular:
+        blob_client.upload_blob(
+            payload,
+            overwrite=True,
+            etag=blob.etag,
+            match_condition=MatchConditions.IfNotModified,
+            content_settings=ContentSettings(
+                content_type=settings.content_type or "application/xml",
+                content_encoding="gzip",
+                content_md5=bytearray(hashlib.md5(payload).digest()),
+            ),
+            metadata={**(blob.metadata or {}), "md5_original": hashlib.md5(conteudo).hexdigest()},
+        )
+    return len(conteudo), len(payload), True
+
+
+def migrar_compressao(prefixo: str = "xml/", workers: int = 8, simular: bool = False):
+    """
+    Comprime em paralelo os XMLs ainda não comprimidos do prefixo
+
+    Args:
+        prefixo: Prefixo dos blobs no container (padrão: xml/)
+        workers: Blobs migrados simultaneamente (threads)
+        simular: Não grava nada, só calcula a economia
+    """
+    inicio = time.perf_counter()
+    container_client = get_container_client()
+
+    print(f"🔎 Listando blobs em '{prefixo}'...")
+    blobs = [b for b in list_blobs(container_client, name_starts_with=prefixo, include=["metadata"])
+             if b.name.endswith(".xml")]
+    print(f"📋 {len(blobs)} XML(s) encontrados\n")
+
+    migrados, ja_comprimidos, falhas = 0, 0, []
+    antes_total, depois_total = 0, 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(_migrar_blob, container_client, b, simular): b for b in blobs}
+        for i, future in enumerate(as_completed(futures), start=1):
+            blob = futures[future]
+            try:
+                antes, depois, migrado = future.result()
+            except Exception as e:
+                falhas.append(f"{blob.name}: {e}")
+                continue
+            antes_total += antes
+            depois_total += depois
+            if migrado:
+                migrados += 1
+            else:
+                ja_comprimidos += 1
+            if i % 100 == 0:
+                print(f"   ... {i}/{len(blobs)} blobs")
+
+    # Resumo final
+    duracao = time.perf_counter() - inicio
+    print(f"\n{'='*70}")
+    print(f"📊 RESUMO DA MIGRAÇÃO{' (SIMULAÇÃO)' if simular else ''}")
+    print(f"{'='*70}")
+    print(f"🗜️  Blobs comprimidos: {migrados}")
+    print(f"💤 Já estavam comprimidos: {ja_comprimidos}")
+    if antes_total:
+        print(f"📦 Tamanho: {antes_total / 1e6:,.1f} MB -> {depois_total / 1e6:,.1f} MB "
+              f"({100 * (1 - depois_total / antes_total):.1f}% menor)")
+    print(f"⏱️  Duração: {duracao:.1f}s")
+
+    if falhas:
+        print(f"\n⚠️  FALHAS ({len(falhas)}):")
+        for falha in falhas:
+            print(f"   - {falha}")
+
+    print(f"\n{'='*70}\n")
+    return {"migrados": migrados, "ja_comprimidos": ja_comprimidos, "falhas": falhas}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Comprime com gzip os XMLs já gravados no Blob")
+    arg_parser.add_argument("--prefixo", default="xml/", help="Prefixo dos blobs (padrão: xml/)")
+    arg_parser.add_argument("--workers", type=int, default=8, help="Blobs simultâneos (padrão: 8)")
+    arg_parser.add_argument("--simular", action="store_true", help="Só calcula a economia, sem gravar")
+    args = arg_parser.parse_args()
+
+    if not os.getenv("AZURE_STORAGE_CONNECTION_STRING") and not os.getenv("LOCAL_BLOB_DIR"):
+        print("❌ ERRO: Variável de ambiente faltando: AZURE_STORAGE_CONNECTION_STRING")
+        print("\n💡 Configure as variáveis no arquivo .env ou no ambiente do sistema")
+        sys.exit(1)
+
+    try:
+        with execucao("migrar_compressao"):
+            resultado = migrar_compressao(prefixo=args.prefixo, workers=args.workers, simular=args.simular)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Migração interrompida pelo usuário")
+        sys.exit(0)
+    sys.exit(1 if resultado["falhas"] else 0)
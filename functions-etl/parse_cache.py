@@ -0,0 +1,160 @@
+"""
+Cache de cotações já extraídas, endereçado pelo SHA-256 do XML.
+Para blobs gravados com gzip o hash é o do XML descomprimido, calculado na
+mesma passada que descomprime o conteúdo para o parse.
+
+O mesmo XML é processado pelo backfill local, pelo Blob Trigger disparado no
+upload e pelas retentativas do trigger. O primeiro parse grava um lote
+compacto (JSON gzip) em arquivo local e/ou blob auxiliar; os seguintes leem o
+lote e não passam pelo lxml.
+
+PARSE_CACHE: "blob" (padrão), "local", "ambos" ou "off".
+"""
+import gzip
+import hashlib
+import json
+import threading
+from datetime import date
+from pathlib import Path
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+from config import Config
+from storage import GZIP_MAGIC, descomprimir_chunks, get_container_client
+
+VERSAO = 1
+PREFIXO_BLOB = "cache/parsed/"
+_CAMPOS = ("ativo", "abertura", "fechamento", "maximo", "minimo", "volume")
+
+
+def descomprimir_e_chave(xml_content):
+    """(XML descomprimido, SHA-256) com uma única descompressão do gzip."""
+    data = xml_content.encode("utf-8") if isinstance(xml_content, str) else xml_content
+    if data[:2] != GZIP_MAGIC:
+        return data, hashlib.sha256(data).hexdigest()
+    # XML gravado com gzip: hash do conteúdo original, igual ao do arquivo local
+    h = hashlib.sha256()
+    partes = []
+    blocos = (data[i:i + 1024 * 1024] for i in range(0, len(data), 1024 * 1024))
+    for bloco in descomprimir_chunks(blocos):
+        h.update(bloco)
+        partes.append(bloco)
+    return b"".join(partes), h.hexdigest()
+
+
+def serializar(cotacoes) -> bytes:
+    # Agrupa por data de pregão: cada linha vira uma lista posicional
+    por_data = {}
+    for c in cotacoes:
+        data_pregao = c["data_pregao"].isoformat() if c["data_pregao"] else None
+        por_data.setdefault(data_pregao, []).append([c[campo] for campo in _CAMPOS])
+    payload = {"v": VERSAO, "campos": _CAMPOS, "datas": por_data}
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), mtime=0)
+
+
+def desserializar(conteudo: bytes):
+    payload = json.loads(gzip.decompress(conteudo))
+    if payload.get("v") != VERSAO:
+        return None
+    campos = payload["campos"]
+    cotacoes = []
+    for data_s, linhas in payload["datas"].items():
+        data_pregao = date.fromisoformat(data_s) if data_s else None
+        for linha in linhas:
+            cotacao = dict(zip(campos, linha))
+            cotacao["data_pregao"] = data_pregao
+            cotacoes.append(cotacao)
+    return cotacoes
+
+
+class ParseCache:
+    def __init__(self, modo=None, container_client=None, diretorio=None):
+        self.modo = (modo or Config.PARSE_CACHE).lower()
+        self.diretorio = Path(diretorio or Config.PARSE_CACHE_DIR)
+        self._container_client = container_client
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ativo(self):
+        return self.modo != "off"
+
+    @property
+    def usa_local(self):
+        return self.modo in ("local", "ambos")
+
+    @property
+    def usa_blob(self):
+        return self.modo in ("blob", "ambos")
+
+    @property
+    def container_client(self):
+        if self._container_client is None:
+            self._container_client = get_container_client()
+        return self._container_client
+
+    def _caminho(self, sha):
+        return self.diretorio / sha[:2] / f"{sha}.json.gz"
+
+    def obter(self, sha):
+        """Lote em cache para o hash, ou None."""
+        if not self.ativo:
+            return None
+        conteudo = None
+        if self.usa_local:
+            caminho = self._caminho(sha)
+            if caminho.exists():
+                conteudo = caminho.read_bytes()
+        if conteudo is None and self.usa_blob:
+            try:
+                conteudo = self.container_client.get_blob_client(f"{PREFIXO_BLOB}{sha}.json.gz").download_blob().readall()
+            except ResourceNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[WARNING] Falha ao ler cache de parse {sha[:12]}: {e}")
+
+        cotacoes = None
+        if conteudo is not None:
+            try:
+                cotacoes = desserializar(conteudo)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[WARNING] Cache de parse inválido {sha[:12]}: {e}")
+        if cotacoes is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cotacoes
+
+    def gravar(self, sha, cotacoes):
+        if not self.ativo:
+            return
+        conteudo = serializar(cotacoes)
+        if self.usa_local:
+            caminho = self._caminho(sha)
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            tmp = caminho.with_suffix(".tmp")
+            tmp.write_bytes(conteudo)
+            tmp.replace(caminho)
+        if self.usa_blob:
+            try:
+                self.container_client.get_blob_client(f"{PREFIXO_BLOB}{sha}.json.gz").upload_blob(
+                    conteudo,
+                    overwrite=True,
+                    content_settings=ContentSettings(content_type="application/gzip"),
+                )
+            except Exception as e:
+                print(f"[WARNING] Falha ao gravar cache de parse {sha[:12]}: {e}")
+
+
+_padrao = None
+_padrao_lock = threading.Lock()
+
+
+def cache_padrao():
+    """Instância do processo (usada pelos workers de parse do backfill)."""
+    global _padrao
+    with _padrao_lock:
+        if _padrao is None:
+            _padrao = ParseCache()
+        return _padrao
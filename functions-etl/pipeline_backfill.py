@@ -0,0 +1,357 @@
+"""
+Pipeline do backfill em estágios.
+
+    download (threads) --fila--> parse (processos) -> upload (threads) --fila--> carga (1 writer)
+
+- download: baixa o SPRE da B3 e extrai os XMLs (I/O de rede)
+- parse: XPath com lxml em um ProcessPoolExecutor (fora do GIL); grava o
+  cache de parse antes do upload, então o Blob Trigger disparado pelo upload
+  encontra o lote pronto
+- upload: envia os XMLs ao Blob
+- carga: um único writer acumula cotações de vários dias e grava em lotes;
+  com conexoes > 1 cada lote é dividido por data e gravado em paralelo
+
+As filas são limitadas: quando um estágio à frente está cheio, o anterior
+bloqueia (backpressure) e o uso de disco/memória fica controlado. Se o writer
+falhar, um evento de parada libera os estágios bloqueados nas filas e a
+exceção é relançada na thread principal depois que todos terminam.
+"""
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+
+from b3_extractor import B3Extractor
+from config import Config
+from metricas import registrar
+from helpers import yymmdd
+from postgres_loader import PostgresLoader
+from staging import registrar_esperados
+from storage import estatisticas_blob, upload_blobs
+from xml_parse import parse_arquivos
+
+_FIM = object()
+_ESPERA_FILA = 0.5  # s entre verificações do evento de parada nas filas
+
+
+class EtapaStats:
+    """Contadores de um estágio do pipeline."""
+
+    def __init__(self, nome, concorrencia):
+        self.nome = nome
+        self.concorrencia = concorrencia
+        self.itens = 0
+        self.erros = 0
+        self.linhas = 0
+        self.bytes = 0
+        self.ocupado = 0.0
+        self.inicio = None
+        self.fim = None
+        self._lock = threading.Lock()
+
+    def registrar(self, duracao, itens=1, linhas=0, bytes_=0, erro=False):
+        with self._lock:
+            agora = time.perf_counter()
+            if self.inicio is None:
+                self.inicio = agora - duracao
+            self.fim = agora
+            self.ocupado += duracao
+            if erro:
+                self.erros += itens
+            else:
+                self.itens += itens
+                self.linhas += linhas
+                self.bytes += bytes_
+
+    def relatorio(self):
+        parede = (self.fim - self.inicio) if self.inicio is not None else 0.0
+        vazao = self.itens / parede if parede > 0 else 0.0
+        linha = (f"{self.nome:<9} x{self.concorrencia:<3} {self.itens:>5} itens "
+                 f"{self.erros:>3} erros  {parede:8.1f}s  {vazao:7.2f} itens/s  ocupado {self.ocupado:8.1f}s")
+        if self.linhas and parede > 0:
+            linha += f"  {self.linhas / parede:,.0f} linhas/s"
+        if self.bytes and parede > 0:
+            linha += f"  {self.bytes / parede / 1e6:.1f} MB/s"
+        return linha
+
+
+def _parse_dia(caminhos):
+    # Executa no processo filho: devolve também o tempo e as requisições ao Blob (cache)
+    inicio = time.perf_counter()
+    requisicoes = estatisticas_blob()["requisicoes"]
+    cotacoes = parse_arquivos(caminhos)
+    return cotacoes, time.perf_counter() - inicio, estatisticas_blob()["requisicoes"] - requisicoes
+
+
+class BackfillPipeline:
+    def __init__(self, container_client, manifest=None, downloads=4, parsers=None,
+                 lote_linhas=20000, tamanho_fila=8, conexoes=1):
+        self.container_client = container_client
+        self.manifest = manifest
+        self.downloads = max(1, downloads)
+        self.parsers = max(1, parsers or os.cpu_count() or 1)
+        self.lote_linhas = max(1, lote_linhas)
+        self.conexoes = max(1, conexoes)
+        self.fila_parse = queue.Queue(maxsize=max(1, tamanho_fila))
+        self.fila_carga = queue.Queue(maxsize=max(1, tamanho_fila))
+
+        self.stats = {
+            "download": EtapaStats("download", self.downloads),
+            "parse": EtapaStats("parse", self.parsers),
+            "upload": EtapaStats("upload", self.downloads),
+            "carga": EtapaStats("carga", self.conexoes),
+        }
+        self.erros = []
+        self.dias_ok = 0
+        self.indisponiveis = 0
+        self.total_cotacoes = 0
+        self.requisicoes_parse = 0
+        self._lock = threading.Lock()
+        self._vagas_upload = threading.Semaphore(max(1, tamanho_fila))
+        self._parar = threading.Event()
+
+    def _erro(self, data_ref, msg):
+        with self._lock:
+            self.erros.append(f"{data_ref.strftime('%Y-%m-%d')}: {msg}")
+
+    def _colocar(self, fila, item):
+        """put com backpressure que desiste se o pipeline for interrompido."""
+        while not self._parar.is_set():
+            try:
+                fila.put(item, timeout=_ESPERA_FILA)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _retirar(self, fila):
+        """get que devolve _FIM se o pipeline for interrompido."""
+        while not self._parar.is_set():
+            try:
+                return fila.get(timeout=_ESPERA_FILA)
+            except queue.Empty:
+                continue
+        return _FIM
+
+    # Estágio 1: download + extração
+    def _baixar(self, data_ref):
+        if self._parar.is_set():
+            return
+        inicio = time.perf_counter()
+        date_str = yymmdd(data_ref)
+        try:
+            extractor = B3Extractor()
+            zip_bytes, _ = extractor.download_zip(date_str)
+            if not zip_bytes:
+                # Sem arquivo na B3 não é erro: o manifesto guarda a data para nova tentativa
+                if self.manifest:
+                    self.manifest.marcar_indisponivel(data_ref)
+                with self._lock:
+                    self.indisponiveis += 1
+                print(f"⏭️  {data_ref.strftime('%Y-%m-%d')}: arquivo não disponível na B3")
+                return
+
+            if self.manifest:
+                self.manifest.iniciar(data_ref)
+            result = extractor.extract_files(zip_bytes, date_str)
+            self.stats["download"].registrar(time.perf_counter() - inicio, bytes_=len(zip_bytes))
+        except Exception as e:
+            self.stats["download"].registrar(time.perf_counter() - inicio, erro=True)
+            self._erro(data_ref, str(e))
+            return
+
+        # Bloqueia se o parse estiver atrasado (backpressure)
+        if not self._colocar(self.fila_parse, (data_ref, result)):
+            _limpar_arquivos(result)
+
+    def _estagio_download(self, datas):
+        try:
+            with ThreadPoolExecutor(max_workers=self.downloads) as executor:
+                list(executor.map(self._baixar, datas))
+        finally:
+            self._colocar(self.fila_parse, _FIM)
+
+    # Estágio 2: parse em processos; no máximo 2 dias em voo por processo
+    def _estagio_parse(self):
+        em_voo = {}
+        limite = self.parsers * 2
+        uploads = ThreadPoolExecutor(max_workers=self.downloads)
+
+        def coletar(prontos):
+            for future in prontos:
+                data_ref, result = em_voo.pop(future)
+                if self._parar.is_set():
+                    _limpar_arquivos(result)
+                    continue
+                try:
+                    cotacoes, duracao, requisicoes = future.result()
+                except Exception as e:
+                    self.stats["parse"].registrar(0.0, erro=True)
+                    self._erro(data_ref, f"parse: {e}")
+                    _limpar_arquivos(result)
+                    continue
+                self.stats["parse"].registrar(duracao, linhas=len(cotacoes))
+                # O parse roda em processo filho: o resumo da execução recebe o tempo daqui
+                registrar("parse", duracao, linhas=len(cotacoes))
+                self.requisicoes_parse += requisicoes
+                # Bloqueia se houver uploads demais pendentes (backpressure)
+                self._vagas_upload.acquire()
+                uploads.submit(self._enviar, data_ref, result, cotacoes)
+
+        terminou = False
+        try:
+            with ProcessPoolExecutor(max_workers=self.parsers) as executor:
+                while True:
+                    item = self._retirar(self.fila_parse)
+                    if item is _FIM:
+                        terminou = True
+                        break
+                    while len(em_voo) >= limite:
+                        prontos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+                        coletar(prontos)
+                    caminhos = [str(p) for p in item[1]["xml_files"]]
+                    em_voo[executor.submit(_parse_dia, caminhos)] = item
+                coletar(list(em_voo))
+        finally:
+            # Se o estágio falhar, drena a fila para não travar os downloads
+            while not terminou:
+                item = self._retirar(self.fila_parse)
+                if item is _FIM:
+                    break
+                self._erro(item[0], "parse interrompido")
+                _limpar_arquivos(item[1])
+            uploads.shutdown(wait=True)
+            self._colocar(self.fila_carga, _FIM)
+
+    # Estágio 3: upload dos XMLs já processados
+    def _enviar(self, data_ref, result, cotacoes):
+        inicio = time.perf_counter()
+        date_str = yymmdd(data_ref)
+        try:
+            envio = [
+                (f"xml/{date_str}/{xml_file.relative_to(result['xml_dir']).as_posix()}", xml_file)
+                for xml_file in result["xml_files"]
+            ]
+            resultado = upload_blobs(self.container_client, envio, name_starts_with=f"xml/{date_str}/",
+                                     max_workers=4, content_type="application/xml",
+                                     compressao=Config.BLOB_COMPRESSION,
+                                     antes_do_envio=partial(registrar_esperados, self.container_client))
+            if resultado["falhas"]:
+                raise RuntimeError(f"{resultado['falhas']} arquivo(s) não enviado(s)")
+            arquivos = resultado["checksums"]
+            tamanho = sum(xml_file.stat().st_size for xml_file in result["xml_files"])
+            self.stats["upload"].registrar(time.perf_counter() - inicio, bytes_=tamanho)
+        except Exception as e:
+            self.stats["upload"].registrar(time.perf_counter() - inicio, erro=True)
+            self._erro(data_ref, f"upload: {e}")
+            return
+        finally:
+            _limpar_arquivos(result)
+            self._vagas_upload.release()
+
+        self._colocar(self.fila_carga, (data_ref, cotacoes, arquivos))
+
+    # Estágio 4: writer único com lotes de vários dias
+    def _gravar_lote(self, loader, lote):
+        cotacoes = [c for _, linhas, _ in lote for c in linhas]
+        inicio = time.perf_counter()
+        falhas = {}
+        try:
+            if cotacoes and self.conexoes > 1:
+                # Blocos por data em N conexões; só as datas que falharem ficam pendentes
+                falhas = loader.execute_paralelo(cotacoes, conexoes=self.conexoes)["falhas"]
+            elif cotacoes:
+                loader.execute(cotacoes)
+            datas = [data_ref.date() for data_ref, _, _ in lote]
+            contagem = loader.contar_por_data(min(datas), max(datas)) if self.manifest else {}
+            self.stats["carga"].registrar(time.perf_counter() - inicio, itens=len(lote), linhas=len(cotacoes))
+        except Exception as e:
+            self.stats["carga"].registrar(time.perf_counter() - inicio, itens=len(lote), erro=True)
+            for data_ref, _, _ in lote:
+                self._erro(data_ref, f"carga: {e}")
+            return
+
+        for data_ref, linhas, arquivos in lote:
+            if data_ref.date() in falhas:
+                self._erro(data_ref, f"carga: {falhas[data_ref.date()]}")
+                continue
+            if self.manifest:
+                self.manifest.registrar(data_ref, contagem.get(data_ref.date(), 0), arquivos)
+            with self._lock:
+                self.dias_ok += 1
+                self.total_cotacoes += len(linhas)
+        print(f"💾 Lote gravado: {len(lote)} dia(s), {len(cotacoes):,} cotações")
+
+    def _estagio_carga(self):
+        # Conexão única durante todo o backfill (upsert preparado uma vez)
+        loader = PostgresLoader(manter_conexao=True)
+        lote, linhas = [], 0
+        try:
+            while True:
+                item = self.fila_carga.get()
+                if item is _FIM:
+                    break
+                lote.append(item)
+                linhas += len(item[1])
+                if linhas >= self.lote_linhas:
+                    self._gravar_lote(loader, lote)
+                    lote, linhas = [], 0
+            if lote:
+                self._gravar_lote(loader, lote)
+        finally:
+            loader.disconnect()
+
+    def executar(self, datas):
+        """Processa as datas e retorna o resumo com estatísticas por estágio."""
+        inicio = time.perf_counter()
+        requisicoes = estatisticas_blob()["requisicoes"]
+        threads = [
+            threading.Thread(target=self._estagio_download, args=(datas,), name="backfill-download"),
+            threading.Thread(target=self._estagio_parse, name="backfill-parse"),
+        ]
+        for t in threads:
+            t.start()
+        try:
+            self._estagio_carga()
+        except BaseException:
+            # Writer caiu: libera os estágios presos nas filas antes de relançar
+            self._parar.set()
+            raise
+        finally:
+            for t in threads:
+                t.join()
+            self._descartar_filas()
+
+        return {
+            "dias_ok": self.dias_ok,
+            "indisponiveis": self.indisponiveis,
+            "total_cotacoes": self.total_cotacoes,
+            "erros": self.erros,
+            "duracao": time.perf_counter() - inicio,
+            # Processo principal (listagens/uploads) + processos de parse (cache)
+            "requisicoes_blob": estatisticas_blob()["requisicoes"] - requisicoes + self.requisicoes_parse,
+        }
+
+    def _descartar_filas(self):
+        # Itens que sobraram após uma interrupção: remove os arquivos extraídos
+        for fila in (self.fila_parse, self.fila_carga):
+            while True:
+                try:
+                    item = fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _FIM and fila is self.fila_parse:
+                    _limpar_arquivos(item[1])
+
+    def relatorio(self):
+        return [etapa.relatorio() for etapa in self.stats.values()]
+
+
+def _limpar_arquivos(result):
+    if result["zip_path"].exists():
+        result["zip_path"].unlink()
+    if result["xml_dir"].exists():
+        shutil.rmtree(result["xml_dir"])
@@ -1,143 +1,312 @@
-from config import Config
-import psycopg2
-from datetime import datetime
-from xml_parse import run as transform_run
-import time
-
-class PostgresLoader:
-    def __init__(self):
-        self.conn = None
-        self.cursor = None
-    
-    def load_cotacoes(self, cotacoes):
-        """Alias para execute(), por compatibilidade."""
-        return self.execute(cotacoes)
-    
-    def close(self):
-        """Alias para disconnect(), por compatibilidade."""
-        self.disconnect()
-    
-    def connect(self, max_retries=5, retry_interval=2):
-        """
-        Conecta ao PostgreSQL de forma resiliente.
-        Prioriza a POSTGRES_CONNECTION_STRING (para o Azure) e faz fallback
-        para variáveis de ambiente separadas (para desenvolvimento local).
-        """
-        for attempt in range(max_retries):
-            try:
-                connection_string = Config.POSTGRES_CONNECTION_STRING
-                
-                if connection_string:
-                    # Método 1: Usar a connection string (ideal para o Azure)
-                    self.conn = psycopg2.connect(connection_string)
-                else:
-                    # Método 2: Fallback para variáveis separadas (para ambiente local)
-                    self.conn = psycopg2.connect(
-                        host=Config.POSTGRES_HOST,
-                        port=Config.POSTGRES_PORT,
-                        dbname=Config.POSTGRES_DB,
-                        user=Config.POSTGRES_USER,
-                        password=Config.POSTGRES_PASSWORD,
-                        sslmode=Config.POSTGRES_SSL_MODE
-                    )
-
-                self.conn.autocommit = False
-                self.cursor = self.conn.cursor()
-                print("[INFO] Conexão PostgreSQL estabelecida")
-                return True
-            
-            except psycopg2.OperationalError as e:
-                if attempt < max_retries - 1:
-                    print(f"[WARNING] Falha na conexão (tentativa {attempt+1}/{max_retries}): {str(e)}")
-                    time.sleep(retry_interval)
-                else:
-                    print(f"[ERROR] Não foi possível conectar ao PostgreSQL após {max_retries} tentativas: {str(e)}")
-                    raise
-        return False
-    
-    def disconnect(self):
-        # Encerra a conexão
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
-    
-    def truncate_table(self):
-        """Esvazia a tabela cotacoes (restart identity)."""
-        try:
-            if not self.conn or self.conn.closed:
-                self.connect()
-            
-            self.cursor.execute("TRUNCATE TABLE cotacoes RESTART IDENTITY CASCADE")
-            self.conn.commit()
-            print("[INFO] Tabela 'cotacoes' esvaziada com sucesso")
-            return True
-        except Exception as e:
-            if self.conn:
-                self.conn.rollback()
-            print(f"[ERROR] Falha ao esvaziar tabela: {str(e)}")
-            raise
-    
-    def execute(self, cotacoes):
-        # Insere/atualiza cotações usando batch upsert (muito mais rápido)
-        if not cotacoes:
-            print("[WARNING] Nenhuma cotação para inserir")
-            return 0
-            
-        try:
-            if not self.conn or self.conn.closed:
-                self.connect()
-            
-            # Usar ON CONFLICT para upsert em lote
-            insert_query = """
-                INSERT INTO cotacoes (ativo, data_pregao, abertura, fechamento, maximo, minimo, volume)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (ativo, data_pregao) 
-                DO UPDATE SET
-                    abertura = EXCLUDED.abertura,
-                    fechamento = EXCLUDED.fechamento,
-                    maximo = EXCLUDED.maximo,
-                    minimo = EXCLUDED.minimo,
-                    volume = EXCLUDED.volume
-            """
-            
-            # Preparar dados para batch insert
-            batch_data = [
-                (
-                    cotacao['ativo'],
-                    cotacao['data_pregao'],
-                    cotacao['abertura'],
-                    cotacao['fechamento'],
-                    cotacao['maximo'],
-                    cotacao['minimo'],
-                    cotacao['volume']
-                )
-                for cotacao in cotacoes
-            ]
-            
-            # Executar em batch
-            from psycopg2.extras import execute_batch
-            execute_batch(self.cursor, insert_query, batch_data, page_size=500)
-            
-            self.conn.commit()
-            print(f"[SUCCESS] Processo de carga concluído! {len(cotacoes)} registros processados em batch")
-            return len(cotacoes)
-            
-        except Exception as e:
-            if self.conn:
-                self.conn.rollback()
-            print(f"[ERROR] Falha ao inserir cotações: {str(e)}")
-            raise
-            
-        finally:
-            self.disconnect()
-
-def run(cotacoes=None): 
-    if cotacoes is None:
-        cotacoes = transform_run()
-        
-    loader = PostgresLoader()
-    return loader.execute(cotacoes)
-
-if __name__ == "__main__":
+from config import Config
+import psycopg2
+from psycopg2 import errors as pg_errors
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from xml_parse import run as transform_run
+from metricas import etapa, execucao
+import queue
+import random
+import time
+
+# Só atualiza (e renova timestamp_processamento, usado pelo feed de alterações
+# da API) quando algum valor mudou: recargas idênticas não geram delta
+_UPSERT_SQL = """
+    INSERT INTO cotacoes (ativo, data_pregao, abertura, fechamento, maximo, minimo, volume)
+    VALUES ({})
+    ON CONFLICT (ativo, data_pregao) 
+    DO UPDATE SET
+        abertura = EXCLUDED.abertura,
+        fechamento = EXCLUDED.fechamento,
+        maximo = EXCLUDED.maximo,
+        minimo = EXCLUDED.minimo,
+        volume = EXCLUDED.volume,
+        timestamp_processamento = CURRENT_TIMESTAMP
+    WHERE (cotacoes.abertura, cotacoes.fechamento, cotacoes.maximo, cotacoes.minimo, cotacoes.volume)
+        IS DISTINCT FROM (EXCLUDED.abertura, EXCLUDED.fechamento, EXCLUDED.maximo, EXCLUDED.minimo, EXCLUDED.volume)
+"""
+
+# Upsert preparado uma vez por sessão: o servidor não refaz parse/plano a cada linha
+_PREPARE_SQL = (
+    "PREPARE upsert_cotacoes (varchar, date, numeric, numeric, numeric, numeric, bigint) AS "
+    + _UPSERT_SQL.format("$1, $2, $3, $4, $5, $6, $7")
+)
+_EXECUTE_SQL = "EXECUTE upsert_cotacoes (%s, %s, %s, %s, %s, %s, %s)"
+
+# Aviso para a API (LISTEN cotacoes_novo_dia -> /api/eventos): entregue pelo
+# Postgres só no commit da carga, com o total e a versão de cada data gravada
+_NOTIFY_SQL = """
+    SELECT pg_notify('cotacoes_novo_dia', json_build_object(
+        'data', data_pregao,
+        'total', COUNT(*),
+        'versao', MAX(timestamp_processamento)
+    )::text)
+    FROM cotacoes
+    WHERE data_pregao = ANY(%s::date[])
+    GROUP BY data_pregao
+"""
+
+# Conflitos entre transações concorrentes: o bloco é refeito do zero
+_ERROS_REPETIVEIS = (pg_errors.SerializationFailure, pg_errors.DeadlockDetected)
+
+class PostgresLoader:
+    def __init__(self, manter_conexao=False, preparar=True):
+        # manter_conexao: reaproveita a conexão entre chamadas de execute()
+        # preparar: usa o upsert preparado (PREPARE/EXECUTE)
+        self.manter_conexao = manter_conexao
+        self.preparar = preparar
+        self.conn = None
+        self.cursor = None
+        self._preparado = False
+        # Conexões extras da carga paralela (reaproveitadas se manter_conexao)
+        self._paralelos = []
+    
+    def load_cotacoes(self, cotacoes):
+        """Alias para execute(), por compatibilidade."""
+        return self.execute(cotacoes)
+    
+    def close(self):
+        """Alias para disconnect(), por compatibilidade."""
+        self.disconnect()
+    
+    def connect(self, max_retries=5, retry_interval=2):
+        """
+        Conecta ao PostgreSQL de forma resiliente.
+        Prioriza a POSTGRES_CONNECTION_STRING (para o Azure) e faz fallback
+        para variáveis de ambiente separadas (para desenvolvimento local).
+        """
+        for attempt in range(max_retries):
+            try:
+                connection_string = Config.POSTGRES_CONNECTION_STRING
+                
+                if connection_string:
+                    # Método 1: Usar a connection string (ideal para o Azure)
+                    self.conn = psycopg2.connect(connection_string)
+                else:
+                    # Método 2: Fallback para variáveis separadas (para ambiente local)
+                    self.conn = psycopg2.connect(
+                        host=Config.POSTGRES_HOST,
+                        port=Config.POSTGRES_PORT,
+                        dbname=Config.POSTGRES_DB,
+                        user=Config.POSTGRES_USER,
+                        password=Config.POSTGRES_PASSWORD,
+                        sslmode=Config.POSTGRES_SSL_MODE
+                    )
+
+                self.conn.autocommit = False
+                self.cursor = self.conn.cursor()
+                self._preparado = False
+                print("[INFO] Conexão PostgreSQL estabelecida")
+                return True
+            
+            except psycopg2.OperationalError as e:
+                if attempt < max_retries - 1:
+                    print(f"[WARNING] Falha na conexão (tentativa {attempt+1}/{max_retries}): {str(e)}")
+                    time.sleep(retry_interval)
+                else:
+                    print(f"[ERROR] Não foi possível conectar ao PostgreSQL após {max_retries} tentativas: {str(e)}")
+                    raise
+        return False
+    
+    def disconnect(self):
+        # Encerra a conexão (e as da carga paralela)
+        if self.cursor and not self.cursor.closed:
+            self.cursor.close()
+        if self.conn and not self.conn.closed:
+            self.conn.close()
+        for loader in self._paralelos:
+            loader.disconnect()
+        self._paralelos = []
+
+    def _garantir_conexao(self):
+        # Conecta (ou reconecta, se a conexão caiu) e prepara o upsert na sessão
+        if not self.conn or self.conn.closed:
+            self.connect()
+        if self.preparar and not self._preparado:
+            self.cursor.execute(_PREPARE_SQL)
+            self.conn.commit()
+            self._preparado = True
+    
+    def truncate_table(self):
+        """Esvazia a tabela cotacoes (restart identity)."""
+        try:
+            if not self.conn or self.conn.closed:
+                self.connect()
+            
+            self.cursor.execute("TRUNCATE TABLE cotacoes RESTART IDENTITY CASCADE")
+            self.conn.commit()
+            print("[INFO] Tabela 'cotacoes' esvaziada com sucesso")
+            return True
+        except Exception as e:
+            if self.conn:
+                self.conn.rollback()
+            print(f"[ERROR] Falha ao esvaziar tabela: {str(e)}")
+            raise
+
+    def contar_por_data(self, inicio, fim):
+        """Quantidade de cotações por data de pregão no intervalo (inclusive)."""
+        if not self.conn or self.conn.closed:
+            self.connect()
+
+        self.cursor.execute(
+            """
+            SELECT data_pregao, COUNT(*)
+            FROM cotacoes
+            WHERE data_pregao BETWEEN %s AND %s
+            GROUP BY data_pregao
+            """,
+            (inicio, fim),
+        )
+        contagem = {row[0]: row[1] for row in self.cursor.fetchall()}
+        self.conn.commit()
+        return contagem
+
+    def _gravar(self, cotacoes):
+        # Upsert em uma transação; desfaz em caso de erro
+        batch_data = [
+            (
+                cotacao['ativo'],
+                cotacao['data_pregao'],
+                cotacao['abertura'],
+                cotacao['fechamento'],
+                cotacao['maximo'],
+                cotacao['minimo'],
+                cotacao['volume']
+            )
+            for cotacao in cotacoes
+        ]
+        sql = _EXECUTE_SQL if self.preparar else _UPSERT_SQL.format("%s, %s, %s, %s, %s, %s, %s")
+
+        from psycopg2.extras import execute_batch
+        with etapa("carga") as medicao:
+            try:
+                for tentativa in range(2):
+                    reaproveitada = bool(self.conn) and not self.conn.closed
+                    try:
+                        self._garantir_conexao()
+                        # Executar em batch
+                        execute_batch(self.cursor, sql, batch_data, page_size=500)
+                        self.cursor.execute(_NOTIFY_SQL, (sorted({c['data_pregao'] for c in cotacoes}),))
+                        self.conn.commit()
+                        medicao.linhas = len(cotacoes)
+                        return len(cotacoes)
+                    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                        # Conexão reaproveitada que caiu (reinício do servidor, timeout ocioso):
+                        # reconecta e refaz o lote uma vez
+                        if tentativa or not reaproveitada or not self.conn.closed:
+                            raise
+                        print(f"[WARNING] Conexão perdida, reconectando: {str(e)}")
+                        self.disconnect()
+            except Exception:
+                if self.conn and not self.conn.closed:
+                    self.conn.rollback()
+                raise
+
+    def execute(self, cotacoes):
+        # Insere/atualiza cotações usando batch upsert (muito mais rápido)
+        if not cotacoes:
+            print("[WARNING] Nenhuma cotação para inserir")
+            return 0
+
+        try:
+            self._gravar(cotacoes)
+            print(f"[SUCCESS] Processo de carga concluído! {len(cotacoes)} registros processados em batch")
+            return len(cotacoes)
+            
+        except Exception as e:
+            print(f"[ERROR] Falha ao inserir cotações: {str(e)}")
+            raise
+            
+        finally:
+            if not self.manter_conexao:
+                self.disconnect()
+
+    def execute_paralelo(self, cotacoes, conexoes=4, max_tentativas=3):
+        """
+        Carga paralela: divide as cotações em blocos por data de pregão e grava
+        os blocos em N conexões simultâneas, cada bloco em sua própria transação.
+
+        Blocos com conflito de serialização/deadlock são refeitos (até
+        max_tentativas). Retorna {"linhas", "blocos", "falhas"}, com falhas no
+        formato {data_pregao: erro} para os blocos que não entraram.
+        """
+        resultado = {"linhas": 0, "blocos": 0, "falhas": {}}
+        if not cotacoes:
+            print("[WARNING] Nenhuma cotação para inserir")
+            return resultado
+
+        # Datas distintas nunca disputam as mesmas linhas de (ativo, data_pregao)
+        por_data = {}
+        for cotacao in cotacoes:
+            por_data.setdefault(cotacao['data_pregao'], []).append(cotacao)
+
+        # Dias pequenos são agrupados: ~4 blocos por conexão equilibram a carga
+        conexoes = max(1, min(conexoes, len(por_data)))
+        alvo = max(1, len(cotacoes) // (conexoes * 4))
+        blocos, atual = [], []
+        for data_pregao in sorted(por_data):
+            atual.extend(por_data[data_pregao])
+            if len(atual) >= alvo:
+                blocos.append(atual)
+                atual = []
+        if atual:
+            blocos.append(atual)
+
+        while len(self._paralelos) < conexoes:
+            self._paralelos.append(PostgresLoader(manter_conexao=True, preparar=self.preparar))
+        livres = queue.Queue()
+        for loader in self._paralelos[:conexoes]:
+            livres.put(loader)
+
+        def gravar_bloco(bloco):
+            loader = livres.get()
+            try:
+                for tentativa in range(1, max_tentativas + 1):
+                    try:
+                        return loader._gravar(bloco)
+                    except _ERROS_REPETIVEIS as e:
+                        if tentativa == max_tentativas:
+                            raise
+                        espera = 0.1 * 2 ** tentativa + random.uniform(0, 0.1)
+                        print(f"[WARNING] Conflito na carga ({type(e).__name__}), "
+                              f"tentativa {tentativa}/{max_tentativas}; refazendo em {espera:.2f}s")
+                        time.sleep(espera)
+            finally:
+                livres.put(loader)
+
+        inicio = time.perf_counter()
+        print(f"[INFO] Carga paralela: {len(cotacoes)} cotações, {len(por_data)} datas, "
+              f"{len(blocos)} blocos em {conexoes} conexões")
+        try:
+            with ThreadPoolExecutor(max_workers=conexoes) as executor:
+                futures = {executor.submit(gravar_bloco, bloco): bloco for bloco in blocos}
+                for concluidos, future in enumerate(as_completed(futures), start=1):
+                    bloco = futures[future]
+                    try:
+                        resultado["linhas"] += future.result()
+                        resultado["blocos"] += 1
+                    except Exception as e:
+                        for data_pregao in {c['data_pregao'] for c in bloco}:
+                            resultado["falhas"][data_pregao] = str(e)
+                        print(f"[ERROR] Falha ao gravar bloco de {len(bloco)} cotações: {str(e)}")
+                    decorrido = time.perf_counter() - inicio
+                    print(f"[INFO] Progresso: {concluidos}/{len(blocos)} blocos, "
+                          f"{resultado['linhas']} linhas ({resultado['linhas'] / decorrido:,.0f} linhas/s)")
+        finally:
+            if not self.manter_conexao:
+                self.disconnect()
+
+        print(f"[SUCCESS] Carga paralela concluída: {resultado['linhas']} registros em "
+              f"{time.perf_counter() - inicio:.1f}s, {len(resultado['falhas'])} data(s) com falha")
+        return resultado
+
+def run(cotacoes=None): 
+    with execucao("postgres_loader"):
+        if cotacoes is None:
+            cotacoes = transform_run()
+
+        loader = PostgresLoader()
+        return loader.execute(cotacoes)
+
+if __name__ == "__main__":
     run()
\ No newline at end of file
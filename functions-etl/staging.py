@@ -0,0 +1,204 @@
+"""
+Staging do Blob Trigger em modo lote (LOADER_BATCH_MODE).
+
+Quem envia os XMLs de um dia grava antes staging/{data}/_esperados.json com
+a lista de arquivos. Cada disparo do trigger faz o parse e grava o lote em
+staging/{data}/{arquivo}.json.gz (mesmo formato do cache de parse). Quando
+todos os esperados têm lote, o disparo que obtiver o lease do marcador
+carrega o dia inteiro em uma única transação e limpa o staging.
+
+Se um arquivo não chegar (ex.: trigger que esgotou as retentativas), o dia
+expira Config.STAGING_EXPIRA_MINUTOS após a última gravação do marcador: o
+próximo disparo, ou o timer de consolidação, carrega os lotes presentes e
+registra no log os arquivos que faltaram.
+
+Sem marcador (ex.: upload manual de um XML) o trigger carrega arquivo a arquivo.
+"""
+import json
+from datetime import datetime, timedelta
+
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+from config import Config
+from parse_cache import desserializar, serializar
+from storage import list_blobs
+
+PREFIXO = "staging/"
+MARCADOR = "_esperados.json"
+SUFIXO_LOTE = ".json.gz"
+LEASE_SEGUNDOS = 60
+
+
+def _marcador(date_str):
+    return f"{PREFIXO}{date_str}/{MARCADOR}"
+
+
+def _lote(date_str, arquivo):
+    return f"{PREFIXO}{date_str}/{arquivo}{SUFIXO_LOTE}"
+
+
+def dividir_nome(blob_name):
+    """("AAMMDD", "arquivo.xml") a partir de [container/]xml/AAMMDD/arquivo.xml."""
+    partes = blob_name.split("/")
+    i = partes.index("xml")
+    return partes[i + 1], "/".join(partes[i + 2:])
+
+
+def _ler_marcador(container_client, date_str):
+    try:
+        conteudo = container_client.get_blob_client(_marcador(date_str)).download_blob().readall()
+    except ResourceNotFoundError:
+        return None
+    return json.loads(conteudo)
+
+
+def ler_esperados(container_client, date_str):
+    """Arquivos esperados para o dia, ou None se não houver marcador."""
+    marcador = _ler_marcador(container_client, date_str)
+    return set(marcador["arquivos"]) if marcador else None
+
+
+def _expirado(marcador):
+    try:
+        atualizado_em = datetime.fromisoformat(marcador["atualizado_em"])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return datetime.now() - atualizado_em >= timedelta(minutes=Config.STAGING_EXPIRA_MINUTOS)
+
+
+def _a_carregar(container_client, date_str, avisar=True):
+    """
+    Arquivos a consolidar, ou None se o dia deve esperar.
+
+    Completo: todos os esperados. Expirado: os que têm lote (os que faltam
+    vão para o log). Sem nenhum lote não há o que carregar.
+    """
+    marcador = _ler_marcador(container_client, date_str)
+    if not marcador or not marcador.get("arquivos"):
+        return None
+    esperados = set(marcador["arquivos"])
+    presentes = esperados & _lotes_presentes(container_client, date_str)
+    faltando = esperados - presentes
+    if not faltando:
+        return esperados
+    if not presentes or not _expirado(marcador):
+        print(f"[INFO] Staging {date_str}: aguardando {len(faltando)} de {len(esperados)} arquivo(s)")
+        return None
+    if avisar:
+        print(f"[WARNING] Staging {date_str} expirado: carregando {len(presentes)} de {len(esperados)} "
+              f"arquivo(s); faltaram: {', '.join(sorted(faltando))}")
+    return presentes
+
+
+def registrar_esperados(container_client, blob_names):
+    """Grava o marcador de cada dia (chamado antes do upload dos XMLs)."""
+    if not Config.LOADER_BATCH_MODE:
+        return
+    por_data = {}
+    for blob_name in blob_names:
+        date_str, arquivo = dividir_nome(blob_name)
+        por_data.setdefault(date_str, set()).add(arquivo)
+
+    for date_str, arquivos in por_data.items():
+        # União com uma rodada anterior ainda não consolidada (ex.: upload que falhou no meio)
+        arquivos |= ler_esperados(container_client, date_str) or set()
+        conteudo = json.dumps({
+            "arquivos": sorted(arquivos),
+            "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+        })
+        try:
+            container_client.get_blob_client(_marcador(date_str)).upload_blob(
+                conteudo.encode("utf-8"),
+                overwrite=True,
+                content_settings=ContentSettings(content_type="application/json"),
+            )
+        except HttpResponseError as e:
+            # Marcador sob lease (consolidação em curso): o trigger cai na carga por arquivo
+            print(f"[WARNING] Não foi possível gravar o marcador de staging de {date_str}: {e}")
+
+
+def gravar_lote(container_client, date_str, arquivo, cotacoes):
+    # Lote vazio também é gravado: conta como arquivo recebido
+    container_client.get_blob_client(_lote(date_str, arquivo)).upload_blob(
+        serializar(cotacoes),
+        overwrite=True,
+        content_settings=ContentSettings(content_type="application/gzip"),
+    )
+
+
+def _lotes_presentes(container_client, date_str):
+    prefixo = f"{PREFIXO}{date_str}/"
+    return {
+        b.name[len(prefixo):-len(SUFIXO_LOTE)]
+        for b in list_blobs(container_client, name_starts_with=prefixo)
+        if b.name.endswith(SUFIXO_LOTE)
+    }
+
+
+def consolidar_se_completo(container_client, date_str, loader):
+    """
+    Carrega o dia em uma transação se todos os lotes chegaram (ou se o
+    staging expirou, com os lotes presentes).
+
+    Retorna o total carregado, ou None se o dia ainda está incompleto ou
+    outro disparo já está consolidando.
+    """
+    if not _a_carregar(container_client, date_str, avisar=False):
+        return None
+
+    marcador = container_client.get_blob_client(_marcador(date_str))
+    try:
+        lease = marcador.acquire_lease(lease_duration=LEASE_SEGUNDOS)
+    except HttpResponseError:
+        # Lease com outro disparo ou marcador já consumido
+        return None
+
+    try:
+        # Relê sob o lease: o marcador pode ter sido ampliado por um novo upload
+        esperados = _a_carregar(container_client, date_str)
+        if not esperados:
+            return None
+
+        cotacoes = []
+        for arquivo in sorted(esperados):
+            conteudo = container_client.get_blob_client(_lote(date_str, arquivo)).download_blob().readall()
+            lote = desserializar(conteudo)
+            if lote is None:
+                print(f"[WARNING] Lote de staging em versão antiga ignorado: {arquivo}")
+                continue
+            cotacoes.extend(lote)
+
+        total = loader.execute(cotacoes) if cotacoes else 0
+
+        for arquivo in esperados:
+            try:
+                container_client.get_blob_client(_lote(date_str, arquivo)).delete_blob()
+            except ResourceNotFoundError:
+                pass
+        # Arquivo que chegar depois não encontra o marcador e é carregado sozinho
+        marcador.delete_blob(lease=lease)
+        lease = None
+        print(f"[SUCCESS] Dia {date_str} consolidado: {len(esperados)} arquivo(s), {total} cotações")
+        return total
+    finally:
+        if lease is not None:
+            try:
+                lease.release()
+            except HttpResponseError:
+                pass
+
+
+def consolidar_pendentes(container_client, loader):
+    """Tenta consolidar todos os dias com marcador no staging; {data: total carregado}."""
+    datas = sorted({
+        b.name[len(PREFIXO):-len(MARCADOR) - 1]
+        for b in list_blobs(container_client, name_starts_with=PREFIXO)
+        if b.name.endswith(f"/{MARCADOR}")
+    })
+    consolidados = {}
+    for date_str in datas:
+        total = consolidar_se_completo(container_client, date_str, loader)
+        if total is not None:
+            consolidados[date_str] = total
+    return consolidados
@@ -1,76 +1,295 @@
-from azure.storage.blob import BlobServiceClient, PublicAccess, ContentSettings
-from azure.core.exceptions import ResourceExistsError
-from pathlib import Path
-from config import Config
-
-def get_blob_service_client():
-    # Cliente de serviço de Blob a partir da connection string
-    return BlobServiceClient.from_connection_string(Config.AZURE_STORAGE_CONNECTION)
-
-def get_container_client(container_name=None):
-    # Retorna o container; cria se não existir
-    container = container_name or Config.CONTAINER_NAME
-    service = get_blob_service_client()
-    container_client = service.get_container_client(container)
-    try:
-        container_client.create_container()
-        print(f"[INFO] Container '{container}' criado")
-    except ResourceExistsError:
-        pass
-    return container_client
-
-def upload_blob(container_client, blob_name, local_path, *, max_concurrency: int = 8, content_type: str | None = None, skip_if_exists: bool = False):
-    # Upload de arquivo local com paralelismo
-    path = Path(local_path)
-    try:
-        blob_client = container_client.get_blob_client(blob_name)
-
-        if skip_if_exists:
-            try:
-                if blob_client.exists():
-                    print(f"[SKIP] Blob já existe: '{blob_name}'")
-                    return True
-            except Exception:
-                # Se falhar ao checar existência, segue com upload
-                pass
-
-        settings = ContentSettings(content_type=content_type) if content_type else None
-
-        with open(path, "rb") as data:
-            blob_client.upload_blob(
-                data=data,
-                overwrite=True,
-                max_concurrency=max_concurrency,
-                content_settings=settings,
-            )
-        print(f"[OK] Arquivo '{blob_name}' enviado para o blob storage")
-        return True
-    except Exception as e:
-        print(f"[ERROR] Falha ao enviar '{path}': {e}")
-        return False
-
-def blob_exists(container_client, blob_name: str) -> bool:
-    try:
-        return container_client.get_blob_client(blob_name).exists()
-    except Exception:
-        return False
-
-def download_blob_to_string(container_client, blob_name):
-    # Baixa conteúdo do blob como bytes
-    try:
-        blob_client = container_client.get_blob_client(blob_name)
-        download = blob_client.download_blob()
-        content = download.readall()
-        return content
-    except Exception as e:
-        print(f"[ERROR] Falha ao baixar blob '{blob_name}': {e}")
-        return None
-
-def list_blobs(container_client, name_starts_with=None):
-    # Lista blobs com prefixo opcional
-    try:
-        blobs = list(container_client.list_blobs(name_starts_with=name_starts_with))
-        return blobs
-    except Exception as e:
-        print(f"[ERROR] Falha ao listar blobs: {e}")
-        return []
\ No newline at end of file
+from azure.storage.blob import BlobServiceClient, PublicAccess, ContentSettings
+from azure.core.exceptions import ResourceExistsError
+from azure.core.pipeline.transport import RequestsTransport
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import threading
+import zlib
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from metricas import etapa
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Clientes reutilizados no processo (invocações "quentes" da Function e workers do backfill)
+_lock = threading.Lock()
+_pid = None
+_service = None
+_containers = {}
+
+# Round-trips HTTP ao Blob feitos por este processo
+_stats_lock = threading.Lock()
+_stats = {"requisicoes": 0, "por_metodo": {}, "clientes_criados": 0}
+
+def _contar_requisicao(response):
+    # raw_response_hook: chamado a cada resposta HTTP (inclusive retentativas)
+    metodo = response.http_request.method
+    with _stats_lock:
+        _stats["requisicoes"] += 1
+        _stats["por_metodo"][metodo] = _stats["por_metodo"].get(metodo, 0) + 1
+
+def estatisticas_blob():
+    """Cópia dos contadores de requisições ao Blob deste processo."""
+    with _stats_lock:
+        return {**_stats, "por_metodo": dict(_stats["por_metodo"])}
+
+def zerar_estatisticas_blob():
+    with _stats_lock:
+        _stats["requisicoes"] = 0
+        _stats["por_metodo"] = {}
+        _stats["clientes_criados"] = 0
+
+def _verificar_fork():
+    # Após fork (ProcessPoolExecutor) o processo filho não reaproveita os sockets do pai
+    global _pid, _service
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _service = None
+        _containers.clear()
+
+def _criar_transporte():
+    # Sessão única com pool dimensionado para os uploads paralelos
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.BLOB_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=False)
+
+def get_blob_service_client():
+    # Cliente de serviço de Blob a partir da connection string (um por processo)
+    global _service
+    with _lock:
+        _verificar_fork()
+        if _service is None:
+            _service = BlobServiceClient.from_connection_string(
+                Config.AZURE_STORAGE_CONNECTION,
+                transport=_criar_transporte(),
+                raw_response_hook=_contar_requisicao,
+            )
+            with _stats_lock:
+                _stats["clientes_criados"] += 1
+        return _service
+
+def get_container_client(container_name=None):
+    # Retorna o container (em cache); cria se não existir na primeira chamada do processo
+    container = container_name or Config.CONTAINER_NAME
+    with _lock:
+        _verificar_fork()
+        if container in _containers:
+            return _containers[container]
+
+    if Config.LOCAL_BLOB_DIR:
+        # Container fake em disco (desenvolvimento e benchmarks sem Azure/Azurite)
+        from local_storage import LocalContainerClient
+        container_client = LocalContainerClient(Path(Config.LOCAL_BLOB_DIR) / container)
+    else:
+        service = get_blob_service_client()
+        container_client = service.get_container_client(container)
+    try:
+        container_client.create_container()
+        print(f"[INFO] Container '{container}' criado")
+    except ResourceExistsError:
+        pass
+
+    with _lock:
+        return _containers.setdefault(container, container_client)
+
+def upload_blob(container_client, blob_name, local_path, *, max_concurrency: int = 8, content_type: str | None = None, skip_if_exists: bool = False):
+    # Upload de arquivo local com paralelismo
+    path = Path(local_path)
+    try:
+        blob_client = container_client.get_blob_client(blob_name)
+
+        if skip_if_exists:
+            try:
+                if blob_client.exists():
+                    print(f"[SKIP] Blob já existe: '{blob_name}'")
+                    return True
+            except Exception:
+                # Se falhar ao checar existência, segue com upload
+                pass
+
+        settings = ContentSettings(content_type=content_type) if content_type else None
+
+        with open(path, "rb") as data:
+            blob_client.upload_blob(
+                data=data,
+                overwrite=True,
+                max_concurrency=max_concurrency,
+                content_settings=settings,
+            )
+        print(f"[OK] Arquivo '{blob_name}' enviado para o blob storage")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Falha ao enviar '{path}': {e}")
+        return False
+
+def blob_exists(container_client, blob_name: str) -> bool:
+    try:
+        return container_client.get_blob_client(blob_name).exists()
+    except Exception:
+        return False
+
+def comprimir(origem) -> bytes:
+    # gzip determinístico (mtime=0): mesmo conteúdo gera os mesmos bytes
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=6, mtime=0) as gz:
+        if isinstance(origem, (bytes, bytearray, memoryview)):
+            gz.write(origem)
+        else:
+            with open(origem, "rb") as f:
+                shutil.copyfileobj(f, gz, 1024 * 1024)
+    return buf.getvalue()
+
+def descomprimir_chunks(chunks):
+    # Descomprime em fluxo se o conteúdo for gzip (detectado pelo cabeçalho)
+    it = iter(chunks)
+    primeiro = next(it, b"")
+    if not primeiro.startswith(GZIP_MAGIC):
+        yield primeiro
+        yield from it
+        return
+    d = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    yield d.decompress(primeiro)
+    for chunk in it:
+        yield d.decompress(chunk)
+    yield d.flush()
+
+def download_blob_to_string(container_client, blob_name):
+    # Baixa conteúdo do blob como bytes (descomprime XMLs gravados com gzip)
+    try:
+        blob_client = container_client.get_blob_client(blob_name)
+        # Sem descompressão do SDK pelo Content-Encoding: só descomprimir_chunks descomprime
+        download = blob_client.download_blob(decompress=False)
+        content = b"".join(descomprimir_chunks(download.chunks()))
+        return content
+    except Exception as e:
+        print(f"[ERROR] Falha ao baixar blob '{blob_name}': {e}")
+        return None
+
+def list_blobs(container_client, name_starts_with=None, include=None):
+    # Lista blobs com prefixo opcional
+    try:
+        blobs = list(container_client.list_blobs(name_starts_with=name_starts_with, include=include))
+        return blobs
+    except Exception as e:
+        print(f"[ERROR] Falha ao listar blobs: {e}")
+        return []
+
+def blob_checksum(blob) -> str:
+    # MD5 do conteúdo original (antes do gzip) ou do blob; senão o ETag (muda a cada reescrita)
+    metadata = getattr(blob, "metadata", None) or {}
+    if metadata.get("md5_original"):
+        return metadata["md5_original"]
+    settings = getattr(blob, "content_settings", None)
+    md5 = getattr(settings, "content_md5", None) if settings else None
+    if md5:
+        return bytes(md5).hex()
+    return str(blob.etag).strip('"')
+
+def list_blob_checksums(container_client, name_starts_with=None):
+    # Mapa nome -> checksum com uma única chamada de listagem
+    blobs = list_blobs(container_client, name_starts_with=name_starts_with, include=["metadata"])
+    return {b.name: blob_checksum(b) for b in blobs}
+
+
+def _md5(origem) -> bytes:
+    if isinstance(origem, (bytes, bytearray, memoryview)):
+        return hashlib.md5(origem).digest()
+    h = hashlib.md5()
+    with open(origem, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.digest()
+
+def upload_blobs(container_client, arquivos, *, name_starts_with=None, max_workers: int = 8,
+                 max_concurrency: int = 1, content_type: str | None = None, compressao: str | None = None,
+                 antes_do_envio=None):
+    """
+    Envia vários blobs em paralelo, pulando os que já têm o mesmo conteúdo.
+
+    arquivos: iterável de (blob_name, origem), origem = caminho local ou bytes.
+    O MD5 remoto vem de uma única listagem do prefixo (comum aos nomes, se
+    name_starts_with não for informado) e é comparado ao MD5 local; o MD5 é
+    gravado nas propriedades do blob para a comparação seguinte.
+
+    compressao="gzip" grava o conteúdo comprimido com Content-Encoding gzip;
+    o MD5 do original fica no metadado md5_original e é ele que é comparado.
+
+    antes_do_envio(nomes) é chamado com os blobs que serão de fato enviados,
+    antes do primeiro upload (ex.: registrar o que o Blob Trigger deve esperar).
+
+    Retorna {"enviados", "iguais", "falhas", "checksums"} com o checksum de
+    todos os blobs do prefixo após o envio.
+    """
+    arquivos = list(arquivos)
+    if name_starts_with is None:
+        comum = os.path.commonprefix([nome for nome, _ in arquivos]) if arquivos else ""
+        name_starts_with = comum[:comum.rfind("/") + 1]
+
+    remotos = list_blob_checksums(container_client, name_starts_with=name_starts_with or None)
+    resultado = {"enviados": 0, "iguais": 0, "falhas": 0, "checksums": dict(remotos)}
+
+    def calcular(item):
+        try:
+            return _md5(item[1])
+        except OSError as e:
+            print(f"[ERROR] Falha ao ler '{item[0]}': {e}")
+            return None
+
+    def enviar(blob_name, origem, md5):
+        blob_client = container_client.get_blob_client(blob_name)
+        if compressao == "gzip":
+            payload = comprimir(origem)
+            settings = ContentSettings(content_type=content_type, content_encoding="gzip",
+                                       content_md5=bytearray(hashlib.md5(payload).digest()))
+            blob_client.upload_blob(payload, overwrite=True, max_concurrency=max_concurrency,
+                                    content_settings=settings, metadata={"md5_original": md5.hex()})
+            return len(payload)
+
+        settings = ContentSettings(content_type=content_type, content_md5=bytearray(md5))
+        if isinstance(origem, (bytes, bytearray, memoryview)):
+            blob_client.upload_blob(bytes(origem), overwrite=True, max_concurrency=max_concurrency,
+                                    content_settings=settings)
+            return len(origem)
+        with open(origem, "rb") as data:
+            blob_client.upload_blob(data, overwrite=True, max_concurrency=max_concurrency,
+                                    content_settings=settings)
+        return os.path.getsize(origem)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # 1) MD5 local x remoto: decide o que precisa subir
+        pendentes = []
+        for (blob_name, origem), md5 in zip(arquivos, executor.map(calcular, arquivos)):
+            if md5 is None:
+                resultado["falhas"] += 1
+            elif remotos.get(blob_name) == md5.hex():
+                resultado["iguais"] += 1
+            else:
+                pendentes.append((blob_name, origem, md5))
+
+        if pendentes and antes_do_envio:
+            antes_do_envio([blob_name for blob_name, _, _ in pendentes])
+
+        # 2) Upload dos alterados
+        with etapa("upload") as medicao:
+            futures = [executor.submit(enviar, *item) for item in pendentes]
+            for (blob_name, _, md5), future in zip(pendentes, futures):
+                try:
+                    medicao.bytes += future.result()
+                    resultado["checksums"][blob_name] = md5.hex()
+                    resultado["enviados"] += 1
+                except Exception as e:
+                    resultado["falhas"] += 1
+                    print(f"[ERROR] Falha ao enviar '{blob_name}': {e}")
+            medicao.itens = resultado["enviados"]
+
+    print(f"[OK] Upload em lote: {resultado['enviados']} enviados, "
+          f"{resultado['iguais']} sem alteração, {resultado['falhas']} falhas")
+    return resultado
\ No newline at end of file
@@ -1,197 +1,239 @@
-from lxml import etree as ET
-from datetime import datetime, timedelta
-from storage import get_container_client, download_blob_to_string, list_blobs
-from config import Config
-from helpers import yymmdd
-import json
-import re
-
-class B3XMLParser:
-    def __init__(self):
-        self.container_client = get_container_client()
-
-    # Lista XMLs no Blob para uma data
-    def list_xml_files(self, date_str):
-        prefix = f"xml/{date_str}/"
-        blobs = list_blobs(self.container_client, name_starts_with=prefix)
-        return [b.name for b in blobs]
-
-    def download_xml(self, blob_name):
-        content = download_blob_to_string(self.container_client, blob_name)
-        return content
-
-    def parse_xml(self, xml_content):
-        # Faz parse do XML e extrai cotações via XPath
-        try:
-            data = xml_content.encode("utf-8") if isinstance(xml_content, str) else xml_content
-            root = ET.fromstring(data)
-
-            namespaces = {
-                'bvmf217': 'urn:bvmf.217.01.xsd',
-                'bvmf052': 'urn:bvmf.052.01.xsd',
-                'head': 'urn:iso:std:iso:20022:tech:xsd:head.001.001.01'
-            }
-
-            print(f"[DEBUG] Root tag: {root.tag}")
-
-            # Extrai data do pregão
-            data_s = root.xpath("string(.//bvmf217:TradDt/bvmf217:Dt)", namespaces=namespaces)
-            if data_s:
-                data_pregao = datetime.strptime(data_s, "%Y-%m-%d").date()
-                print(f"[DEBUG] Data pregão encontrada: {data_pregao}")
-            else:
-                data_pregao = datetime.now().date()
-                print(f"[DEBUG] Data pregão não encontrada, usando data atual: {data_pregao}")
-
-            price_reports = root.xpath(".//bvmf217:PricRpt", namespaces=namespaces)
-            print(f"[DEBUG] Encontrados {len(price_reports)} relatórios de preço")
-
-            # Monta lista de cotações
-            cotacoes = []
-            for i, report in enumerate(price_reports):
-                try:
-                    # Ticker
-                    ticker_node = report.xpath(".//*[local-name()='TckrSymb']")
-                    if not ticker_node or not ticker_node[0].text:
-                        continue
-                    
-                    ativo = ticker_node[0].text.strip()
-
-                    # Código do mercado
-                    market_code_node = report.xpath(".//*[local-name()='MktIdrCd']")
-                    market_code = market_code_node[0].text.strip() if market_code_node and market_code_node[0].text else ""
-                    if market_code not in ["BVMF", "XBSP", "BOVESPA"]:
-                        continue
-
-                    # Filtra apenas ações à vista 
-                    if not re.match(r'^[A-Z]{4}\d{1,2}$', ativo):
-                        continue
-
-                    # Atributos financeiros
-                    attrs_node = report.xpath(".//*[local-name()='FinInstrmAttrbts']")
-                    if not attrs_node:
-                        continue
-                    
-                    # Usa o primeiro
-                    attrs = attrs_node[0]
-                    fechamento = attrs.xpath(".//*[local-name()='LastPric']")
-                    if not fechamento or not fechamento[0].text:
-                        continue
-
-                    preco_fechamento = float(fechamento[0].text.strip())
-
-                    # Helpers de extração
-                    def extrair_float(xpath_expr):
-                        val = attrs.xpath(xpath_expr)
-                        return float(val[0].text.strip()) if val and val[0].text else preco_fechamento
-
-                    def extrair_int(xpath_expr):
-                        val = attrs.xpath(xpath_expr)
-                        return int(val[0].text.strip()) if val and val[0].text else 0
-
-                    cotacoes.append({
-                        "ativo": ativo,
-                        "data_pregao": data_pregao,
-                        "abertura": extrair_float(".//*[local-name()='FrstPric']"),
-                        "fechamento": preco_fechamento,
-                        "maximo": extrair_float(".//*[local-name()='MaxPric']"),
-                        "minimo": extrair_float(".//*[local-name()='MinPric']"),
-                        "volume": extrair_int(".//*[local-name()='RglrTxsQty']")
-                    })
-
-                except Exception as e:
-                    print(f"[WARNING] Erro ao processar ativo: {e}")
-                    continue
-
-            print(f"[DEBUG] Total de cotações válidas: {len(cotacoes)}")
-            return cotacoes
-
-        except Exception as e:
-            print(f"[ERROR] Falha no parse XPath: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
-
-    # Executa extração e transformação
-    def execute(self, multi_day=False, days_limit=5):
-        """Processa um ou vários dias, conforme parâmetros."""
-        all_cotacoes = []
-        days_processed = 0
-        
-        # Lista de dias úteis a processar
-        dates_to_process = []
-        today = datetime.now().date()
-        
-        for i in range(0, days_limit):
-            dt = (datetime.now() - timedelta(days=i)).date()
-            
-            if dt > today:
-                continue
-
-            if dt.weekday() >= 5:
-                continue
-                
-            dates_to_process.append(yymmdd(datetime.combine(dt, datetime.min.time())))
-        
-        # single-day: para no primeiro dia com XMLs
-        if not multi_day:
-            for date_str in dates_to_process:
-                xml_files = self.list_xml_files(date_str)
-                if xml_files:
-                    cotacoes = self._process_date(date_str, xml_files)
-                    all_cotacoes.extend(cotacoes)
-                    break
-        
-        # multi-day: percorre todos os dias com XMLs
-        else:
-            for date_str in dates_to_process:
-                xml_files = self.list_xml_files(date_str)
-                if not xml_files:
-                    print(f"[INFO] Nenhum arquivo XML encontrado para {date_str}")
-                    continue
-                    
-                print(f"[INFO] Processando dia: {date_str}")
-                cotacoes = self._process_date(date_str, xml_files)
-                all_cotacoes.extend(cotacoes)
-                days_processed += 1
-        
-        print(f"[INFO] Total de {days_processed} dias processados")
-        print(f"[INFO] Total de {len(all_cotacoes)} cotações extraídas")
-        
-        return all_cotacoes
-
-    # Processa XMLs de uma data
-    def _process_date(self, date_str, xml_files):
-        """Processa todos os XMLs de uma data."""
-        date_cotacoes = []
-        
-        for xml_file in xml_files:
-            print(f"[INFO] Processando {xml_file}...")
-            xml_content = self.download_xml(xml_file)
-            if not xml_content:
-                print(f"[WARNING] Não foi possível baixar o conteúdo de {xml_file}")
-                continue
-
-            cotacoes = self.parse_xml(xml_content)
-            if cotacoes:
-                date_cotacoes.extend(cotacoes)
-                print(f"[OK] Extraídas {len(cotacoes)} cotações de {xml_file}")
-            else:
-                print(f"[WARNING] Nenhuma cotação válida extraída de {xml_file}")
-        
-        # Exporta JSON se habilitado
-        if date_cotacoes and Config.EXPORT_JSON:
-            json_path = Config.DATA_DIR / f"cotacoes_{date_str}.json"
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(date_cotacoes, f, ensure_ascii=False, default=str, indent=2)
-            print(f"[INFO] Cotações exportadas para JSON: {json_path}")
-            
-        return date_cotacoes
-
-def run():
-    parser = B3XMLParser()
-    cotacoes = parser.execute()
-    return cotacoes
-
-if __name__ == "__main__":
-    run()
+from lxml import etree as ET
+from datetime import datetime
+from storage import GZIP_MAGIC, get_container_client, download_blob_to_string, list_blobs
+from config import Config
+from helpers import yymmdd
+from calendario_b3 import iter_uteis_ate
+from parse_cache import ParseCache, cache_padrao, descomprimir_e_chave
+from metricas import contar, etapa, execucao, logger
+import gzip
+import io
+import json
+import re
+
+def extrair_cotacoes(xml_content):
+    with etapa("parse") as medicao:
+        cotacoes = _extrair_cotacoes(xml_content)
+        medicao.bytes = len(xml_content)
+        medicao.linhas = len(cotacoes)
+    return cotacoes
+
+
+def _extrair_cotacoes(xml_content):
+    # Faz parse do XML e extrai cotações via XPath
+    try:
+        data = xml_content.encode("utf-8") if isinstance(xml_content, str) else xml_content
+        if data[:2] == GZIP_MAGIC:
+            # Blob gravado com gzip: o lxml lê descomprimindo em fluxo
+            root = ET.parse(gzip.GzipFile(fileobj=io.BytesIO(data))).getroot()
+        else:
+            root = ET.fromstring(data)
+
+        namespaces = {
+            'bvmf217': 'urn:bvmf.217.01.xsd',
+            'bvmf052': 'urn:bvmf.052.01.xsd',
+            'head': 'urn:iso:std:iso:20022:tech:xsd:head.001.001.01'
+        }
+
+        logger.debug("Root tag: %s", root.tag)
+
+        # Extrai data do pregão
+        data_s = root.xpath("string(.//bvmf217:TradDt/bvmf217:Dt)", namespaces=namespaces)
+        if data_s:
+            data_pregao = datetime.strptime(data_s, "%Y-%m-%d").date()
+            logger.debug("Data pregão encontrada: %s", data_pregao)
+        else:
+            data_pregao = datetime.now().date()
+            logger.debug("Data pregão não encontrada, usando data atual: %s", data_pregao)
+
+        price_reports = root.xpath(".//bvmf217:PricRpt", namespaces=namespaces)
+        logger.debug("Encontrados %d relatórios de preço", len(price_reports))
+
+        # Monta lista de cotações
+        cotacoes = []
+        for i, report in enumerate(price_reports):
+            try:
+                # Ticker
+                ticker_node = report.xpath(".//*[local-name()='TckrSymb']")
+                if not ticker_node or not ticker_node[0].text:
+                    continue
+
+                ativo = ticker_node[0].text.strip()
+
+                # Código do mercado
+                market_code_node = report.xpath(".//*[local-name()='MktIdrCd']")
+                market_code = market_code_node[0].text.strip() if market_code_node and market_code_node[0].text else ""
+                if market_code not in ["BVMF", "XBSP", "BOVESPA"]:
+                    continue
+
+                # Filtra apenas ações à vista 
+                if not re.match(r'^[A-Z]{4}\d{1,2}$', ativo):
+                    continue
+
+                # Atributos financeiros
+                attrs_node = report.xpath(".//*[local-name()='FinInstrmAttrbts']")
+                if not attrs_node:
+                    continue
+
+                # Usa o primeiro
+                attrs = attrs_node[0]
+                fechamento = attrs.xpath(".//*[local-name()='LastPric']")
+                if not fechamento or not fechamento[0].text:
+                    continue
+
+                preco_fechamento = float(fechamento[0].text.strip())
+
+                # Helpers de extração
+                def extrair_float(xpath_expr):
+                    val = attrs.xpath(xpath_expr)
+                    return float(val[0].text.strip()) if val and val[0].text else preco_fechamento
+
+                def extrair_int(xpath_expr):
+                    val = attrs.xpath(xpath_expr)
+                    return int(val[0].text.strip()) if val and val[0].text else 0
+
+                cotacoes.append({
+                    "ativo": ativo,
+                    "data_pregao": data_pregao,
+                    "abertura": extrair_float(".//*[local-name()='FrstPric']"),
+                    "fechamento": preco_fechamento,
+                    "maximo": extrair_float(".//*[local-name()='MaxPric']"),
+                    "minimo": extrair_float(".//*[local-name()='MinPric']"),
+                    "volume": extrair_int(".//*[local-name()='RglrTxsQty']")
+                })
+
+            except Exception as e:
+                print(f"[WARNING] Erro ao processar ativo: {e}")
+                continue
+
+        logger.debug("Total de cotações válidas: %d", len(cotacoes))
+        return cotacoes
+
+    except Exception as e:
+        print(f"[ERROR] Falha no parse XPath: {e}")
+        import traceback
+        traceback.print_exc()
+        return []
+
+
+def parse_xml_cacheado(xml_content, cache=None):
+    """Consulta o cache pelo SHA-256 do XML (descomprimido) antes de fazer o parse."""
+    cache = cache or cache_padrao()
+    if not cache.ativo:
+        return extrair_cotacoes(xml_content)
+
+    # O parse recebe o XML já descomprimido: o gzip é lido uma vez só
+    xml_content, sha = descomprimir_e_chave(xml_content)
+    cotacoes = cache.obter(sha)
+    if cotacoes is not None:
+        contar("cache_parse_acertos")
+        print(f"[INFO] Cache de parse: {len(cotacoes)} cotações de {sha[:12]}")
+        return cotacoes
+
+    contar("cache_parse_faltas")
+    cotacoes = extrair_cotacoes(xml_content)
+    # Lista vazia pode ser falha de parse: não entra no cache
+    if cotacoes:
+        cache.gravar(sha, cotacoes)
+    return cotacoes
+
+
+def parse_arquivos(caminhos):
+    """Lê e faz parse de XMLs locais (executável em processo separado)."""
+    cotacoes = []
+    for caminho in caminhos:
+        with open(caminho, "rb") as f:
+            cotacoes.extend(parse_xml_cacheado(f.read()))
+    return cotacoes
+
+
+class B3XMLParser:
+    def __init__(self):
+        self.container_client = get_container_client()
+        self.cache = ParseCache(container_client=self.container_client)
+
+    # Lista XMLs no Blob para uma data
+    def list_xml_files(self, date_str):
+        prefix = f"xml/{date_str}/"
+        blobs = list_blobs(self.container_client, name_starts_with=prefix)
+        return [b.name for b in blobs]
+
+    def download_xml(self, blob_name):
+        content = download_blob_to_string(self.container_client, blob_name)
+        return content
+
+    def parse_xml(self, xml_content):
+        return parse_xml_cacheado(xml_content, self.cache)
+
+    # Executa extração e transformação
+    def execute(self, multi_day=False, days_limit=5):
+        """Processa um ou vários dias, conforme parâmetros."""
+        all_cotacoes = []
+        days_processed = 0
+        
+        # Lista de dias de pregão a processar (sem fins de semana e feriados)
+        dates_to_process = [yymmdd(dt) for dt in iter_uteis_ate(max_days=days_limit)]
+        
+        # single-day: para no primeiro dia com XMLs
+        if not multi_day:
+            for date_str in dates_to_process:
+                xml_files = self.list_xml_files(date_str)
+                if xml_files:
+                    cotacoes = self._process_date(date_str, xml_files)
+                    all_cotacoes.extend(cotacoes)
+                    break
+        
+        # multi-day: percorre todos os dias com XMLs
+        else:
+            for date_str in dates_to_process:
+                xml_files = self.list_xml_files(date_str)
+                if not xml_files:
+                    print(f"[INFO] Nenhum arquivo XML encontrado para {date_str}")
+                    continue
+                    
+                print(f"[INFO] Processando dia: {date_str}")
+                cotacoes = self._process_date(date_str, xml_files)
+                all_cotacoes.extend(cotacoes)
+                days_processed += 1
+        
+        print(f"[INFO] Total de {days_processed} dias processados")
+        print(f"[INFO] Total de {len(all_cotacoes)} cotações extraídas")
+        
+        return all_cotacoes
+
+    # Processa XMLs de uma data
+    def _process_date(self, date_str, xml_files):
+        """Processa todos os XMLs de uma data."""
+        date_cotacoes = []
+        
+        for xml_file in xml_files:
+            print(f"[INFO] Processando {xml_file}...")
+            xml_content = self.download_xml(xml_file)
+            if not xml_content:
+                print(f"[WARNING] Não foi possível baixar o conteúdo de {xml_file}")
+                continue
+
+            cotacoes = self.parse_xml(xml_content)
+            if cotacoes:
+                date_cotacoes.extend(cotacoes)
+                print(f"[OK] Extraídas {len(cotacoes)} cotações de {xml_file}")
+            else:
+                print(f"[WARNING] Nenhuma cotação válida extraída de {xml_file}")
+        
+        # Exporta JSON se habilitado
+        if date_cotacoes and Config.EXPORT_JSON:
+            json_path = Config.DATA_DIR / f"cotacoes_{date_str}.json"
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(date_cotacoes, f, ensure_ascii=False, default=str, indent=2)
+            print(f"[INFO] Cotações exportadas para JSON: {json_path}")
+            
+        return date_cotacoes
+
+def run():
+    with execucao("xml_parse"):
+        parser = B3XMLParser()
+        cotacoes = parser.execute()
+    return cotacoes
+
+if __name__ == "__main__":
+    run()